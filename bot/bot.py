@@ -1,26 +1,40 @@
 import logging
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.fsm.storage.memory import SimpleEventIsolation
 from aiogram.types import ErrorEvent
 from config import Config
 from bot.middlewares.logging import LoggingMiddleware
 from bot.middlewares.auth import AuthMiddleware
-from bot.middlewares.throttling import ThrottlingMiddleware
+from bot.middlewares.throttling import ThrottlingMiddleware, ThrottleRule, create_bucket_store
+from bot.storage import create_fsm_storage
+from database.async_connection import init_async_pool, close_async_pool
+from database.crud.settings import start_settings_listener, stop_settings_listener
+from services.scheduler import SchedulerManager
+from services.catalog import catalog
+from services.user_contexts import user_contexts
 from aiogram.types import BotCommand
 
 logger = logging.getLogger(__name__)
 
 bot = Bot(token=Config.BOT_TOKEN)
-storage = MemoryStorage()
-dp = Dispatcher(storage=storage)
+storage = create_fsm_storage(Config.FSM_STORAGE_URL, ttl=Config.FSM_STATE_TTL)
+# Апдейты одного пользователя обрабатываются по очереди (важно для параллельной обработки вебхуков)
+dp = Dispatcher(storage=storage, events_isolation=SimpleEventIsolation())
+# Фоновые задачи: запускаются на всех узлах, выполняются только на лидере
+scheduler_manager = SchedulerManager(bot)
 
 # Register middlewares
 dp.message.middleware(LoggingMiddleware())
 dp.callback_query.middleware(LoggingMiddleware())
 dp.message.middleware(AuthMiddleware())
 dp.callback_query.middleware(AuthMiddleware())
-dp.message.middleware(ThrottlingMiddleware(rate_limit=0.5))
-dp.callback_query.middleware(ThrottlingMiddleware(rate_limit=0.5))
+# Один экземпляр на сообщения и колбэки: общее хранилище корзин
+throttling = ThrottlingMiddleware(create_bucket_store(Config.THROTTLE_STORAGE_URL), rules={
+    'message': ThrottleRule(Config.THROTTLE_MESSAGE_RATE, Config.THROTTLE_MESSAGE_BURST),
+    'callback_query': ThrottleRule(Config.THROTTLE_CALLBACK_RATE, Config.THROTTLE_CALLBACK_BURST),
+})
+dp.message.middleware(throttling)
+dp.callback_query.middleware(throttling)
 
 # Import routers
 from bot.handlers import (
@@ -44,6 +58,24 @@ dp.include_router(about.router)
 dp.include_router(broadcast.router)
 dp.include_router(statistics.router)
 
+@dp.startup()
+async def on_startup() -> None:
+    """Создаёт пул asyncpg до приёма первых апдейтов, загружает справочник и подписывается на изменения."""
+    await init_async_pool()
+    start_settings_listener()
+    await catalog.start()
+    await user_contexts.start()
+    await scheduler_manager.start()
+
+@dp.shutdown()
+async def on_shutdown() -> None:
+    await scheduler_manager.stop()
+    await user_contexts.stop()
+    await catalog.stop()
+    stop_settings_listener()
+    await throttling.store.close()
+    await close_async_pool()
+
 # Global error handler for aiogram 3.x
 @dp.error()
 async def global_error_handler(event: ErrorEvent) -> None:
@@ -1,4 +1,3 @@
-import asyncio
 import logging
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
@@ -7,28 +6,35 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
-from database.crud.users import get_all_users, is_admin
+from database.crud_async.broadcasts import create_broadcast_job, set_progress_message
 from bot.bot import bot
-from utils.cache import get_cache, set_cache  # если есть кеш, но для списка пользователей кеш не нужен
+from config import Config
+from services.broadcast import BroadcastService
+from utils.cache import UserContext
 
 logger = logging.getLogger(__name__)
 router = Router()
 
+broadcaster = BroadcastService(
+    bot,
+    rate=Config.BROADCAST_RATE,
+    concurrency=Config.BROADCAST_CONCURRENCY,
+)
+
 class BroadcastStates(StatesGroup):
     waiting_for_text = State()
     confirming = State()
 
-async def check_admin(message: Message) -> bool:
-    # асинхронно проверяем админа
-    is_admin_result = await asyncio.to_thread(is_admin, message.from_user.id)
-    if not is_admin_result:
+async def check_admin(message: Message, user_ctx: UserContext) -> bool:
+    # права берём из контекста, который загрузил AuthMiddleware
+    if not user_ctx.is_admin:
         await message.answer("⛔ У вас нет прав для этой команды.")
         return False
     return True
 
 @router.message(Command("broadcast"))
-async def cmd_broadcast(message: Message, state: FSMContext):
-    if not await check_admin(message):
+async def cmd_broadcast(message: Message, state: FSMContext, user_ctx: UserContext):
+    if not await check_admin(message, user_ctx):
         return
     await message.answer("📢 Введите текст для рассылки всем пользователям:")
     await state.set_state(BroadcastStates.waiting_for_text)
@@ -56,33 +62,41 @@ async def broadcast_confirm(callback: CallbackQuery, state: FSMContext):
     await callback.message.edit_text("⏳ Начинаю рассылку...")
     data = await state.get_data()
     text = data['text']
-
-    # асинхронно получаем список пользователей
-    users = await asyncio.to_thread(get_all_users)
-    if not users:
-        await callback.message.answer("❌ Нет пользователей для рассылки.")
-        await state.clear()
-        return
-
-    success = 0
-    failed = 0
-    for user_id in users:
-        try:
-            await bot.send_message(user_id, text)
-            success += 1
-            await asyncio.sleep(0.05)  # задержка для избежания флуда
-        except Exception as e:
-            logger.error(f"Failed to send to {user_id}: {e}")
-            failed += 1
-
-    await callback.message.answer(
-        f"✅ Рассылка завершена.\n"
-        f"📨 Успешно отправлено: {success}\n"
-        f"❌ Ошибок: {failed}"
-    )
     await state.clear()
 
+    job_id = await create_broadcast_job(text, created_by=callback.from_user.id)
+    # Это сообщение и будет редактироваться с прогрессом
+    await set_progress_message(job_id, callback.message.chat.id, callback.message.message_id)
+    broadcaster.start(job_id)
+    await callback.answer()
+
 @router.callback_query(BroadcastStates.confirming, F.data == "broadcast_cancel")
 async def broadcast_cancel(callback: CallbackQuery, state: FSMContext):
     await callback.message.edit_text("❌ Рассылка отменена.")
-    await state.clear()
\ No newline at end of file
+    await state.clear()
+
+@router.callback_query(F.data.regexp(r"^bc_(pause|resume|cancel):\d+$"))
+async def broadcast_control(callback: CallbackQuery, user_ctx: UserContext):
+    """Кнопки под сообщением с прогрессом: пауза, продолжение, отмена."""
+    if not user_ctx.is_admin:
+        await callback.answer("⛔ Нет прав", show_alert=True)
+        return
+    action, job_id = callback.data[3:].split(":")
+    job_id = int(job_id)
+    # Команда пишется в строку рассылки: её выполнит тот процесс бота, который ведёт рассылку
+    if action == "pause":
+        done, answer = await broadcaster.pause(job_id), "⏸ Пауза"
+    elif action == "resume":
+        done, answer = await broadcaster.resume(job_id), "▶️ Продолжаем"
+    else:
+        done, answer = await broadcaster.cancel(job_id), "⛔ Отменяем..."
+    await callback.answer(answer if done else "Рассылка уже завершена или в другом состоянии")
+
+@router.startup()
+async def resume_broadcasts():
+    """Продолжить рассылки, прерванные остановкой бота, и подбирать брошенные другими процессами."""
+    await broadcaster.start_rescan()
+
+@router.shutdown()
+async def stop_broadcasts():
+    await broadcaster.stop()
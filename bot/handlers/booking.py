@@ -1,21 +1,18 @@
 import logging
-import asyncio
+from datetime import datetime, timedelta
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 
 from bot.states.booking import BookingStates
-from database.crud.vehicle_types import get_all_vehicle_types
-from database.crud.services import get_services, get_service
-from database.crud.user_cars import get_user_cars, get_user_car
-from database.crud.user_car_tires import get_tires_for_user_car
-from database.crud.tire_sizes import get_tire_size
-from database.crud.appointments import create_appointment
-from database.crud.users import is_user_registered
+from database.crud_async.services import get_services, get_service
+from database.crud_async.user_cars import get_user_cars, get_user_car
+from database.crud_async.user_car_tires import get_tires_for_user_car
+from database.crud_async.tire_sizes import get_tire_size
 
 from bot.keyboards.booking import (
-    get_vehicle_types_keyboard,
+    get_catalog_vehicle_types_keyboard,
     get_services_keyboard,
     get_date_keyboard,
     get_time_keyboard,
@@ -27,52 +24,46 @@ from bot.keyboards.cars import (
     get_back_keyboard
 )
 from bot.keyboards.common import get_main_menu
-from utils.cache import get_cache, set_cache
+from services.catalog import catalog
+from services.slots import slots, SlotUnavailableError
+from utils.cache import UserContext, get_cache, set_cache, get_user_context
 
 logger = logging.getLogger(__name__)
 router = Router()
 
 # ---------- Кеширование справочных данных ----------
-async def get_cached_vehicle_types():
-    """Получить типы ТС с кешированием на 5 минут."""
-    cached = get_cache('vehicle_types')
-    if cached is not None:
-        return cached
-    types = await asyncio.to_thread(get_all_vehicle_types)
-    set_cache('vehicle_types', types)
-    return types
-
+# Типы ТС берутся из индекса справочника (services.catalog)
 async def get_cached_services(vehicle_type_id: int):
     """Получить услуги с кешированием на 5 минут (по типу ТС)."""
     cache_key = f'services_{vehicle_type_id}'
     cached = get_cache(cache_key)
     if cached is not None:
         return cached
-    services = await asyncio.to_thread(get_services, vehicle_type_id=vehicle_type_id)
+    services = await get_services(vehicle_type_id=vehicle_type_id)
     set_cache(cache_key, services)
     return services
 
 # ---------- Основная логика ----------
-async def start_booking_process(message: Message, state: FSMContext):
-    user_id = message.from_user.id
-    # Проверка регистрации (не кешируется, т.к. данные индивидуальны)
-    if not await asyncio.to_thread(is_user_registered, user_id):
+async def start_booking_process(message: Message, state: FSMContext, user_ctx: UserContext = None):
+    # Контекст приходит из AuthMiddleware; при прямом вызове берём из кеша
+    user_ctx = user_ctx or await get_user_context(message.from_user.id)
+    if not user_ctx.registered:
         await message.answer("Сначала нужно зарегистрироваться. Используйте /start")
         return
-    vehicle_types = await get_cached_vehicle_types()
+    index = await catalog.get()
     await message.answer(
         "Выберите тип транспортного средства:",
-        reply_markup=get_vehicle_types_keyboard(vehicle_types)
+        reply_markup=get_catalog_vehicle_types_keyboard(index)
     )
     await state.set_state(BookingStates.choosing_vehicle_type)
 
 @router.message(F.text == "📝 Записаться")
-async def booking_handler(message: Message, state: FSMContext):
-    await start_booking_process(message, state)
+async def booking_handler(message: Message, state: FSMContext, user_ctx: UserContext = None):
+    await start_booking_process(message, state, user_ctx)
 
 @router.message(Command("book"))
-async def cmd_book(message: Message, state: FSMContext):
-    await start_booking_process(message, state)
+async def cmd_book(message: Message, state: FSMContext, user_ctx: UserContext):
+    await start_booking_process(message, state, user_ctx)
 
 cmd_booking = booking_handler
 
@@ -91,14 +82,15 @@ async def process_vehicle_type(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(BookingStates.choosing_service, F.data.startswith("srv_"))
 async def process_service(callback: CallbackQuery, state: FSMContext):
     service_id = int(callback.data.split("_")[1])
-    service = await asyncio.to_thread(get_service, service_id)
+    service = await get_service(service_id)
     if not service:
         await callback.message.edit_text("Услуга не найдена. Попробуйте снова.")
         await state.clear()
         return
-    await state.update_data(service_id=service_id, service_name=service['name'])
+    await state.update_data(service_id=service_id, service_name=service['name'],
+                            duration=service.get('duration_minutes') or 30)
     user_id = callback.from_user.id
-    cars = await asyncio.to_thread(get_user_cars, user_id)
+    cars = await get_user_cars(user_id)
     if cars:
         await callback.message.edit_text(
             "Выберите автомобиль:",
@@ -115,7 +107,7 @@ async def process_service(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(BookingStates.choosing_car, F.data.startswith("car_select_"))
 async def process_car(callback: CallbackQuery, state: FSMContext):
     car_id = int(callback.data.split("_")[2])
-    car = await asyncio.to_thread(get_user_car, car_id)
+    car = await get_user_car(car_id)
     if not car:
         await callback.message.edit_text("Автомобиль не найден.")
         await state.clear()
@@ -124,7 +116,7 @@ async def process_car(callback: CallbackQuery, state: FSMContext):
     if car.get('year'):
         car_display += f" ({car['year']})"
     await state.update_data(user_car_id=car_id, car_display=car_display)
-    tires = await asyncio.to_thread(get_tires_for_user_car, car_id)
+    tires = await get_tires_for_user_car(car_id)
     if tires:
         await callback.message.edit_text(
             "Выберите размер шин (или пропустите):",
@@ -143,13 +135,13 @@ async def process_car(callback: CallbackQuery, state: FSMContext):
 async def process_tire_select(callback: CallbackQuery, state: FSMContext):
     parts = callback.data.split("_")
     tire_id = int(parts[2])
-    tire = await asyncio.to_thread(get_tire_size, tire_id)
+    tire = await get_tire_size(tire_id)
     if tire:
         tire_display = f"{tire['width']}/{tire['profile']} R{tire['diameter']}"
         await state.update_data(tire_size_id=tire_id, tire_display=tire_display)
     await callback.message.edit_text(
         "Выберите дату:",
-        reply_markup=get_date_keyboard()
+        reply_markup=await date_keyboard()
     )
     await state.set_state(BookingStates.choosing_date)
     await callback.answer()
@@ -159,20 +151,43 @@ async def process_tire_skip(callback: CallbackQuery, state: FSMContext):
     await state.update_data(tire_size_id=None, tire_display="не указаны")
     await callback.message.edit_text(
         "Выберите дату:",
-        reply_markup=get_date_keyboard()
+        reply_markup=await date_keyboard()
     )
     await state.set_state(BookingStates.choosing_date)
     await callback.answer()
 
+async def date_keyboard(days_ahead: int = 14):
+    """Клавиатура дат с пометкой полностью занятых дней (один запрос на весь диапазон, с кешем)."""
+    today = datetime.now().date()
+    full_days = await slots.full_days(today, today + timedelta(days=days_ahead - 1))
+    return get_date_keyboard(days_ahead, full_days)
+
+async def show_free_times(callback: CallbackQuery, state: FSMContext, date: str, prefix: str = ""):
+    """Свободное время на дату с учётом длительности услуги и числа постов."""
+    data = await state.get_data()
+    free_slots = await slots.free_slots(date, data.get('duration') or 30)
+    if not free_slots:
+        await callback.message.edit_text(
+            prefix + "На эту дату свободного времени нет, выберите другой день:",
+            reply_markup=await date_keyboard()
+        )
+        await state.set_state(BookingStates.choosing_date)
+        return
+    await callback.message.edit_text(
+        prefix + "Выберите время:",
+        reply_markup=get_time_keyboard(free_slots)
+    )
+    await state.set_state(BookingStates.choosing_time)
+
+@router.callback_query(BookingStates.choosing_date, F.data == "date_full")
+async def process_full_date(callback: CallbackQuery):
+    await callback.answer("На этот день свободного времени нет, выберите другой.", show_alert=True)
+
 @router.callback_query(BookingStates.choosing_date, F.data.startswith("date_"))
 async def process_date(callback: CallbackQuery, state: FSMContext):
     date = callback.data.split("_")[1]
     await state.update_data(date=date)
-    await callback.message.edit_text(
-        "Выберите время:",
-        reply_markup=get_time_keyboard(date)
-    )
-    await state.set_state(BookingStates.choosing_time)
+    await show_free_times(callback, state, date)
     await callback.answer()
 
 @router.callback_query(BookingStates.choosing_time, F.data.startswith("time_"))
@@ -197,12 +212,11 @@ async def process_time(callback: CallbackQuery, state: FSMContext):
     await state.set_state(BookingStates.confirmation)
     await callback.answer()
 
-@router.callback_query(BookingStates.confirmation, F.data == "confirm")
+@router.callback_query(BookingStates.confirmation, F.data == "confirm", flags={'throttling': 'booking'})
 async def process_confirm(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     try:
-        appointment_id = await asyncio.to_thread(
-            create_appointment,
+        appointment_id = await slots.book(
             {
                 'user_id': callback.from_user.id,
                 'service_id': data['service_id'],
@@ -212,17 +226,23 @@ async def process_confirm(callback: CallbackQuery, state: FSMContext):
                 'time': data['time'],
                 'status': 'pending',
                 'notes': None
-            }
+            },
+            duration=data.get('duration') or 30
         )
         await callback.message.edit_text(
             "✅ Запись создана! Ожидайте подтверждения администратора.",
-            reply_markup=get_main_menu(callback.from_user.id)
+            reply_markup=await get_main_menu(callback.from_user.id)
         )
+    except SlotUnavailableError:
+        # Пока пользователь подтверждал, время заняли: предлагаем выбрать заново, не теряя данных
+        await show_free_times(callback, state, data['date'], prefix="⚠️ Это время только что заняли.\n\n")
+        await callback.answer()
+        return
     except Exception as e:
         logger.exception("Error creating appointment")
         await callback.message.edit_text(
             "❌ Произошла ошибка при создании записи. Попробуйте позже.",
-            reply_markup=get_main_menu(callback.from_user.id)
+            reply_markup=await get_main_menu(callback.from_user.id)
         )
     await state.clear()
     await callback.answer()
@@ -231,17 +251,17 @@ async def process_confirm(callback: CallbackQuery, state: FSMContext):
 async def process_cancel(callback: CallbackQuery, state: FSMContext):
     await callback.message.edit_text(
         "❌ Запись отменена.",
-        reply_markup=get_main_menu(callback.from_user.id)
+        reply_markup=await get_main_menu(callback.from_user.id)
     )
     await state.clear()
     await callback.answer()
 
 @router.callback_query(F.data == "back_to_vehicle_types")
 async def back_to_vehicle_types(callback: CallbackQuery, state: FSMContext):
-    vehicle_types = await get_cached_vehicle_types()
+    index = await catalog.get()
     await callback.message.edit_text(
         "Выберите тип транспортного средства:",
-        reply_markup=get_vehicle_types_keyboard(vehicle_types)
+        reply_markup=get_catalog_vehicle_types_keyboard(index)
     )
     await state.set_state(BookingStates.choosing_vehicle_type)
     await callback.answer()
@@ -249,7 +269,7 @@ async def back_to_vehicle_types(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(F.data == "back_to_car_selection")
 async def back_to_car_selection(callback: CallbackQuery, state: FSMContext):
     user_id = callback.from_user.id
-    cars = await asyncio.to_thread(get_user_cars, user_id)
+    cars = await get_user_cars(user_id)
     await callback.message.edit_text(
         "Выберите автомобиль:",
         reply_markup=get_cars_keyboard(cars)
@@ -261,7 +281,7 @@ async def back_to_car_selection(callback: CallbackQuery, state: FSMContext):
 async def back_to_date(callback: CallbackQuery, state: FSMContext):
     await callback.message.edit_text(
         "Выберите дату:",
-        reply_markup=get_date_keyboard()
+        reply_markup=await date_keyboard()
     )
     await state.set_state(BookingStates.choosing_date)
     await callback.answer()
\ No newline at end of file
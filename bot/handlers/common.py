@@ -4,29 +4,30 @@ from aiogram.types import Message
 from aiogram.filters import Command
 
 from bot.keyboards.common import get_main_menu
-from database.crud.users import is_user_registered, create_user
+from database.crud_async.users import create_user
+from utils.cache import UserContext
 
 logger = logging.getLogger(__name__)
 router = Router()
 
 @router.message(Command("start"))
-async def cmd_start(message: Message):
+async def cmd_start(message: Message, user_ctx: UserContext):
     """
     Обработчик команды /start.
     Показывает главное меню.
     """
     user_id = message.from_user.id
     # Проверяем, зарегистрирован ли пользователь
-    if not is_user_registered(user_id):
+    if not user_ctx.registered:
         # Автоматически создаём запись пользователя с минимальными данными
         username = message.from_user.username
         full_name = message.from_user.full_name
-        create_user(user_id, username, full_name, phone=None)
+        await create_user(user_id, username, full_name, phone=None)
         logger.info(f"Новый пользователь {user_id} (@{username}) автоматически зарегистрирован.")
 
     await message.answer(
         "Добро пожаловать! Выберите действие:",
-        reply_markup=get_main_menu(user_id)
+        reply_markup=await get_main_menu(user_id)
     )
 
 @router.message(F.text == "🔙 Назад")
@@ -35,5 +36,5 @@ async def back_to_main(message: Message):
     user_id = message.from_user.id
     await message.answer(
         "Главное меню:",
-        reply_markup=get_main_menu(user_id)
+        reply_markup=await get_main_menu(user_id)
     )
\ No newline at end of file
@@ -1,10 +1,9 @@
 import logging
-import asyncio
 from aiogram import Router, F
 from aiogram.types import Message
 from aiogram.filters import Command
 
-from database.crud.appointments import get_user_appointments
+from database.crud_async.appointments import get_user_appointments
 from bot.keyboards.common import get_main_menu
 
 logger = logging.getLogger(__name__)
@@ -16,13 +15,12 @@ async def show_my_appointments(message: Message):
     """Показывает список записей пользователя."""
     user_id = message.from_user.id
 
-    # Асинхронно получаем записи пользователя
-    appointments = await asyncio.to_thread(get_user_appointments, user_id)
+    appointments = await get_user_appointments(user_id)
 
     if not appointments:
         await message.answer(
             "У вас пока нет записей.",
-            reply_markup=get_main_menu(user_id)
+            reply_markup=await get_main_menu(user_id)
         )
         return
 
@@ -31,4 +29,4 @@ async def show_my_appointments(message: Message):
         text += f"📅 {apt['date']} {apt['time']} — {apt['service']}\n"
         text += f"Статус: {apt['status']}\n\n"
 
-    await message.answer(text, reply_markup=get_main_menu(user_id))
\ No newline at end of file
+    await message.answer(text, reply_markup=await get_main_menu(user_id))
\ No newline at end of file
@@ -5,9 +5,8 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
 
-from bot.keyboards.main_menu import get_main_menu
-from database.crud.users import create_user
-from utils.cache import delete_cache
+from bot.keyboards.common import get_main_menu
+from database.crud_async.users import create_user
 
 router = Router()
 
@@ -36,14 +35,12 @@ async def process_contact(message: Message, state: FSMContext):
     full_name = message.from_user.full_name
     username = message.from_user.username
 
-    # Создаём пользователя в БД
-    create_user(user_id, full_name, phone)
-    # Инвалидируем кеш статуса регистрации для этого пользователя
-    delete_cache(f'user_registered_{user_id}')
+    # Создаём пользователя в БД (create_user сам обновляет кеш контекста пользователя)
+    await create_user(user_id, username, full_name, phone)
 
     await message.answer(
         "Регистрация прошла успешно!",
-        reply_markup=get_main_menu(user_id)
+        reply_markup=await get_main_menu(user_id)
     )
     await state.clear()
 
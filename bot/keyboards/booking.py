@@ -1,6 +1,7 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from datetime import datetime, timedelta
+from bot.keyboards.cache import get_keyboard, memoized_keyboard
 
 def get_vehicle_types_keyboard(vehicle_types: list) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
@@ -9,7 +10,17 @@ def get_vehicle_types_keyboard(vehicle_types: list) -> InlineKeyboardMarkup:
     builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data="main_menu"))
     return builder.as_markup()
 
+def get_catalog_vehicle_types_keyboard(index) -> InlineKeyboardMarkup:
+    """Типы ТС из индекса справочника (services.catalog); одна клавиатура на версию."""
+    return get_keyboard('vehicle_types', index.version, (),
+                        lambda: get_vehicle_types_keyboard(index.vehicle_types))
+
 def get_services_keyboard(services: list) -> InlineKeyboardMarkup:
+    # Услуги не входят в справочник, поэтому ключом служит само содержимое кнопок
+    params = tuple((srv['id'], srv['name'], srv.get('price')) for srv in services)
+    return get_keyboard('services', None, params, lambda: _build_services_keyboard(services))
+
+def _build_services_keyboard(services: list) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     for srv in services:
         text = srv['name']
@@ -19,9 +30,17 @@ def get_services_keyboard(services: list) -> InlineKeyboardMarkup:
     builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data="back_to_vehicle_types"))
     return builder.as_markup()
 
-def get_date_keyboard(days_ahead: int = 14) -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
+def get_date_keyboard(days_ahead: int = 14, full_days=frozenset()) -> InlineKeyboardMarkup:
+    """
+    Ближайшие дни; клавиатура строится заново раз в сутки (ключ — сегодняшняя дата)
+    и при изменении набора занятых дней. Занятые дни помечены и не открывают выбор времени.
+    """
     today = datetime.now().date()
+    full = tuple(sorted(full_days))
+    return get_keyboard('dates', today, (days_ahead, full), lambda: _build_date_keyboard(today, days_ahead, full))
+
+def _build_date_keyboard(today, days_ahead: int, full_days=()) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
     for i in range(days_ahead):
         date = today + timedelta(days=i)
         date_str = date.strftime("%Y-%m-%d")
@@ -29,21 +48,30 @@ def get_date_keyboard(days_ahead: int = 14) -> InlineKeyboardMarkup:
         weekdays = ['Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс']
         weekday = weekdays[date.weekday()]
         display += f" ({weekday})"
+        if date in full_days:
+            builder.row(InlineKeyboardButton(text=f"🚫 {display} — мест нет", callback_data="date_full"))
+            continue
         builder.row(InlineKeyboardButton(text=display, callback_data=f"date_{date_str}"))
     builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data="back_to_car_selection"))
     return builder.as_markup()
 
-def get_time_keyboard(date: str, interval_minutes: int = 30) -> InlineKeyboardMarkup:
+def get_time_keyboard(free_slots: list) -> InlineKeyboardMarkup:
+    """
+    Свободное время из services.slots (список (time, свободных постов)).
+    Клавиатура зависит только от набора времён, поэтому одинаковые дни делят одну разметку.
+    """
+    times = tuple(slot_time.strftime("%H:%M") for slot_time, _ in free_slots)
+    return _get_time_slots_keyboard(times)
+
+@memoized_keyboard('time_slots')
+def _get_time_slots_keyboard(times: tuple) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    start_hour = 9
-    end_hour = 20
-    for hour in range(start_hour, end_hour):
-        for minute in (0, 30):
-            time_str = f"{hour:02d}:{minute:02d}"
-            builder.row(InlineKeyboardButton(text=time_str, callback_data=f"time_{time_str}"))
+    for time_str in times:
+        builder.row(InlineKeyboardButton(text=time_str, callback_data=f"time_{time_str}"))
     builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data="back_to_date"))
     return builder.as_markup()
 
+@memoized_keyboard('booking_confirmation')
 def get_confirmation_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(
@@ -53,6 +81,7 @@ def get_confirmation_keyboard() -> InlineKeyboardMarkup:
     )
     return builder.as_markup()
 
+@memoized_keyboard('booking_back')
 def get_back_keyboard(callback_data: str = "main_menu") -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data=callback_data))
@@ -0,0 +1,43 @@
+"""
+Кеш готовых клавиатур.
+
+Клавиатура однозначно задаётся ключом (вид, версия, параметры): версия —
+это версия справочника (services.catalog) или другой признак актуальности
+данных (например, сегодняшняя дата для календаря). Собранная разметка
+строится один раз и дальше отдаётся тем же объектом.
+
+Возвращаемые объекты общие для всех пользователей — их нельзя изменять;
+если нужна правка, соберите новую клавиатуру.
+"""
+import functools
+from cachetools import LRUCache
+
+# Справочник даёт порядка пары тысяч клавиатур (модели по марке и типу ТС, годы);
+# записи старых версий просто вытесняются
+_keyboards = LRUCache(maxsize=4096)
+
+def get_keyboard(kind: str, version, params: tuple, build):
+    """Клавиатура из кеша; при промахе вызывает build() и запоминает результат."""
+    key = (kind, version, params)
+    markup = _keyboards.get(key)
+    if markup is None:
+        markup = _keyboards[key] = build()
+    return markup
+
+def memoized_keyboard(kind: str):
+    """
+    Декоратор для функций, чья клавиатура зависит только от хешируемых аргументов
+    (статические меню, сетка времени). Исходная функция доступна как .build.
+    """
+    def decorator(build):
+        @functools.wraps(build)
+        def wrapper(*args, **kwargs):
+            params = args + tuple(sorted(kwargs.items()))
+            return get_keyboard(kind, None, params, lambda: build(*args, **kwargs))
+        wrapper.build = build
+        return wrapper
+    return decorator
+
+def clear_keyboards():
+    """Сбросить все клавиатуры (например, после смены текстов кнопок)."""
+    _keyboards.clear()
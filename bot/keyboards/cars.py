@@ -1,5 +1,6 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+from bot.keyboards.cache import get_keyboard, memoized_keyboard
 
 def get_cars_inline_keyboard(user_cars: list) -> InlineKeyboardMarkup:
     """
@@ -105,6 +106,23 @@ def get_years_keyboard(years: list) -> InlineKeyboardMarkup:
     ))
     return builder.as_markup()
 
+# ---------- Клавиатуры справочника (по версии индекса services.catalog) ----------
+def get_catalog_letters_keyboard(index) -> InlineKeyboardMarkup:
+    return get_keyboard('brand_letters', index.version, (),
+                        lambda: get_brands_by_letter_keyboard(index.brands_by_letter))
+
+def get_catalog_brands_keyboard(index, letter: str) -> InlineKeyboardMarkup:
+    return get_keyboard('brands', index.version, (letter,),
+                        lambda: get_brands_list_keyboard(index.brands(letter), letter))
+
+def get_catalog_models_keyboard(index, brand_id: int, vehicle_type_id: int = None) -> InlineKeyboardMarkup:
+    return get_keyboard('models', index.version, (brand_id, vehicle_type_id),
+                        lambda: get_models_keyboard(index.models(brand_id, vehicle_type_id)))
+
+def get_catalog_years_keyboard(index, model_id: int) -> InlineKeyboardMarkup:
+    return get_keyboard('years', index.version, (model_id,),
+                        lambda: get_years_keyboard(index.years(model_id)))
+
 def get_tire_selection_keyboard(tires: list, car_id: int) -> InlineKeyboardMarkup:
     """
     Клавиатура для выбора существующего размера шин или добавления нового.
@@ -126,6 +144,7 @@ def get_tire_selection_keyboard(tires: list, car_id: int) -> InlineKeyboardMarku
     ))
     return builder.as_markup()
 
+@memoized_keyboard('car_confirm')
 def get_confirm_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура подтверждения: Да / Нет."""
     builder = InlineKeyboardBuilder()
@@ -136,12 +155,14 @@ def get_confirm_keyboard() -> InlineKeyboardMarkup:
     )
     return builder.as_markup()
 
+@memoized_keyboard('car_back')
 def get_back_keyboard(callback_data: str = "main_menu") -> InlineKeyboardMarkup:
     """Простая клавиатура с одной кнопкой 'Назад'."""
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data=callback_data))
     return builder.as_markup()
 
+@memoized_keyboard('car_skip')
 def get_skip_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура с кнопкой 'Пропустить' (для необязательных шагов)."""
     builder = InlineKeyboardBuilder()
@@ -5,14 +5,21 @@ from aiogram.types import (
     InlineKeyboardButton,
 )
 from aiogram.utils.keyboard import ReplyKeyboardBuilder, InlineKeyboardBuilder
-from utils.cache import get_user_registration_status
+from utils.cache import get_user_context
+from bot.keyboards.cache import memoized_keyboard
 
-def get_main_menu(user_id: int = None) -> ReplyKeyboardMarkup:
+async def get_main_menu(user_id: int = None) -> ReplyKeyboardMarkup:
     """
     Главное меню бота.
     Если пользователь не зарегистрирован, показывает только 'Записаться' и 'О нас'.
-    Статус регистрации берётся из кеша (с обновлением раз в 5 минут).
+    Статус регистрации берётся из контекста, который AuthMiddleware уже загрузил
+    в кеш; при промахе он читается через asyncpg, не блокируя цикл событий.
     """
+    registered = bool(user_id) and (await get_user_context(user_id)).registered
+    return _get_main_menu(registered)
+
+@memoized_keyboard('main_menu')
+def _get_main_menu(registered: bool) -> ReplyKeyboardMarkup:
     builder = ReplyKeyboardBuilder()
 
     builder.row(
@@ -21,7 +28,7 @@ def get_main_menu(user_id: int = None) -> ReplyKeyboardMarkup:
         width=2
     )
 
-    if user_id and get_user_registration_status(user_id):
+    if registered:
         builder.row(
             KeyboardButton(text="📋 Мои записи"),
             KeyboardButton(text="🚗 Мои автомобили"),
@@ -30,12 +37,14 @@ def get_main_menu(user_id: int = None) -> ReplyKeyboardMarkup:
 
     return builder.as_markup(resize_keyboard=True, input_field_placeholder="Выберите действие")
 
+@memoized_keyboard('back')
 def back_keyboard(callback_data: str = "main_menu") -> InlineKeyboardMarkup:
     """Простая инлайн-клавиатура с кнопкой 'Назад'."""
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data=callback_data))
     return builder.as_markup()
 
+@memoized_keyboard('skip')
 def skip_keyboard() -> InlineKeyboardMarkup:
     """Инлайн-клавиатура с кнопками 'Пропустить' и 'Назад'."""
     builder = InlineKeyboardBuilder()
@@ -43,11 +52,13 @@ def skip_keyboard() -> InlineKeyboardMarkup:
     builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data="back"))
     return builder.as_markup()
 
+@memoized_keyboard('start')
 def start_inline_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text="🏠 Старт", callback_data="start_command"))
     return builder.as_markup()
 
+@memoized_keyboard('cancel')
 def cancel_keyboard() -> InlineKeyboardMarkup:
     """Инлайн-клавиатура с кнопкой 'Отмена'."""
     builder = InlineKeyboardBuilder()
@@ -1,11 +1,15 @@
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery
-from database.crud.users import is_user_registered
+from utils.cache import UserContext, get_user_context
 import logging
 
 logger = logging.getLogger(__name__)
 
 class AuthMiddleware(BaseMiddleware):
+    """
+    Загружает контекст пользователя (registered, is_admin, phone) один раз на апдейт
+    и передаёт его хендлерам как `user_ctx` (и `is_registered` для совместимости).
+    """
     async def __call__(self, handler, event, data: dict):
         user_id = None
         if isinstance(event, Message):
@@ -14,9 +18,10 @@ class AuthMiddleware(BaseMiddleware):
             user_id = event.from_user.id
         
         if user_id:
-            registered = is_user_registered(user_id)
-            data['is_registered'] = registered
+            user_ctx = await get_user_context(user_id)
         else:
-            data['is_registered'] = False
+            user_ctx = UserContext(registered=False)
+        data['user_ctx'] = user_ctx
+        data['is_registered'] = user_ctx.registered
         
         return await handler(event, data)
\ No newline at end of file
@@ -1,30 +1,245 @@
-import asyncio
+import time
+import logging
+from abc import ABC, abstractmethod
+from array import array
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
 from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
 from aiogram.types import Message, CallbackQuery
-from cachetools import TTLCache
 
-throttle_cache = TTLCache(maxsize=1000, ttl=60)
+try:
+    from redis import asyncio as aioredis
+except ImportError:  # redis нужен только при THROTTLE_STORAGE_URL=redis://...
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+
+class ThrottleRule(NamedTuple):
+    """Token bucket: `rate` updates per second on average, bursts up to `burst`."""
+    rate: float
+    burst: float
+
+
+# Правила по умолчанию; хендлер выбирает своё флагом throttling (см. ThrottlingMiddleware)
+DEFAULT_RULES: Dict[str, ThrottleRule] = {
+    'message': ThrottleRule(rate=1.0, burst=5),
+    'callback_query': ThrottleRule(rate=2.0, burst=8),
+    'chat': ThrottleRule(rate=5.0, burst=20),       # общий лимит группового чата
+    'booking': ThrottleRule(rate=0.2, burst=3),     # создание записи: транзакция с блокировкой дня
+}
+
+Bucket = Tuple[str, ThrottleRule]
+
+
+class BucketStore(ABC):
+    """
+    Storage of token buckets.
+
+    take() checks all given buckets and consumes one token from each only
+    if every bucket has one; otherwise nothing is consumed. Returns 0 when
+    the update is allowed, else seconds until it would be.
+    """
+
+    @abstractmethod
+    async def take(self, buckets: Sequence[Bucket]) -> float:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalBucketStore(BucketStore):
+    """
+    In-process buckets in flat arrays: a dict maps a key to its slot, and
+    tokens / last update / "full again at" times live in array('d') columns.
+    Freed slots go to a free list and are reused, so memory follows the
+    number of recently active users, not all users ever seen.
+
+    A bucket that has refilled is indistinguishable from a new one, so it
+    can be dropped. Each take() advances a clock hand over SWEEP_STEP slots
+    and frees the refilled ones: O(1) per update, no full scans.
+    """
+
+    SWEEP_STEP = 2
+    INITIAL_SIZE = 1024
+
+    def __init__(self):
+        self._index: Dict[str, int] = {}
+        self._keys: List[Optional[str]] = []
+        self._tokens = array('d')
+        self._updated = array('d')
+        self._full_at = array('d')
+        self._free: List[int] = []
+        self._hand = 0
+
+    def __len__(self):
+        return len(self._index)
+
+    def _grow(self):
+        old = len(self._keys)
+        new = max(old * 2, self.INITIAL_SIZE)
+        zeros = array('d', bytes(8 * (new - old)))
+        self._tokens.extend(zeros)
+        self._updated.extend(zeros)
+        self._full_at.extend(zeros)
+        self._keys.extend([None] * (new - old))
+        self._free.extend(range(new - 1, old - 1, -1))
+
+    def _slot(self, key: str, rule: ThrottleRule, now: float) -> int:
+        slot = self._index.get(key)
+        if slot is None:
+            if not self._free:
+                self._grow()
+            slot = self._free.pop()
+            self._index[key] = slot
+            self._keys[slot] = key
+            self._tokens[slot] = rule.burst
+            self._updated[slot] = now
+            self._full_at[slot] = now
+        return slot
+
+    def _sweep(self, now: float):
+        size = len(self._keys)
+        for _ in range(self.SWEEP_STEP):
+            slot = self._hand
+            self._hand = (slot + 1) % size
+            key = self._keys[slot]
+            if key is not None and self._full_at[slot] <= now:
+                del self._index[key]
+                self._keys[slot] = None
+                self._free.append(slot)
+
+    async def take(self, buckets: Sequence[Bucket]) -> float:
+        now = time.monotonic()
+        wait = 0.0
+        slots = []
+        for key, rule in buckets:
+            slot = self._slot(key, rule, now)
+            tokens = min(rule.burst, self._tokens[slot] + (now - self._updated[slot]) * rule.rate)
+            self._tokens[slot] = tokens
+            self._updated[slot] = now
+            if tokens < 1:
+                wait = max(wait, (1 - tokens) / rule.rate)
+            slots.append((slot, rule))
+        if not wait:
+            for slot, rule in slots:
+                tokens = self._tokens[slot] - 1
+                self._tokens[slot] = tokens
+                self._full_at[slot] = now + (rule.burst - tokens) / rule.rate
+        self._sweep(now)
+        return wait
+
+
+# Все корзины апдейта проверяются и списываются одним атомарным вызовом.
+# Время берётся у Redis, чтобы часы воркеров не влияли на лимит; ключ живёт,
+# пока корзина не наполнится, — дальше он не нужен.
+_TAKE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local wait = 0
+local tokens = {}
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i - 1])
+    local burst = tonumber(ARGV[2 * i])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local value = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    value = math.min(burst, value + math.max(0, now - ts) * rate)
+    tokens[i] = value
+    if value < 1 then
+        wait = math.max(wait, (1 - value) / rate)
+    end
+end
+if wait == 0 then
+    for i, key in ipairs(KEYS) do
+        local rate = tonumber(ARGV[2 * i - 1])
+        local burst = tonumber(ARGV[2 * i])
+        local value = tokens[i] - 1
+        redis.call('HSET', key, 'tokens', value, 'ts', now)
+        redis.call('PEXPIRE', key, math.ceil((burst - value) / rate * 1000) + 1000)
+    end
+end
+return tostring(wait)
+"""
+
+
+class RedisBucketStore(BucketStore):
+    """Buckets shared by all bot workers; one script call (one round trip) per update."""
+
+    def __init__(self, url: str, prefix: str = 'throttle:'):
+        if aioredis is None:
+            raise RuntimeError("THROTTLE_STORAGE_URL points to Redis, but the 'redis' package is not installed")
+        self._redis = aioredis.from_url(url)
+        self._script = self._redis.register_script(_TAKE_SCRIPT)
+        self.prefix = prefix
+
+    async def take(self, buckets: Sequence[Bucket]) -> float:
+        keys = [self.prefix + key for key, _ in buckets]
+        args = []
+        for _, rule in buckets:
+            args += [rule.rate, rule.burst]
+        return float(await self._script(keys=keys, args=args))
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def create_bucket_store(url: str = '') -> BucketStore:
+    """In-process buckets by default, Redis when url is redis://, rediss:// or unix://."""
+    if url:
+        logger.info("Throttling: shared bucket store")
+        return RedisBucketStore(url)
+    return LocalBucketStore()
+
 
 class ThrottlingMiddleware(BaseMiddleware):
-    def __init__(self, rate_limit: float = 1.0):
-        self.rate_limit = rate_limit
+    """
+    Anti-flood limit with token buckets per user and per group chat.
+
+    One instance is meant to be registered for both messages and callback
+    queries so they share a store. The rule comes from the handler flag
+    `throttling`: a rule name from `rules`, a ThrottleRule, or False to
+    disable the limit; without the flag the rule is named after the event
+    type. If the shared store is unavailable updates are let through.
+    """
+
+    def __init__(self, store: BucketStore = None, rules: Dict[str, ThrottleRule] = None):
+        self.store = store or LocalBucketStore()
+        self.rules = {**DEFAULT_RULES, **(rules or {})}
+
+    def _buckets(self, event, data: dict) -> Optional[List[Bucket]]:
+        user = data.get('event_from_user')
+        if user is None:
+            return None
+        flag = get_flag(data, 'throttling')
+        if flag is False:
+            return None
+        if isinstance(flag, ThrottleRule):
+            name, rule = f'custom:{flag.rate}:{flag.burst}', flag
+        else:
+            name = flag if isinstance(flag, str) else (
+                'callback_query' if isinstance(event, CallbackQuery) else 'message')
+            rule = self.rules.get(name) or self.rules['message']
+        buckets = [(f'{name}:u:{user.id}', rule)]
+        chat = data.get('event_chat')
+        if chat is not None and chat.id != user.id:
+            buckets.append((f'chat:{chat.id}', self.rules['chat']))
+        return buckets
 
     async def __call__(self, handler, event, data: dict):
-        user_id = None
-        if isinstance(event, Message):
-            user_id = event.from_user.id
-        elif isinstance(event, CallbackQuery):
-            user_id = event.from_user.id
-
-        if user_id:
-            last_time = throttle_cache.get(user_id)
-            now = asyncio.get_event_loop().time()
-            if last_time and (now - last_time) < self.rate_limit:
+        buckets = self._buckets(event, data)
+        if buckets:
+            try:
+                wait = await self.store.take(buckets)
+            except Exception as e:
+                logger.warning(f"Throttling store error, update allowed: {e}")
+                wait = 0
+            if wait:
                 if isinstance(event, Message):
                     await event.answer("⏳ Пожалуйста, не спамьте. Подождите немного.")
                 elif isinstance(event, CallbackQuery):
                     await event.answer("⏳ Слишком часто", show_alert=False)
                 return
-            throttle_cache[user_id] = now
-
-        return await handler(event, data)
\ No newline at end of file
+        return await handler(event, data)
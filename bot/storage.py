@@ -0,0 +1,184 @@
+import json
+import time
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+try:
+    from redis import asyncio as aioredis
+except ImportError:  # redis нужен только при FSM_STORAGE_URL=redis://...
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+
+class KeyValueBackend(ABC):
+    """
+    Minimal key-value protocol the FSM storage needs.
+
+    write() must apply all operations in a single round trip (pipeline),
+    so a state change and the TTL refresh of its data cost one request.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        pass
+
+    @abstractmethod
+    async def write(self, set_items: Dict[str, bytes], delete_keys: Iterable[str] = (),
+                    touch_keys: Iterable[str] = (), ttl: Optional[int] = None) -> None:
+        """Set keys (with TTL), delete keys and refresh TTL of other keys at once."""
+        pass
+
+    @abstractmethod
+    async def close(self) -> None:
+        pass
+
+
+class LocalBackend(KeyValueBackend):
+    """
+    In-process stand-in for Redis: same semantics (TTL, pipelined writes),
+    no network. Used for a single bot worker and in tests.
+    """
+
+    SWEEP_EVERY = 1000  # записей между очистками просроченных ключей
+
+    def __init__(self):
+        self._data = {}  # key -> (value, expires_at | None)
+        self._writes = 0
+
+    def _alive(self, key, now):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= now:
+            del self._data[key]
+            return None
+        return item
+
+    async def get(self, key: str) -> Optional[bytes]:
+        item = self._alive(key, time.monotonic())
+        return item[0] if item else None
+
+    async def write(self, set_items, delete_keys=(), touch_keys=(), ttl=None):
+        now = time.monotonic()
+        expires_at = now + ttl if ttl else None
+        for key, value in set_items.items():
+            self._data[key] = (value, expires_at)
+        for key in delete_keys:
+            self._data.pop(key, None)
+        for key in touch_keys:
+            item = self._alive(key, now)
+            if item:
+                self._data[key] = (item[0], expires_at)
+        self._writes += 1
+        if self._writes % self.SWEEP_EVERY == 0:
+            self._sweep(now)
+
+    def _sweep(self, now):
+        expired = [k for k, (_, exp) in self._data.items() if exp is not None and exp <= now]
+        for key in expired:
+            del self._data[key]
+
+    async def close(self) -> None:
+        self._data.clear()
+
+
+class RedisBackend(KeyValueBackend):
+    """Backend for Redis (or any server speaking its protocol) shared by all bot workers."""
+
+    def __init__(self, url: str):
+        if aioredis is None:
+            raise RuntimeError("FSM_STORAGE_URL points to Redis, but the 'redis' package is not installed")
+        self._redis = aioredis.from_url(url)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._redis.get(key)
+
+    async def write(self, set_items, delete_keys=(), touch_keys=(), ttl=None):
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key, value in set_items.items():
+                pipe.set(key, value, ex=ttl)
+            delete_keys = list(delete_keys)
+            if delete_keys:
+                pipe.delete(*delete_keys)
+            for key in touch_keys:
+                if ttl:
+                    pipe.expire(key, ttl)
+                else:
+                    pipe.persist(key)
+            await pipe.execute()
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def _dumps(data: Dict[str, Any]) -> bytes:
+    # Компактный JSON: без пробелов, кириллица без \uXXXX. Даты, Decimal и прочее
+    # не-JSON — TypeError: после чтения они вернулись бы строками, и хендлер
+    # получил бы другой тип, чем сохранил. Кладите в состояние isoformat()/int/str.
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _loads(raw: bytes) -> Dict[str, Any]:
+    return json.loads(raw)
+
+
+class KeyValueStorage(BaseStorage):
+    """
+    FSM storage on top of a KeyValueBackend.
+
+    State and data live under separate keys and share one TTL, which is
+    refreshed on every write: an abandoned booking/add-car flow disappears
+    after `ttl` seconds of inactivity. Empty data is deleted, not stored.
+    """
+
+    def __init__(self, backend: KeyValueBackend, ttl: Optional[int] = None,
+                 key_builder: Optional[KeyBuilder] = None):
+        self.backend = backend
+        self.ttl = ttl
+        self.key_builder = key_builder or DefaultKeyBuilder(prefix='fsm')
+
+    def _keys(self, key: StorageKey):
+        return self.key_builder.build(key, 'state'), self.key_builder.build(key, 'data')
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state_key, data_key = self._keys(key)
+        if isinstance(state, State):
+            state = state.state
+        if state is None:
+            await self.backend.write({}, delete_keys=[state_key])
+        else:
+            await self.backend.write({state_key: state.encode('utf-8')}, touch_keys=[data_key], ttl=self.ttl)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        raw = await self.backend.get(self._keys(key)[0])
+        return raw.decode('utf-8') if raw is not None else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        state_key, data_key = self._keys(key)
+        if not data:
+            await self.backend.write({}, delete_keys=[data_key])
+        else:
+            await self.backend.write({data_key: _dumps(data)}, touch_keys=[state_key], ttl=self.ttl)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        raw = await self.backend.get(self._keys(key)[1])
+        return _loads(raw) if raw is not None else {}
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+
+def create_fsm_storage(url: str = '', ttl: Optional[int] = None) -> KeyValueStorage:
+    """Local storage by default, Redis when url is redis://, rediss:// or unix://."""
+    if url:
+        logger.info("FSM storage: shared key-value backend")
+        backend: KeyValueBackend = RedisBackend(url)
+    else:
+        backend = LocalBackend()
+    return KeyValueStorage(backend, ttl=ttl)
@@ -0,0 +1,161 @@
+import asyncio
+import hmac
+import secrets
+import logging
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+MAX_UPDATE_SIZE = 1024 * 1024  # Telegram присылает апдейты заметно меньше
+
+
+class WebhookApp:
+    """
+    ASGI application that receives Telegram updates over HTTP.
+
+    Each update is validated, put on a bounded queue and acknowledged with
+    200 right away; a fixed pool of worker tasks feeds the queue into the
+    Dispatcher concurrently. When the queue is full the request gets 503
+    and Telegram redelivers it later. Every other request is passed to
+    `fallback` (the Flask admin panel), so both share one Hypercorn server.
+
+    Updates without the X-Telegram-Bot-Api-Secret-Token header are
+    rejected: the endpoint is public, and a forged update could act as an
+    admin. Without `secret_token` a random one is generated and registered
+    by set_webhook at startup, which needs `url`; several processes behind
+    one webhook must share an explicit secret.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, path: str, secret_token: str = None,
+                 url: str = None, fallback=None, workers: int = 8, queue_size: int = 1000):
+        if not secret_token:
+            if not url:
+                raise ValueError("Webhook needs a secret token: set WEBHOOK_SECRET, "
+                                 "or WEBHOOK_URL so that one can be generated and registered")
+            secret_token = secrets.token_urlsafe(32)
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.path = path
+        self.secret_token = secret_token
+        self.url = url
+        self.fallback = fallback
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue = None
+        self._tasks = []
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http' and scope['path'] == self.path:
+            await self._handle_update(scope, receive, send)
+        elif self.fallback is not None:
+            await self.fallback(scope, receive, send)
+        else:
+            await _respond(send, 404)
+
+    # ---------- Жизненный цикл ----------
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self.startup()
+                except Exception as e:
+                    logger.error(f"Webhook startup failed: {e}", exc_info=True)
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def startup(self):
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        await self.dispatcher.emit_startup(bot=self.bot, dispatcher=self.dispatcher, **self.dispatcher.workflow_data)
+        if self.url:
+            await self.bot.set_webhook(
+                self.url + self.path,
+                secret_token=self.secret_token,
+                allowed_updates=self.dispatcher.resolve_used_update_types(),
+            )
+            logger.info(f"Webhook set to {self.url}{self.path}")
+        logger.info(f"Webhook intake started with {self.workers} workers, queue size {self.queue_size}")
+
+    async def shutdown(self, drain_timeout: float = 10.0):
+        # Даём воркерам доработать уже принятые апдейты, затем останавливаем их
+        if self.queue is not None:
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout=drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Webhook shutdown: {self.queue.qsize()} updates left unprocessed")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.dispatcher.emit_shutdown(bot=self.bot, dispatcher=self.dispatcher, **self.dispatcher.workflow_data)
+        await self.bot.session.close()
+
+    # ---------- Приём апдейтов ----------
+    async def _handle_update(self, scope, receive, send):
+        if scope['method'] != 'POST':
+            await _respond(send, 405)
+            return
+        headers = dict(scope['headers'])
+        received = headers.get(b'x-telegram-bot-api-secret-token', b'')
+        if not hmac.compare_digest(received, self.secret_token.encode()):
+            await _respond(send, 401)
+            return
+
+        body = await _read_body(receive)
+        if body is None:
+            await _respond(send, 413)
+            return
+        try:
+            update = Update.model_validate_json(body, context={'bot': self.bot})
+        except Exception as e:
+            logger.warning(f"Invalid update payload: {e}")
+            await _respond(send, 400)
+            return
+
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            logger.warning(f"Webhook queue is full, update {update.update_id} rejected")
+            await _respond(send, 503)
+            return
+        await _respond(send, 200)
+
+    async def _worker(self):
+        while True:
+            update = await self.queue.get()
+            try:
+                await self.dispatcher.feed_update(self.bot, update)
+            except Exception as e:
+                logger.error(f"Error processing update {update.update_id}: {e}", exc_info=True)
+            finally:
+                self.queue.task_done()
+
+
+async def _read_body(receive):
+    """Read the request body; None if it exceeds MAX_UPDATE_SIZE."""
+    body = bytearray()
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if len(body) > MAX_UPDATE_SIZE:
+            return None
+        if not message.get('more_body', False):
+            return bytes(body)
+
+
+async def _respond(send, status):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-length', b'0')],
+    })
+    await send({'type': 'http.response.body', 'body': b''})
@@ -16,8 +16,59 @@ class Config:
     DB_NAME = os.getenv('DB_NAME', 'sharahbot')
     DB_USER = os.getenv('DB_USER', 'postgres')
     DB_PASSWORD = os.getenv('DB_PASSWORD', '')
+    DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', 1))
+    DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', 20))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))     # ожидание свободного соединения, сек
+    DB_POOL_RECYCLE = float(os.getenv('DB_POOL_RECYCLE', 3600))   # пересоздавать соединение через N сек
+    DB_ASYNC_POOL_MIN = int(os.getenv('DB_ASYNC_POOL_MIN', 2))
+    DB_ASYNC_POOL_MAX = int(os.getenv('DB_ASYNC_POOL_MAX', 20))
     
-    # Flask
+    # FSM storage: пусто — в памяти процесса, redis://host:6379/0 — общее для нескольких воркеров
+    FSM_STORAGE_URL = os.getenv('FSM_STORAGE_URL', '')
+    FSM_STATE_TTL = int(os.getenv('FSM_STATE_TTL', 6 * 3600))   # брошенные сценарии удаляются через N сек
+    # Анти-флуд: пусто — корзины в памяти процесса, redis://... — общие для всех воркеров
+    THROTTLE_STORAGE_URL = os.getenv('THROTTLE_STORAGE_URL', '')
+    THROTTLE_MESSAGE_RATE = float(os.getenv('THROTTLE_MESSAGE_RATE', 1.0))    # сообщений/сек в среднем
+    THROTTLE_MESSAGE_BURST = float(os.getenv('THROTTLE_MESSAGE_BURST', 5))    # подряд без ожидания
+    THROTTLE_CALLBACK_RATE = float(os.getenv('THROTTLE_CALLBACK_RATE', 2.0))
+    THROTTLE_CALLBACK_BURST = float(os.getenv('THROTTLE_CALLBACK_BURST', 8))
+    
+    # Режим получения апдейтов: polling или webhook (через Hypercorn вместе с веб-панелью)
+    BOT_MODE = os.getenv('BOT_MODE', 'polling')
+    WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')              # публичный https://host без пути
+    WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram/webhook')
+    WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')        # пусто — сгенерируется при старте (нужен WEBHOOK_URL)
+    WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+    WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', 8080))
+    WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', 8))     # параллельная обработка апдейтов
+    WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', 1000))
+    
+    # Рассылки: лимит Telegram ~30 сообщений/сек на бота
+    BROADCAST_RATE = float(os.getenv('BROADCAST_RATE', 30))
+    BROADCAST_CONCURRENCY = int(os.getenv('BROADCAST_CONCURRENCY', 30))
+    
+    # Отложенные уведомления (после тихих часов)
+    DELAYED_BATCH_SIZE = int(os.getenv('DELAYED_BATCH_SIZE', 100))        # строк за один захват
+    DELAYED_CONCURRENCY = int(os.getenv('DELAYED_CONCURRENCY', 20))       # одновременных отправок
+    DELAYED_SEND_RATE = float(os.getenv('DELAYED_SEND_RATE', 25))         # сообщений/сек
+    DELAYED_RETRY_BASE = int(os.getenv('DELAYED_RETRY_BASE', 30))         # сек, удваивается с каждой попыткой
+    DELAYED_RETRY_MAX = int(os.getenv('DELAYED_RETRY_MAX', 3600))
+    DELAYED_CLAIM_LEASE = int(os.getenv('DELAYED_CLAIM_LEASE', 300))      # через сколько сек захват считается брошенным
+    DELAYED_SAFETY_POLL = int(os.getenv('DELAYED_SAFETY_POLL', 300))      # проверка очереди, если NOTIFY потерялся
+    
+    # Резервные копии: gzip/zstd — сжатый SQL одним потоком, directory — pg_dump -Fd в BACKUP_JOBS потоков
+    BACKUP_DIR = os.getenv('BACKUP_DIR', 'backups')
+    BACKUP_FORMAT = os.getenv('BACKUP_FORMAT', 'gzip')
+    BACKUP_COMPRESSION_LEVEL = int(os.getenv('BACKUP_COMPRESSION_LEVEL', 6))
+    BACKUP_JOBS = int(os.getenv('BACKUP_JOBS', 2))
+    BACKUP_TIMEOUT = int(os.getenv('BACKUP_TIMEOUT', 3600))     # секунд на один дамп
+    BACKUP_KEEP_DAILY = int(os.getenv('BACKUP_KEEP_DAILY', 7))      # хранение: последние N дней,
+    BACKUP_KEEP_WEEKLY = int(os.getenv('BACKUP_KEEP_WEEKLY', 4))    # по одному за N недель
+    BACKUP_KEEP_MONTHLY = int(os.getenv('BACKUP_KEEP_MONTHLY', 6))  # и за N месяцев
+    
+    # Flask (python start.py web — только веб-панель, без бота)
+    WEB_HOST = os.getenv('WEB_HOST', '0.0.0.0')
+    WEB_PORT = int(os.getenv('WEB_PORT', 5000))
     FLASK_SECRET_KEY = os.getenv('FLASK_SECRET_KEY', 'dev-secret-key')
     FLASK_DEBUG = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
     
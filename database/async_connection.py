@@ -0,0 +1,65 @@
+import asyncio
+import logging
+import asyncpg
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Async connection pool (used by the bot handlers running on the event loop)
+async_pool = None
+_pool_lock = asyncio.Lock()
+
+async def init_async_pool():
+    """Initialize the asyncpg connection pool."""
+    global async_pool
+    async with _pool_lock:
+        if async_pool is not None:
+            return async_pool
+        try:
+            async_pool = await asyncpg.create_pool(
+                host=Config.DB_HOST,
+                port=Config.DB_PORT,
+                database=Config.DB_NAME,
+                user=Config.DB_USER,
+                password=Config.DB_PASSWORD,
+                min_size=Config.DB_ASYNC_POOL_MIN,
+                max_size=Config.DB_ASYNC_POOL_MAX,
+                server_settings={'client_encoding': 'UTF8'}
+            )
+            logger.info("Async database connection pool created successfully.")
+        except Exception as e:
+            logger.error(f"Failed to create async connection pool: {e}", exc_info=True)
+            raise
+    return async_pool
+
+async def get_async_pool():
+    """Return the async pool, creating it on first use."""
+    if async_pool is None:
+        await init_async_pool()
+    return async_pool
+
+async def open_dedicated_async_connection():
+    """
+    Open an asyncpg connection outside the pool, e.g. for LISTEN: it stays
+    busy for the whole life of the process. Caller closes it.
+    """
+    return await asyncpg.connect(
+        host=Config.DB_HOST,
+        port=Config.DB_PORT,
+        database=Config.DB_NAME,
+        user=Config.DB_USER,
+        password=Config.DB_PASSWORD,
+        server_settings={'client_encoding': 'UTF8'}
+    )
+
+async def close_async_pool():
+    """Close all connections in the async pool."""
+    global async_pool
+    if async_pool is not None:
+        try:
+            await async_pool.close()
+            logger.info("Async database connections closed.")
+        except Exception as e:
+            logger.error(f"Error closing async pool: {e}", exc_info=True)
+        finally:
+            async_pool = None
@@ -1,42 +1,243 @@
 import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 import psycopg2
-from psycopg2 import pool
+from psycopg2 import extensions, pool
 from config import Config
 
 logger = logging.getLogger(__name__)
 
-# Connection pool
-connection_pool = psycopg2.pool.SimpleConnectionPool(
-    1, 20,
-    host=Config.DB_HOST,
-    port=Config.DB_PORT,
-    database=Config.DB_NAME,
-    user=Config.DB_USER,
-    password=Config.DB_PASSWORD,
-    client_encoding='UTF8'   # <-- добавьте эту строку
-)
+class PoolTimeoutError(pool.PoolError):
+    """Raised when no connection became free within the pool timeout."""
+
+class BoundedConnectionPool:
+    """
+    Thread-safe psycopg2 connection pool.
+
+    Unlike SimpleConnectionPool it can be shared between asyncio.to_thread
+    workers, Flask/Hypercorn threads and APScheduler jobs: when all
+    connections are busy, getconn() waits up to `timeout` seconds instead of
+    raising PoolError. Idle connections are validated before reuse and
+    recycled after `recycle` seconds.
+    """
+
+    def __init__(self, minconn, maxconn, timeout=30.0, recycle=3600.0, ping_after=30.0, **conn_kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_after = ping_after
+        self._conn_kwargs = conn_kwargs
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = deque()      # (conn, returned_at)
+        self._in_use = {}         # id(conn) -> checkout time
+        self._created_at = {}     # id(conn) -> creation time
+        self._size = 0            # opened + reserved connections
+        self._closed = False
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'waiters': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'timeouts': 0,
+            'checkout_time_total': 0.0,
+            'checkout_time_max': 0.0,
+            'recycled': 0,
+        }
+        for _ in range(minconn):
+            with self._cond:
+                self._size += 1
+            self._idle.append((self._connect(), time.monotonic()))
+
+    def _connect(self):
+        try:
+            conn = psycopg2.connect(**self._conn_kwargs)
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        self._created_at[id(conn)] = time.monotonic()
+        return conn
+
+    def _discard(self, conn):
+        """Close a connection and free its slot. Caller must hold the lock."""
+        self._created_at.pop(id(conn), None)
+        self._size -= 1
+        self._stats['recycled'] += 1
+        self._cond.notify()
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_usable(self, conn, returned_at):
+        """Check an idle connection before handing it out (called without the lock)."""
+        if conn.closed:
+            return False
+        now = time.monotonic()
+        if self.recycle and now - self._created_at.get(id(conn), now) > self.recycle:
+            return False
+        if self.ping_after is not None and now - returned_at > self.ping_after:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+            except Exception:
+                return False
+        return True
+
+    def getconn(self, timeout=None):
+        """Get a connection, waiting up to `timeout` seconds if the pool is exhausted."""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = False
+        while True:
+            candidate = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise pool.PoolError("connection pool is closed")
+                    if self._idle:
+                        candidate = self._idle.pop()
+                        break
+                    if self._size < self.maxconn:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        logger.warning(
+                            f"Connection pool exhausted: no connection freed within {timeout:.1f}s "
+                            f"({self._stats['waiters']} other waiters)"
+                        )
+                        raise PoolTimeoutError(f"no connection available within {timeout:.1f}s")
+                    if not waited:
+                        waited = True
+                        self._stats['waits'] += 1
+                    self._stats['waiters'] += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._stats['waiters'] -= 1
+
+            if candidate is None:
+                conn = self._connect()
+            else:
+                conn, returned_at = candidate
+                if not self._is_usable(conn, returned_at):
+                    with self._cond:
+                        self._discard(conn)
+                    continue
+
+            now = time.monotonic()
+            with self._cond:
+                self._in_use[id(conn)] = now
+                self._stats['checkouts'] += 1
+                if waited:
+                    wait_time = now - started
+                    self._stats['wait_time_total'] += wait_time
+                    self._stats['wait_time_max'] = max(self._stats['wait_time_max'], wait_time)
+            return conn
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def owns(self, conn):
+        """True if `conn` was checked out from this pool and not returned yet."""
+        with self._cond:
+            return id(conn) in self._in_use
+
+    def putconn(self, conn, close=False):
+        """
+        Return a connection to the pool (rolling back any open transaction).
+        Connections returned after closeall() are closed instead of kept.
+        """
+        if not close and not conn.closed:
+            try:
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                close = True
+        with self._cond:
+            checked_out = self._in_use.pop(id(conn), None)
+            if checked_out is None:
+                raise pool.PoolError("trying to put unkeyed connection")
+            held = time.monotonic() - checked_out
+            self._stats['checkout_time_total'] += held
+            self._stats['checkout_time_max'] = max(self._stats['checkout_time_max'], held)
+            if close or conn.closed or self._closed:
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def closeall(self):
+        """
+        Close idle connections and refuse new checkouts. Connections still
+        checked out are closed by putconn() when their holders return them.
+        """
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._discard(conn)
+            self._cond.notify_all()
+
+    def stats(self):
+        """Snapshot of pool counters."""
+        with self._cond:
+            snapshot = dict(self._stats)
+            snapshot.update({
+                'size': self._size,
+                'max_size': self.maxconn,
+                'in_use': len(self._in_use),
+                'idle': len(self._idle),
+            })
+        checkouts = snapshot['checkouts']
+        snapshot['wait_time_avg'] = snapshot['wait_time_total'] / snapshot['waits'] if snapshot['waits'] else 0.0
+        snapshot['checkout_time_avg'] = snapshot['checkout_time_total'] / checkouts if checkouts else 0.0
+        return snapshot
+
+# Connection pool (created lazily on first use)
+connection_pool = None
+# Закрытые пулы, у которых ещё есть выданные соединения: их закроет возврат
+_retired_pools = []
+_init_lock = threading.Lock()
 
 def init_connection_pool():
-    """Initialize the connection pool."""
+    """Initialize the connection pool (again, if the previous one was closed)."""
     global connection_pool
-    try:
-        connection_pool = psycopg2.pool.SimpleConnectionPool(
-            1, 20,  # min and max connections
-            host=Config.DB_HOST,
-            port=Config.DB_PORT,
-            database=Config.DB_NAME,
-            user=Config.DB_USER,
-            password=Config.DB_PASSWORD
-        )
-        logger.info("Database connection pool created successfully.")
-    except Exception as e:
-        logger.error(f"Failed to create connection pool: {e}", exc_info=True)
-        raise
+    with _init_lock:
+        if connection_pool is not None and not connection_pool.closed:
+            return
+        if connection_pool is not None and connection_pool.stats()['in_use']:
+            _retired_pools.append(connection_pool)
+        try:
+            connection_pool = BoundedConnectionPool(
+                Config.DB_POOL_MIN, Config.DB_POOL_MAX,
+                timeout=Config.DB_POOL_TIMEOUT,
+                recycle=Config.DB_POOL_RECYCLE,
+                host=Config.DB_HOST,
+                port=Config.DB_PORT,
+                database=Config.DB_NAME,
+                user=Config.DB_USER,
+                password=Config.DB_PASSWORD,
+                client_encoding='UTF8'
+            )
+            logger.info("Database connection pool created successfully.")
+        except Exception as e:
+            logger.error(f"Failed to create connection pool: {e}", exc_info=True)
+            raise
 
 def get_db_connection():
     """Get a connection from the pool."""
-    global connection_pool
-    if connection_pool is None:
+    if connection_pool is None or connection_pool.closed:
         init_connection_pool()
     try:
         conn = connection_pool.getconn()
@@ -45,21 +246,100 @@ def get_db_connection():
         logger.error(f"Error getting connection from pool: {e}", exc_info=True)
         raise
 
-def return_db_connection(conn):
-    """Return a connection to the pool."""
-    global connection_pool
-    if connection_pool:
+def return_db_connection(conn, close=False):
+    """Return a connection to the pool (close=True discards it)."""
+    owner = connection_pool
+    for retired in list(_retired_pools):
+        if retired.owns(conn):
+            owner = retired
+            break
+    if owner is None:
+        conn.close()
+        return
+    try:
+        owner.putconn(conn, close=close)
+    except Exception as e:
+        logger.error(f"Error returning connection to pool: {e}", exc_info=True)
+    if owner is not connection_pool and not owner.stats()['in_use']:
         try:
-            connection_pool.putconn(conn)
-        except Exception as e:
-            logger.error(f"Error returning connection to pool: {e}", exc_info=True)
+            _retired_pools.remove(owner)
+        except ValueError:
+            pass
+
+@contextmanager
+def transaction(readonly=False, autocommit=False):
+    """
+    Yield a cursor inside a transaction.
+
+    Commits when the block exits normally, rolls back on any exception and
+    always returns the connection to the pool:
+
+        with transaction() as cur:
+            cur.execute(...)
+
+    readonly=True starts a READ ONLY transaction; autocommit=True runs each
+    statement on its own (no BEGIN/COMMIT), e.g. for VACUUM or long reads.
+    """
+    conn = get_db_connection()
+    broken = False
+    try:
+        if autocommit:
+            conn.autocommit = True
+        elif readonly:
+            conn.readonly = True
+        with conn.cursor() as cur:
+            yield cur
+        if not autocommit:
+            conn.commit()
+    except Exception:
+        if not autocommit and not conn.closed:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+        raise
+    finally:
+        if not conn.closed and not broken:
+            try:
+                # Сбрасываем режим сессии, чтобы он не «утёк» к следующему потребителю пула
+                conn.autocommit = False
+                conn.readonly = None
+            except Exception:
+                broken = True
+        return_db_connection(conn, close=broken)
+
+def read():
+    """Read-only transaction: `with read() as cur: ...`"""
+    return transaction(readonly=True)
+
+def open_dedicated_connection():
+    """
+    Open a connection outside the pool, e.g. for LISTEN: it stays busy for the
+    whole life of the process and must not take a pool slot. Caller closes it.
+    """
+    return psycopg2.connect(
+        host=Config.DB_HOST,
+        port=Config.DB_PORT,
+        database=Config.DB_NAME,
+        user=Config.DB_USER,
+        password=Config.DB_PASSWORD,
+        client_encoding='UTF8'
+    )
+
+def get_pool_stats():
+    """Return pool counters (in-use, waiters, wait time, checkout duration)."""
+    if connection_pool is None:
+        return {}
+    return connection_pool.stats()
 
 def close_all_connections():
-    """Close all connections in the pool."""
-    global connection_pool
+    """
+    Close all connections in the pool. The pool object is kept (marked
+    closed), so connections still in use are closed when they are returned.
+    """
     if connection_pool:
         try:
             connection_pool.closeall()
             logger.info("All database connections closed.")
         except Exception as e:
-            logger.error(f"Error closing connections: {e}", exc_info=True)
\ No newline at end of file
+            logger.error(f"Error closing connections: {e}", exc_info=True)
@@ -1,45 +1,84 @@
-from database.connection import get_db_connection, return_db_connection
+from database.connection import transaction, read
+from utils.pagination import decode_cursor, page_from_rows, count_rows
+from utils.cache import add_occupancy, invalidate_occupancy
+from datetime import date as date_type, time as time_type
 import logging
 
 logger = logging.getLogger(__name__)
 
-def create_appointment(data):
-    """Create a new appointment."""
-    conn = get_db_connection()
-    cur = conn.cursor()
+def _to_date(value):
+    return date_type.fromisoformat(value) if isinstance(value, str) else value
+
+def _to_time(value):
+    return time_type.fromisoformat(value) if isinstance(value, str) else value
+
+def _slot_is_full(cur, day, start, duration, capacity):
+    """
+    True if `capacity` active appointments already overlap [start, start + duration).
+    Same check and per-date advisory lock as database.crud_async.appointments.
+    """
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext('appointments'), %s)", (day.toordinal(),))
+    minute = start.hour * 60 + start.minute
+    cur.execute("""
+        WITH busy AS (
+            SELECT EXTRACT(HOUR FROM time)::int * 60 + EXTRACT(MINUTE FROM time)::int AS s,
+                   duration_minutes
+            FROM appointments
+            WHERE date = %(day)s AND status <> 'cancelled'
+        )
+        SELECT COALESCE(MAX((
+            SELECT COUNT(*) FROM busy b WHERE b.s <= p.m AND b.s + b.duration_minutes > p.m
+        )), 0)
+        FROM (SELECT %(start)s::int AS m UNION SELECT s FROM busy WHERE s > %(start)s AND s < %(end)s) p
+    """, {'day': day, 'start': minute, 'end': minute + duration})
+    overlap = cur.fetchone()[0]
+    if overlap >= capacity:
+        logger.info(f"Slot {day} {start} is full ({overlap}/{capacity}).")
+        return True
+    return False
+
+def create_appointment(data, capacity):
+    """
+    Create a new appointment if fewer than `capacity` active appointments
+    overlap its time (see database.crud_async.appointments.create_appointment).
+    Returns None if the slot is full.
+    """
+    day = _to_date(data['date'])
+    start = _to_time(data['time'])
+    duration = data.get('duration_minutes') or 30
+    status = data.get('status', 'pending')
     try:
-        cur.execute("""
-            INSERT INTO appointments
-                (user_id, service_id, user_car_id, tire_size_id, date, time, status, notes)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING id
-        """, (
-            data['user_id'],
-            data.get('service_id'),
-            data.get('user_car_id'),
-            data.get('tire_size_id'),
-            data['date'],
-            data['time'],
-            data.get('status', 'pending'),
-            data.get('notes')
-        ))
-        apt_id = cur.fetchone()[0]
-        conn.commit()
+        with transaction() as cur:
+            if status != 'cancelled' and _slot_is_full(cur, day, start, duration, capacity):
+                return None
+            cur.execute("""
+                INSERT INTO appointments
+                    (user_id, service_id, user_car_id, tire_size_id, date, time, status, notes, duration_minutes)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                RETURNING id
+            """, (
+                data['user_id'],
+                data.get('service_id'),
+                data.get('user_car_id'),
+                data.get('tire_size_id'),
+                day,
+                start,
+                status,
+                data.get('notes'),
+                duration
+            ))
+            apt_id = cur.fetchone()[0]
+        if status != 'cancelled':
+            add_occupancy(day, start.hour * 60 + start.minute, duration)
         logger.info(f"Appointment {apt_id} created.")
         return apt_id
     except Exception as e:
-        conn.rollback()
         logger.error(f"Error creating appointment: {e}")
         raise
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def get_appointment(appointment_id):
     """Get appointment by ID with related data."""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with read() as cur:
         cur.execute("""
             SELECT a.id, a.user_id, u.full_name, u.phone, a.date, a.time,
                    s.name as service_name, a.status, a.notes,
@@ -71,15 +110,13 @@ def get_appointment(appointment_id):
                 'tire': f"{row[12]}/{row[13]} R{row[14]}" if row[12] else None
             }
         return None
-    finally:
-        cur.close()
-        return_db_connection(conn)
-
-def get_appointments(page=1, per_page=50, date=None, status=None):
-    """Get paginated list of appointments with filters."""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    offset = (page - 1) * per_page
+
+def get_appointments(per_page=50, date=None, status=None, after=None, count='approx'):
+    """
+    Get a page of appointments with filters, latest first (keyset pagination).
+    after: cursor from the previous page's next_cursor; count: see count_rows.
+    Returns Page(items, total, next_cursor).
+    """
     params = []
     where_clauses = []
     if date:
@@ -88,47 +125,38 @@ def get_appointments(page=1, per_page=50, date=None, status=None):
     if status:
         where_clauses.append("a.status = %s")
         params.append(status)
+    filter_sql = "WHERE " + " AND ".join(where_clauses) if where_clauses else ""
+    key = decode_cursor(after, 'date', 'time', 'int')
+    if key:
+        where_clauses.append("(a.date, a.time, a.id) < (%s, %s, %s)")
     where_sql = "WHERE " + " AND ".join(where_clauses) if where_clauses else ""
 
-    try:
+    with read() as cur:
         query = f"""
             SELECT a.id, a.date, a.time, u.full_name, s.name, a.status
             FROM appointments a
             JOIN users u ON a.user_id = u.user_id
             LEFT JOIN services s ON a.service_id = s.id
             {where_sql}
-            ORDER BY a.date DESC, a.time DESC
-            LIMIT %s OFFSET %s
+            ORDER BY a.date DESC, a.time DESC, a.id DESC
+            LIMIT %s
         """
-        cur.execute(query, params + [per_page, offset])
+        cur.execute(query, params + list(key or ()) + [per_page + 1])
         rows = cur.fetchall()
+        total = count_rows(cur, 'appointments', filter_sql, params, mode=count, alias='a')
 
-        # Count total
-        count_query = f"""
-            SELECT COUNT(*) FROM appointments a
-            {where_sql}
-        """
-        cur.execute(count_query, params)
-        total = cur.fetchone()[0]
-
-        appointments = [{
-            'id': r[0],
-            'date': r[1],
-            'time': r[2],
-            'client_name': r[3],
-            'service': r[4],
-            'status': r[5]
-        } for r in rows]
-        return appointments, total
-    finally:
-        cur.close()
-        return_db_connection(conn)
+    return page_from_rows(rows, per_page, lambda r: {
+        'id': r[0],
+        'date': r[1],
+        'time': r[2],
+        'client_name': r[3],
+        'service': r[4],
+        'status': r[5]
+    }, lambda r: (r[1], r[2], r[0]), total)
 
 def get_appointments_by_date(date):
     """Get all appointments for a specific date."""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with read() as cur:
         cur.execute("""
             SELECT a.id, a.time, u.full_name, s.name, a.status
             FROM appointments a
@@ -145,78 +173,89 @@ def get_appointments_by_date(date):
             'service': r[3],
             'status': r[4]
         } for r in rows]
-    finally:
-        cur.close()
-        return_db_connection(conn)
-
-def update_appointment_status(appointment_id, status, admin_comment=None):
-    """Update appointment status."""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+
+def get_occupancy(date_from, date_to):
+    """
+    Active appointments of a date range, one grouped row per day:
+    {date: [(start minute of day, duration_minutes), ...]}. Days without
+    appointments are absent.
+    """
+    with read() as cur:
         cur.execute("""
-            UPDATE appointments SET status = %s, admin_comment = %s
-            WHERE id = %s
-        """, (status, admin_comment, appointment_id))
-        conn.commit()
+            SELECT date,
+                   array_agg(EXTRACT(HOUR FROM time)::int * 60 + EXTRACT(MINUTE FROM time)::int),
+                   array_agg(duration_minutes)
+            FROM appointments
+            WHERE date BETWEEN %s AND %s AND status <> 'cancelled'
+            GROUP BY date
+        """, (date_from, date_to))
+        return {r[0]: list(zip(r[1], r[2])) for r in cur.fetchall()}
+
+def update_appointment_status(appointment_id, status, capacity, admin_comment=None):
+    """
+    Update appointment status; bringing a cancelled appointment back re-checks
+    capacity under the per-date lock. Returns True if updated, False if its
+    slot is full, None if there is no such appointment.
+    """
+    try:
+        with transaction() as cur:
+            cur.execute("""
+                SELECT date, time, duration_minutes, status FROM appointments
+                WHERE id = %s FOR UPDATE
+            """, (appointment_id,))
+            row = cur.fetchone()
+            if row is None:
+                logger.warning(f"Appointment {appointment_id} not found.")
+                return None
+            day, start, duration, old_status = row
+            if (old_status == 'cancelled' and status != 'cancelled'
+                    and _slot_is_full(cur, day, start, duration, capacity)):
+                return False
+            cur.execute(
+                "UPDATE appointments SET status = %s, admin_comment = %s WHERE id = %s",
+                (status, admin_comment, appointment_id)
+            )
+        invalidate_occupancy(day)
         logger.info(f"Appointment {appointment_id} status updated to {status}.")
+        return True
     except Exception as e:
-        conn.rollback()
         logger.error(f"Error updating appointment {appointment_id}: {e}")
         raise
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def delete_appointment(appointment_id):
     """Delete appointment."""
-    conn = get_db_connection()
-    cur = conn.cursor()
     try:
-        cur.execute("DELETE FROM appointments WHERE id = %s", (appointment_id,))
-        conn.commit()
+        with transaction() as cur:
+            cur.execute("DELETE FROM appointments WHERE id = %s RETURNING date", (appointment_id,))
+            row = cur.fetchone()
+        if row:
+            invalidate_occupancy(row[0])
         logger.info(f"Appointment {appointment_id} deleted.")
     except Exception as e:
-        conn.rollback()
         logger.error(f"Error deleting appointment {appointment_id}: {e}")
         raise
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def get_appointments_count(status=None):
     """Get count of appointments (optionally by status)."""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with read() as cur:
         if status:
             cur.execute("SELECT COUNT(*) FROM appointments WHERE status = %s", (status,))
         else:
             cur.execute("SELECT COUNT(*) FROM appointments")
         return cur.fetchone()[0]
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def get_appointments_today_count():
     """Get count of appointments for today."""
     from datetime import date
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with read() as cur:
         cur.execute("SELECT COUNT(*) FROM appointments WHERE date = %s", (date.today(),))
         return cur.fetchone()[0]
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def get_user_appointments(user_id: int) -> list:
     """
     Возвращает список записей для конкретного пользователя.
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with read() as cur:
         cur.execute("""
             SELECT a.id, a.date, a.time, s.name as service, a.status
             FROM appointments a
@@ -231,7 +270,4 @@ def get_user_appointments(user_id: int) -> list:
             'time': str(r[2]),
             'service': r[3],
             'status': r[4]
-        } for r in rows]
-    finally:
-        cur.close()
-        return_db_connection(conn)
\ No newline at end of file
+        } for r in rows]
\ No newline at end of file
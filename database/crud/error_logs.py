@@ -1,30 +1,26 @@
-from database.connection import get_db_connection, return_db_connection
+from database.connection import transaction, read
+from utils.pagination import decode_cursor, page_from_rows, count_rows
 import json
 import logging
 
 logger = logging.getLogger(__name__)
 
 def log_error(level, source, message, user_id=None, traceback=None, request_data=None):
-    conn = get_db_connection()
-    cur = conn.cursor()
     try:
-        cur.execute("""
-            INSERT INTO error_logs (level, source, user_id, message, traceback, request_data)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (level, source, user_id, message, traceback, json.dumps(request_data) if request_data else None))
-        conn.commit()
+        with transaction() as cur:
+            cur.execute("""
+                INSERT INTO error_logs (level, source, user_id, message, traceback, request_data)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, (level, source, user_id, message, traceback, json.dumps(request_data) if request_data else None))
     except Exception as e:
-        conn.rollback()
         # Fallback to print
         print(f"Error logging to DB: {e}")
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
-def get_error_logs(page=1, per_page=50, level=None, search=None):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    offset = (page - 1) * per_page
+def get_error_logs(per_page=50, level=None, search=None, after=None, count='approx'):
+    """
+    Page of error logs, newest first. Keyset by id (ids grow with created_at),
+    so deep pages cost the same as the first one. Returns Page(items, total, next_cursor).
+    """
     params = []
     where = []
     if level:
@@ -33,38 +29,33 @@ def get_error_logs(page=1, per_page=50, level=None, search=None):
     if search:
         where.append("message ILIKE %s")
         params.append(f'%{search}%')
+    filter_sql = "WHERE " + " AND ".join(where) if where else ""
+    key = decode_cursor(after, 'int')
+    if key:
+        where.append("id < %s")
     where_sql = "WHERE " + " AND ".join(where) if where else ""
-    try:
+    with read() as cur:
         query = f"""
             SELECT id, level, source, user_id, message, created_at
             FROM error_logs
             {where_sql}
-            ORDER BY created_at DESC
-            LIMIT %s OFFSET %s
+            ORDER BY id DESC
+            LIMIT %s
         """
-        cur.execute(query, params + [per_page, offset])
+        cur.execute(query, params + list(key or ()) + [per_page + 1])
         rows = cur.fetchall()
-        # Count
-        count_query = f"SELECT COUNT(*) FROM error_logs {where_sql}"
-        cur.execute(count_query, params)
-        total = cur.fetchone()[0]
-        logs = [{
-            'id': r[0],
-            'level': r[1],
-            'source': r[2],
-            'user_id': r[3],
-            'message': r[4],
-            'created_at': r[5]
-        } for r in rows]
-        return logs, total
-    finally:
-        cur.close()
-        return_db_connection(conn)
+        total = count_rows(cur, 'error_logs', filter_sql, params, mode=count)
+    return page_from_rows(rows, per_page, lambda r: {
+        'id': r[0],
+        'level': r[1],
+        'source': r[2],
+        'user_id': r[3],
+        'message': r[4],
+        'created_at': r[5]
+    }, lambda r: (r[0],), total)
 
 def get_log_details(log_id):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with read() as cur:
         cur.execute("""
             SELECT level, source, user_id, message, traceback, request_data, created_at
             FROM error_logs WHERE id = %s
@@ -81,14 +72,9 @@ def get_log_details(log_id):
                 'created_at': row[6].isoformat() if row[6] else None
             }
         return None
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def get_error_stats():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with read() as cur:
         cur.execute("""
             SELECT id, error_type, count, first_seen, last_seen, resolved
             FROM error_stats
@@ -103,21 +89,12 @@ def get_error_stats():
             'last_seen': r[4],
             'resolved': r[5]
         } for r in rows]
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def mark_error_resolved(stat_id, comment=''):
-    conn = get_db_connection()
-    cur = conn.cursor()
     try:
-        cur.execute("UPDATE error_stats SET resolved = TRUE, resolved_at = NOW(), comment = %s WHERE id = %s",
-                    (comment, stat_id))
-        conn.commit()
+        with transaction() as cur:
+            cur.execute("UPDATE error_stats SET resolved = TRUE, resolved_at = NOW(), comment = %s WHERE id = %s",
+                        (comment, stat_id))
     except Exception as e:
-        conn.rollback()
         logger.error(f"Error marking error resolved: {e}")
-        raise
-    finally:
-        cur.close()
-        return_db_connection(conn)
\ No newline at end of file
+        raise
\ No newline at end of file
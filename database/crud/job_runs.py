@@ -0,0 +1,57 @@
+from database.connection import transaction, read
+import logging
+
+logger = logging.getLogger(__name__)
+
+def start_job_run(job_id, node):
+    """Record the start of a job run; returns the run id."""
+    with transaction() as cur:
+        cur.execute("""
+            INSERT INTO job_runs (job_id, node) VALUES (%s, %s) RETURNING id
+        """, (job_id, node))
+        return cur.fetchone()[0]
+
+def finish_job_run(run_id, status, duration_ms, error=None):
+    try:
+        with transaction() as cur:
+            cur.execute("""
+                UPDATE job_runs
+                SET status = %s, finished_at = NOW(), duration_ms = %s, error = %s
+                WHERE id = %s
+            """, (status, duration_ms, error[:2000] if error else None, run_id))
+    except Exception as e:
+        logger.error(f"Error finishing job run {run_id}: {e}")
+        raise
+
+def get_job_stats(days=7):
+    """Per-job summary for the last `days` days: runs, errors, avg/max duration, last run."""
+    with read() as cur:
+        cur.execute("""
+            SELECT job_id,
+                   COUNT(*) AS runs,
+                   COUNT(*) FILTER (WHERE status = 'error') AS errors,
+                   AVG(duration_ms)::int AS avg_ms,
+                   MAX(duration_ms) AS max_ms,
+                   MAX(started_at) AS last_started_at,
+                   (ARRAY_AGG(status ORDER BY started_at DESC))[1] AS last_status,
+                   (ARRAY_AGG(node ORDER BY started_at DESC))[1] AS last_node
+            FROM job_runs
+            WHERE started_at >= NOW() - make_interval(days => %s)
+            GROUP BY job_id
+            ORDER BY job_id
+        """, (days,))
+        return [{
+            'job_id': r[0],
+            'runs': r[1],
+            'errors': r[2],
+            'avg_ms': r[3],
+            'max_ms': r[4],
+            'last_started_at': r[5].isoformat() if r[5] else None,
+            'last_status': r[6],
+            'last_node': r[7]
+        } for r in cur.fetchall()]
+
+def cleanup_job_runs(keep_days=30):
+    with transaction() as cur:
+        cur.execute("DELETE FROM job_runs WHERE started_at < NOW() - make_interval(days => %s)", (keep_days,))
+        return cur.rowcount
@@ -1,33 +1,25 @@
-from database.connection import get_db_connection, return_db_connection
+from database.connection import transaction, read
 import logging
 
 logger = logging.getLogger(__name__)
 
 def create_review(user_id, appointment_id, rating, text=None):
-    conn = get_db_connection()
-    cur = conn.cursor()
     try:
-        cur.execute("""
-            INSERT INTO reviews (user_id, appointment_id, rating, text)
-            VALUES (%s, %s, %s, %s)
-            RETURNING id
-        """, (user_id, appointment_id, rating, text))
-        review_id = cur.fetchone()[0]
-        conn.commit()
+        with transaction() as cur:
+            cur.execute("""
+                INSERT INTO reviews (user_id, appointment_id, rating, text)
+                VALUES (%s, %s, %s, %s)
+                RETURNING id
+            """, (user_id, appointment_id, rating, text))
+            review_id = cur.fetchone()[0]
         logger.info(f"Review {review_id} created.")
         return review_id
     except Exception as e:
-        conn.rollback()
         logger.error(f"Error creating review: {e}")
         raise
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def get_review(review_id):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with read() as cur:
         cur.execute("""
             SELECT r.id, r.user_id, u.full_name, r.appointment_id, a.date, a.time,
                    r.rating, r.text, r.created_at
@@ -50,14 +42,9 @@ def get_review(review_id):
                 'created_at': row[8]
             }
         return None
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def get_recent_reviews(limit=5):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with read() as cur:
         cur.execute("""
             SELECT r.id, u.full_name, r.rating, r.text, r.created_at
             FROM reviews r
@@ -73,14 +60,9 @@ def get_recent_reviews(limit=5):
             'text': r[3],
             'created_at': r[4]
         } for r in rows]
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def get_reviews_by_user(user_id):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with read() as cur:
         cur.execute("""
             SELECT id, appointment_id, rating, text, created_at
             FROM reviews
@@ -95,21 +77,12 @@ def get_reviews_by_user(user_id):
             'text': r[3],
             'created_at': r[4]
         } for r in rows]
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def delete_review(review_id):
-    conn = get_db_connection()
-    cur = conn.cursor()
     try:
-        cur.execute("DELETE FROM reviews WHERE id = %s", (review_id,))
-        conn.commit()
+        with transaction() as cur:
+            cur.execute("DELETE FROM reviews WHERE id = %s", (review_id,))
         logger.info(f"Review {review_id} deleted.")
     except Exception as e:
-        conn.rollback()
         logger.error(f"Error deleting review {review_id}: {e}")
-        raise
-    finally:
-        cur.close()
-        return_db_connection(conn)
\ No newline at end of file
+        raise
\ No newline at end of file
@@ -1,35 +1,29 @@
-from database.connection import get_db_connection, return_db_connection
+from database.connection import transaction, read
 import logging
 
 logger = logging.getLogger(__name__)
 
 def create_service(data):
-    conn = get_db_connection()
-    cur = conn.cursor()
     try:
-        cur.execute("""
-            INSERT INTO services (name, description, price, vehicle_type_id, is_active)
-            VALUES (%s, %s, %s, %s, %s)
-            RETURNING id
-        """, (data['name'], data.get('description'), data.get('price'), data.get('vehicle_type_id'), data.get('is_active', True)))
-        svc_id = cur.fetchone()[0]
-        conn.commit()
+        with transaction() as cur:
+            cur.execute("""
+                INSERT INTO services (name, description, price, vehicle_type_id, is_active, duration_minutes)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                RETURNING id
+            """, (data['name'], data.get('description'), data.get('price'), data.get('vehicle_type_id'),
+                  data.get('is_active', True), data.get('duration_minutes') or 30))
+            svc_id = cur.fetchone()[0]
         logger.info(f"Service {svc_id} created.")
         return svc_id
     except Exception as e:
-        conn.rollback()
         logger.error(f"Error creating service: {e}")
         raise
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def get_service(service_id):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with read() as cur:
         cur.execute("""
-            SELECT s.id, s.name, s.description, s.price, vt.name as vehicle_type, s.is_active
+            SELECT s.id, s.name, s.description, s.price, vt.name as vehicle_type, s.is_active,
+                   s.duration_minutes
             FROM services s
             LEFT JOIN vehicle_types vt ON s.vehicle_type_id = vt.id
             WHERE s.id = %s
@@ -42,20 +36,17 @@ def get_service(service_id):
                 'description': row[2],
                 'price': row[3],
                 'vehicle_type': row[4],
-                'is_active': row[5]
+                'is_active': row[5],
+                'duration_minutes': row[6]
             }
         return None
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def get_services(vehicle_type_id=None):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with read() as cur:
         if vehicle_type_id:
             cur.execute("""
-                SELECT s.id, s.name, s.description, s.price, vt.name as vehicle_type, s.is_active
+                SELECT s.id, s.name, s.description, s.price, vt.name as vehicle_type, s.is_active,
+                   s.duration_minutes
                 FROM services s
                 LEFT JOIN vehicle_types vt ON s.vehicle_type_id = vt.id
                 WHERE s.vehicle_type_id = %s OR s.vehicle_type_id IS NULL
@@ -63,7 +54,8 @@ def get_services(vehicle_type_id=None):
             """, (vehicle_type_id,))
         else:
             cur.execute("""
-                SELECT s.id, s.name, s.description, s.price, vt.name as vehicle_type, s.is_active
+                SELECT s.id, s.name, s.description, s.price, vt.name as vehicle_type, s.is_active,
+                   s.duration_minutes
                 FROM services s
                 LEFT JOIN vehicle_types vt ON s.vehicle_type_id = vt.id
                 ORDER BY s.name
@@ -75,56 +67,39 @@ def get_services(vehicle_type_id=None):
             'description': r[2],
             'price': r[3],
             'vehicle_type_name': r[4],
-            'is_active': r[5]
+            'is_active': r[5],
+            'duration_minutes': r[6]
         } for r in rows]
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def update_service(service_id, data):
-    conn = get_db_connection()
-    cur = conn.cursor()
     try:
-        cur.execute("""
-            UPDATE services SET
-                name = %s,
-                description = %s,
-                price = %s,
-                vehicle_type_id = %s,
-                is_active = %s
-            WHERE id = %s
-        """, (data['name'], data.get('description'), data.get('price'), data.get('vehicle_type_id'), data.get('is_active'), service_id))
-        conn.commit()
+        with transaction() as cur:
+            cur.execute("""
+                UPDATE services SET
+                    name = %s,
+                    description = %s,
+                    price = %s,
+                    vehicle_type_id = %s,
+                    is_active = %s,
+                    duration_minutes = COALESCE(%s, duration_minutes)
+                WHERE id = %s
+            """, (data['name'], data.get('description'), data.get('price'), data.get('vehicle_type_id'),
+                  data.get('is_active'), data.get('duration_minutes'), service_id))
         logger.info(f"Service {service_id} updated.")
     except Exception as e:
-        conn.rollback()
         logger.error(f"Error updating service {service_id}: {e}")
         raise
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def delete_service(service_id):
-    conn = get_db_connection()
-    cur = conn.cursor()
     try:
-        cur.execute("DELETE FROM services WHERE id = %s", (service_id,))
-        conn.commit()
+        with transaction() as cur:
+            cur.execute("DELETE FROM services WHERE id = %s", (service_id,))
         logger.info(f"Service {service_id} deleted.")
     except Exception as e:
-        conn.rollback()
         logger.error(f"Error deleting service {service_id}: {e}")
         raise
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def get_services_count():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with read() as cur:
         cur.execute("SELECT COUNT(*) FROM services WHERE is_active = TRUE")
-        return cur.fetchone()[0]
-    finally:
-        cur.close()
-        return_db_connection(conn)
\ No newline at end of file
+        return cur.fetchone()[0]
\ No newline at end of file
@@ -1,45 +1,191 @@
-from database.connection import get_db_connection, return_db_connection
+from database.connection import transaction, read, open_dedicated_connection
+from datetime import datetime, time
+import select
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Канал NOTIFY: payload — ключ изменённой настройки
+SETTINGS_CHANNEL = 'settings_changed'
+
+class SettingsSnapshot:
+    """
+    In-process copy of the settings table with typed accessors.
+
+    The dict is replaced as a whole (copy-on-write), so readers in any thread
+    or coroutine see a consistent snapshot without locking. Subscribers get
+    the set of changed keys after every reload or local update.
+    """
+
+    TRUE_VALUES = ('true', '1', 'yes', 'on')
+
+    def __init__(self):
+        self._values = None
+        self._lock = threading.Lock()
+        self._subscribers = []
+
+    @property
+    def loaded(self) -> bool:
+        return self._values is not None
+
+    def replace(self, values: dict):
+        """Install a freshly loaded table and notify about keys that differ."""
+        with self._lock:
+            old = self._values
+            self._values = dict(values)
+            previous = old or {}
+            changed = {k for k in previous.keys() | values.keys() if previous.get(k) != values.get(k)}
+        # Первая загрузка — не изменение; а вот после пустого снимка — уже да
+        if changed and old is not None:
+            self._notify(changed)
+
+    def set(self, key: str, value):
+        with self._lock:
+            values = dict(self._values or {})
+            if values.get(key) == value:
+                return
+            values[key] = value
+            self._values = values
+        self._notify({key})
+
+    def subscribe(self, callback):
+        """callback(changed_keys: set) — вызывается из потока, изменившего снимок."""
+        self._subscribers.append(callback)
+
+    def _notify(self, keys):
+        for callback in list(self._subscribers):
+            try:
+                callback(keys)
+            except Exception as e:
+                logger.error(f"Settings subscriber {callback!r} failed: {e}", exc_info=True)
+
+    # ---------- Типизированный доступ ----------
+    def get(self, key, default=None):
+        value = (self._values or {}).get(key)
+        return value if value is not None else default
+
+    def get_bool(self, key, default=False) -> bool:
+        value = self.get(key)
+        return value.strip().lower() in self.TRUE_VALUES if value is not None else default
+
+    def get_int(self, key, default=0) -> int:
+        try:
+            return int(self.get(key))
+        except (TypeError, ValueError):
+            return default
+
+    def get_list(self, key, default=()) -> list:
+        """Comma-separated value as a list of non-empty stripped items."""
+        value = self.get(key)
+        if not value:
+            return list(default)
+        return [item.strip() for item in value.split(',') if item.strip()]
+
+    def get_time(self, key, default: time = None) -> time:
+        """'HH:MM' value as datetime.time."""
+        try:
+            return datetime.strptime(self.get(key).strip(), '%H:%M').time()
+        except (AttributeError, ValueError):
+            return default
+
+snapshot = SettingsSnapshot()
+
+def load_settings():
+    """Reload the whole settings table into the snapshot with one query."""
+    with read() as cur:
+        cur.execute("SELECT key, value FROM settings")
+        snapshot.replace(dict(cur.fetchall()))
+    return snapshot
+
+def get_settings() -> SettingsSnapshot:
+    """Settings snapshot, loaded on first use."""
+    if not snapshot.loaded:
+        load_settings()
+    return snapshot
+
+def subscribe(callback):
+    """Call callback(changed_keys) whenever settings change (locally or in another process)."""
+    snapshot.subscribe(callback)
+
 def get_setting(key, default=None):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute("SELECT value FROM settings WHERE key = %s", (key,))
-        row = cur.fetchone()
-        return row[0] if row else default
-    finally:
-        cur.close()
-        return_db_connection(conn)
+    return get_settings().get(key, default)
 
 def update_setting(key, value):
-    conn = get_db_connection()
-    cur = conn.cursor()
     try:
-        cur.execute("""
-            INSERT INTO settings (key, value) VALUES (%s, %s)
-            ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value
-        """, (key, value))
-        conn.commit()
+        with transaction() as cur:
+            cur.execute("""
+                INSERT INTO settings (key, value) VALUES (%s, %s)
+                ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value
+            """, (key, value))
+            # Доставляется слушателям только после COMMIT
+            cur.execute("SELECT pg_notify(%s, %s)", (SETTINGS_CHANNEL, key))
+        if snapshot.loaded:
+            snapshot.set(key, value)
         logger.info(f"Setting {key} updated to {value}.")
     except Exception as e:
-        conn.rollback()
         logger.error(f"Error updating setting {key}: {e}")
         raise
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def get_silent_hours_settings():
     """Return dict of silent hours settings."""
+    s = get_settings()
     return {
-        'enabled': get_setting('silent_hours_enabled') == 'true',
-        'start': get_setting('silent_hours_start') or '22:00',
-        'end': get_setting('silent_hours_end') or '07:00',
-        'timezone': get_setting('silent_hours_timezone') or 'Europe/Moscow',
-        'allow_emergency': get_setting('silent_hours_allow_emergency') == 'true',
-        'emergency_keywords': (get_setting('emergency_keywords') or 'срочно,важно,критично').split(','),
-        'emergency_user_ids': (get_setting('emergency_user_ids') or '').split(',') if get_setting('emergency_user_ids') else []
-    }
\ No newline at end of file
+        'enabled': s.get_bool('silent_hours_enabled'),
+        'start': s.get('silent_hours_start') or '22:00',
+        'end': s.get('silent_hours_end') or '07:00',
+        'timezone': s.get('silent_hours_timezone') or 'Europe/Moscow',
+        'allow_emergency': s.get_bool('silent_hours_allow_emergency'),
+        'emergency_keywords': s.get_list('emergency_keywords', ['срочно', 'важно', 'критично']),
+        'emergency_user_ids': s.get_list('emergency_user_ids')
+    }
+
+# ---------- LISTEN settings_changed ----------
+_listener = None
+_listener_stop = threading.Event()
+
+def start_settings_listener(reconnect_delay=5.0):
+    """
+    Start a daemon thread that LISTENs on settings_changed and reloads the
+    snapshot when another process (bot, web panel) commits a change.
+    Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None and _listener.is_alive():
+        return
+    _listener_stop.clear()
+    _listener = threading.Thread(target=_listen, args=(reconnect_delay,), name='settings-listener', daemon=True)
+    _listener.start()
+
+def stop_settings_listener():
+    _listener_stop.set()
+
+def _listen(reconnect_delay):
+    while not _listener_stop.is_set():
+        conn = None
+        try:
+            conn = open_dedicated_connection()
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {SETTINGS_CHANNEL}")
+            # Изменения, пропущенные пока не было соединения
+            load_settings()
+            logger.info("Listening for settings changes.")
+            while not _listener_stop.is_set():
+                if select.select([conn], [], [], 1.0) == ([], [], []):
+                    continue
+                conn.poll()
+                if conn.notifies:
+                    keys = {n.payload for n in conn.notifies}
+                    conn.notifies.clear()
+                    logger.info(f"Settings changed elsewhere: {', '.join(sorted(keys))}")
+                    load_settings()
+        except Exception as e:
+            logger.warning(f"Settings listener error: {e}; reconnecting in {reconnect_delay}s")
+            _listener_stop.wait(reconnect_delay)
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
@@ -1,12 +1,13 @@
-from database.connection import get_db_connection, return_db_connection
+from database.connection import transaction, read
 import logging
 
 logger = logging.getLogger(__name__)
 
+# NOTIFY при постановке уведомления в очередь; payload — секунд до scheduled_for
+NOTIFY_CHANNEL = 'silenced_notifications'
+
 def get_pending_notifications(limit=100):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with read() as cur:
         cur.execute("""
             SELECT id, notification_type, user_id, appointment_id, message_text,
                    notification_data, retry_count, scheduled_for
@@ -26,56 +27,98 @@ def get_pending_notifications(limit=100):
             'retry_count': r[6],
             'scheduled_for': r[7]
         } for r in rows]
-    finally:
-        cur.close()
-        return_db_connection(conn)
+
+def claim_due_notifications(limit=100):
+    """
+    Claim a batch of due notifications for sending and commit at once.
+
+    FOR UPDATE SKIP LOCKED lets several workers claim disjoint batches; the
+    rows move to 'sending', so no transaction stays open during the sends.
+    """
+    with transaction() as cur:
+        cur.execute("""
+            UPDATE silenced_notifications s
+            SET status = 'sending', last_attempt = NOW()
+            FROM (
+                SELECT id FROM silenced_notifications
+                WHERE status = 'pending' AND scheduled_for <= NOW()
+                ORDER BY scheduled_for
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            ) due
+            WHERE s.id = due.id
+            RETURNING s.id, s.notification_type, s.user_id, s.appointment_id,
+                      s.message_text, s.notification_data, s.retry_count
+        """, (limit,))
+        return cur.fetchall()
+
+def release_stale_claims(lease_seconds=300):
+    """Return rows stuck in 'sending' (worker died mid-batch) to the queue."""
+    with transaction() as cur:
+        cur.execute("""
+            UPDATE silenced_notifications SET status = 'pending'
+            WHERE status = 'sending' AND last_attempt < NOW() - make_interval(secs => %s)
+        """, (lease_seconds,))
+        if cur.rowcount:
+            logger.warning(f"Released {cur.rowcount} stale notification claims.")
+        return cur.rowcount
+
+def complete_notifications(sent_ids=(), failed_ids=(), retries=()):
+    """
+    Record the results of a batch in one transaction.
+    retries: list of (id, scheduled_for) to put back in the queue with retry_count + 1.
+    """
+    try:
+        with transaction() as cur:
+            if sent_ids:
+                cur.execute("""
+                    UPDATE silenced_notifications SET status = 'sent', last_attempt = NOW()
+                    WHERE id = ANY(%s)
+                """, (list(sent_ids),))
+            if failed_ids:
+                cur.execute("""
+                    UPDATE silenced_notifications SET status = 'failed', last_attempt = NOW()
+                    WHERE id = ANY(%s)
+                """, (list(failed_ids),))
+            if retries:
+                cur.execute("""
+                    UPDATE silenced_notifications s
+                    SET status = 'pending', scheduled_for = r.at, retry_count = s.retry_count + 1
+                    FROM unnest(%s::int[], %s::timestamp[]) AS r(id, at)
+                    WHERE s.id = r.id
+                """, ([r[0] for r in retries], [r[1] for r in retries]))
+    except Exception as e:
+        logger.error(f"Error saving notification results: {e}")
+        raise
 
 def update_notification_status(notif_id, status, last_attempt=None):
-    conn = get_db_connection()
-    cur = conn.cursor()
     try:
-        if last_attempt:
-            cur.execute("UPDATE silenced_notifications SET status = %s, last_attempt = %s WHERE id = %s",
-                        (status, last_attempt, notif_id))
-        else:
-            cur.execute("UPDATE silenced_notifications SET status = %s WHERE id = %s", (status, notif_id))
-        conn.commit()
+        with transaction() as cur:
+            if last_attempt:
+                cur.execute("UPDATE silenced_notifications SET status = %s, last_attempt = %s WHERE id = %s",
+                            (status, last_attempt, notif_id))
+            else:
+                cur.execute("UPDATE silenced_notifications SET status = %s WHERE id = %s", (status, notif_id))
     except Exception as e:
-        conn.rollback()
         logger.error(f"Error updating notification {notif_id}: {e}")
         raise
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def increment_retry_and_reschedule(notif_id, new_schedule):
-    conn = get_db_connection()
-    cur = conn.cursor()
     try:
-        cur.execute("""
-            UPDATE silenced_notifications
-            SET retry_count = retry_count + 1, scheduled_for = %s, last_attempt = NOW()
-            WHERE id = %s
-        """, (new_schedule, notif_id))
-        conn.commit()
+        with transaction() as cur:
+            cur.execute("""
+                UPDATE silenced_notifications
+                SET retry_count = retry_count + 1, scheduled_for = %s, last_attempt = NOW()
+                WHERE id = %s
+            """, (new_schedule, notif_id))
     except Exception as e:
-        conn.rollback()
         logger.error(f"Error incrementing retry for {notif_id}: {e}")
         raise
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def delete_notification(notif_id):
-    conn = get_db_connection()
-    cur = conn.cursor()
     try:
-        cur.execute("DELETE FROM silenced_notifications WHERE id = %s", (notif_id,))
-        conn.commit()
+        with transaction() as cur:
+            cur.execute("DELETE FROM silenced_notifications WHERE id = %s", (notif_id,))
     except Exception as e:
-        conn.rollback()
         logger.error(f"Error deleting notification {notif_id}: {e}")
-        raise
-    finally:
-        cur.close()
-        return_db_connection(conn)
\ No newline at end of file
+        raise
\ No newline at end of file
@@ -1,61 +1,59 @@
-from database.connection import get_db_connection, return_db_connection
+from database.connection import transaction, read
 from datetime import date, timedelta
 
+# All dashboard and /stats figures in one query over the daily_stats rollup
+# (maintained by triggers, see migrations/v17_daily_stats.sql)
+STATS_SUMMARY_SQL = """
+    SELECT
+        COALESCE(SUM(appointments), 0) AS appointments_total,
+        COALESCE(SUM(appointments) FILTER (WHERE day = {today}), 0) AS appointments_today,
+        COALESCE(SUM(pending), 0) AS pending_appointments,
+        COALESCE(SUM(new_users), 0) AS users_total,
+        COALESCE(SUM(new_users) FILTER (WHERE day = {today}), 0) AS users_today,
+        COALESCE(SUM(revenue) FILTER (WHERE day >= {month_start}), 0) AS monthly_revenue,
+        (SELECT COUNT(*) FROM services WHERE is_active = TRUE) AS services_total,
+        (SELECT COUNT(*) FROM car_brands WHERE is_active = TRUE) AS brands_total
+    FROM daily_stats
+"""
+STATS_SUMMARY_COLUMNS = ('appointments_total', 'appointments_today', 'pending_appointments',
+                         'users_total', 'users_today', 'monthly_revenue', 'services_total', 'brands_total')
+
+def get_stats_summary():
+    """Counters for the dashboard and /stats from the daily rollup (one round trip)."""
+    today = date.today()
+    with read() as cur:
+        cur.execute(STATS_SUMMARY_SQL.format(today='%(today)s', month_start='%(month_start)s'),
+                    {'today': today, 'month_start': today.replace(day=1)})
+        return dict(zip(STATS_SUMMARY_COLUMNS, cur.fetchone()))
+
 def get_dashboard_stats():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        today = date.today()
-        # Today's appointments
-        cur.execute("SELECT COUNT(*) FROM appointments WHERE date = %s", (today,))
-        today_appointments = cur.fetchone()[0]
-        # Pending appointments
-        cur.execute("SELECT COUNT(*) FROM appointments WHERE status = 'pending'")
-        pending = cur.fetchone()[0]
-        # Total users
-        cur.execute("SELECT COUNT(*) FROM users")
-        total_users = cur.fetchone()[0]
-        # Monthly revenue (assuming price in services)
-        first_day = today.replace(day=1)
-        cur.execute("""
-            SELECT COALESCE(SUM(s.price), 0)
-            FROM appointments a
-            JOIN services s ON a.service_id = s.id
-            WHERE a.date >= %s AND a.status IN ('confirmed', 'completed')
-        """, (first_day,))
-        monthly_revenue = cur.fetchone()[0] or 0
-        return {
-            'today_appointments': today_appointments,
-            'pending_appointments': pending,
-            'total_users': total_users,
-            'monthly_revenue': monthly_revenue
-        }
-    finally:
-        cur.close()
-        return_db_connection(conn)
+    summary = get_stats_summary()
+    return {
+        'today_appointments': summary['appointments_today'],
+        'pending_appointments': summary['pending_appointments'],
+        'total_users': summary['users_total'],
+        'monthly_revenue': summary['monthly_revenue']
+    }
+
+def refresh_daily_stats(days=60):
+    """Recompute the last `days` days of the rollup from source tables."""
+    with transaction() as cur:
+        cur.execute("SELECT refresh_daily_stats(%s)", (date.today() - timedelta(days=days),))
 
 def get_appointments_stats(days=30):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with read() as cur:
         start_date = date.today() - timedelta(days=days)
         cur.execute("""
-            SELECT date, COUNT(*)
-            FROM appointments
-            WHERE date >= %s
-            GROUP BY date
-            ORDER BY date
+            SELECT day, appointments
+            FROM daily_stats
+            WHERE day >= %s AND appointments > 0
+            ORDER BY day
         """, (start_date,))
         rows = cur.fetchall()
         return [{'date': r[0].isoformat(), 'count': r[1]} for r in rows]
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def get_popular_services(limit=10):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with read() as cur:
         cur.execute("""
             SELECT s.name, COUNT(a.id) as cnt
             FROM appointments a
@@ -66,25 +64,15 @@ def get_popular_services(limit=10):
         """, (limit,))
         rows = cur.fetchall()
         return [{'service': r[0], 'count': r[1]} for r in rows]
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def get_revenue_stats(days=30):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with read() as cur:
         start_date = date.today() - timedelta(days=days)
         cur.execute("""
-            SELECT a.date, SUM(s.price)
-            FROM appointments a
-            JOIN services s ON a.service_id = s.id
-            WHERE a.date >= %s AND a.status IN ('confirmed', 'completed')
-            GROUP BY a.date
-            ORDER BY a.date
+            SELECT day, revenue
+            FROM daily_stats
+            WHERE day >= %s AND revenue <> 0
+            ORDER BY day
         """, (start_date,))
         rows = cur.fetchall()
-        return [{'date': r[0].isoformat(), 'revenue': float(r[1]) if r[1] else 0} for r in rows]
-    finally:
-        cur.close()
-        return_db_connection(conn)
\ No newline at end of file
+        return [{'date': r[0].isoformat(), 'revenue': float(r[1]) if r[1] else 0} for r in rows]
\ No newline at end of file
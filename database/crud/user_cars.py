@@ -1,33 +1,25 @@
-from database.connection import get_db_connection, return_db_connection
+from database.connection import transaction, read
 import logging
 
 logger = logging.getLogger(__name__)
 
 def create_user_car(user_id, brand_id, model_id, year_id=None):
-    conn = get_db_connection()
-    cur = conn.cursor()
     try:
-        cur.execute("""
-            INSERT INTO user_cars (user_id, brand_id, model_id, year_id)
-            VALUES (%s, %s, %s, %s)
-            RETURNING id
-        """, (user_id, brand_id, model_id, year_id))
-        car_id = cur.fetchone()[0]
-        conn.commit()
+        with transaction() as cur:
+            cur.execute("""
+                INSERT INTO user_cars (user_id, brand_id, model_id, year_id)
+                VALUES (%s, %s, %s, %s)
+                RETURNING id
+            """, (user_id, brand_id, model_id, year_id))
+            car_id = cur.fetchone()[0]
         logger.info(f"User car {car_id} created for user {user_id}.")
         return car_id
     except Exception as e:
-        conn.rollback()
         logger.error(f"Error creating user car: {e}")
         raise
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def get_user_cars(user_id):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with read() as cur:
         cur.execute("""
             SELECT uc.id, cb.name, cm.name, cy.year, uc.is_active
             FROM user_cars uc
@@ -45,14 +37,9 @@ def get_user_cars(user_id):
             'year': r[3],
             'is_active': r[4]
         } for r in rows]
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def get_user_car(car_id):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with read() as cur:
         cur.execute("""
             SELECT uc.id, uc.user_id, cb.name, cm.name, cy.year, uc.is_active
             FROM user_cars uc
@@ -72,21 +59,12 @@ def get_user_car(car_id):
                 'is_active': row[5]
             }
         return None
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def delete_user_car(car_id):
-    conn = get_db_connection()
-    cur = conn.cursor()
     try:
-        cur.execute("DELETE FROM user_cars WHERE id = %s", (car_id,))
-        conn.commit()
+        with transaction() as cur:
+            cur.execute("DELETE FROM user_cars WHERE id = %s", (car_id,))
         logger.info(f"User car {car_id} deleted.")
     except Exception as e:
-        conn.rollback()
         logger.error(f"Error deleting user car {car_id}: {e}")
-        raise
-    finally:
-        cur.close()
-        return_db_connection(conn)
\ No newline at end of file
+        raise
\ No newline at end of file
@@ -1,40 +1,36 @@
-from database.connection import get_db_connection, return_db_connection
+import re
+from database.connection import transaction, read
+from utils.cache import UserContext, set_user_context, invalidate_user_context
+from utils.pagination import decode_cursor, page_from_rows, count_rows
 import logging
 
 logger = logging.getLogger(__name__)
 
 def create_user(user_id, username, full_name, phone=None, is_admin=False):
     """Create a new user record."""
-    conn = get_db_connection()
-    cur = conn.cursor()
     try:
-        cur.execute("""
-            INSERT INTO users (user_id, username, full_name, phone, is_admin)
-            VALUES (%s, %s, %s, %s, %s)
-            ON CONFLICT (user_id) DO UPDATE SET
-                username = EXCLUDED.username,
-                full_name = EXCLUDED.full_name,
-                phone = EXCLUDED.phone,
-                is_admin = EXCLUDED.is_admin
-            RETURNING user_id
-        """, (user_id, username, full_name, phone, is_admin))
-        new_id = cur.fetchone()[0]
-        conn.commit()
+        with transaction() as cur:
+            cur.execute("""
+                INSERT INTO users (user_id, username, full_name, phone, is_admin)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    username = EXCLUDED.username,
+                    full_name = EXCLUDED.full_name,
+                    phone = EXCLUDED.phone,
+                    is_admin = EXCLUDED.is_admin
+                RETURNING user_id
+            """, (user_id, username, full_name, phone, is_admin))
+            new_id = cur.fetchone()[0]
+        set_user_context(user_id, UserContext(registered=True, is_admin=is_admin, phone=phone))
         logger.info(f"User {new_id} created/updated.")
         return new_id
     except Exception as e:
-        conn.rollback()
         logger.error(f"Error creating user {user_id}: {e}")
         raise
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def get_user(user_id):
     """Get user by ID."""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with read() as cur:
         cur.execute("""
             SELECT user_id, username, full_name, phone, is_admin, notes, created_at
             FROM users WHERE user_id = %s
@@ -51,139 +47,151 @@ def get_user(user_id):
                 'created_at': row[6]
             }
         return None
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
-def get_users(page=1, per_page=50, search=''):
-    """Get paginated list of users."""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    offset = (page - 1) * per_page
-    try:
-        if search:
-            cur.execute("""
-                SELECT user_id, username, full_name, phone, notes, is_admin, created_at
-                FROM users
-                WHERE username ILIKE %s OR full_name ILIKE %s OR phone ILIKE %s
-                ORDER BY created_at DESC
-                LIMIT %s OFFSET %s
-            """, (f'%{search}%', f'%{search}%', f'%{search}%', per_page, offset))
-            rows = cur.fetchall()
-            # Get total count
-            cur.execute("""
-                SELECT COUNT(*) FROM users
-                WHERE username ILIKE %s OR full_name ILIKE %s OR phone ILIKE %s
-            """, (f'%{search}%', f'%{search}%', f'%{search}%'))
-        else:
-            cur.execute("""
-                SELECT user_id, username, full_name, phone, notes, is_admin, created_at
-                FROM users
-                ORDER BY created_at DESC
-                LIMIT %s OFFSET %s
-            """, (per_page, offset))
-            rows = cur.fetchall()
-            cur.execute("SELECT COUNT(*) FROM users")
-        total = cur.fetchone()[0]
-        users = [{
+def get_users(per_page=50, search='', after=None, count='approx'):
+    """
+    Get a page of users, newest first (keyset pagination).
+    after: cursor from the previous page's next_cursor; count: see count_rows.
+    Returns Page(items, total, next_cursor).
+    """
+    where, params = [], []
+    if search:
+        condition, params = _search_condition(search)
+        where.append(condition)
+    filter_sql = "WHERE " + " AND ".join(where) if where else ""
+    key = decode_cursor(after, 'datetime', 'int')
+    if key:
+        where.append("(created_at, user_id) < (%s, %s)")
+    where_sql = "WHERE " + " AND ".join(where) if where else ""
+    with read() as cur:
+        cur.execute(f"""
+            SELECT user_id, username, full_name, phone, notes, is_admin, created_at
+            FROM users u
+            {where_sql}
+            ORDER BY created_at DESC, user_id DESC
+            LIMIT %s
+        """, (*params, *(key or ()), per_page + 1))
+        rows = cur.fetchall()
+        total = count_rows(cur, 'users', filter_sql, params, mode=count, alias='u')
+    return page_from_rows(rows, per_page, lambda r: {
+        'user_id': r[0],
+        'username': r[1],
+        'full_name': r[2],
+        'phone': r[3],
+        'notes': r[4],
+        'is_admin': r[5],
+        'created_at': r[6]
+    }, lambda r: (r[6], r[0]), total)
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def _search_condition(term):
+    """
+    Index-backed search predicate (see migrations/v19_user_search.sql).
+    username/full_name go through trigram GIN indexes; a term that is mostly
+    digits also matches phone_digits, so "900-12" finds "+7 (900) 123-45-67".
+    """
+    term = term.strip()
+    like = f'%{_escape_like(term)}%'
+    conditions = ["u.username ILIKE %s", "u.full_name ILIKE %s"]
+    params = [like, like]
+    digits = re.sub(r'\D', '', term)
+    if len(digits) >= 3 and len(digits) * 2 >= len(term):
+        conditions.append("u.phone_digits LIKE %s")
+        params.append(f'%{digits}%')
+    return "(" + " OR ".join(conditions) + ")", params
+
+def search_users(term, limit=20):
+    """
+    Ranked user search for the admin panel and its typeahead.
+    Prefix matches (username, name, phone) come first, then by trigram similarity.
+    """
+    term = (term or '').strip()
+    if not term:
+        return []
+    condition, params = _search_condition(term)
+    prefix = f'{_escape_like(term)}%'
+    digits = re.sub(r'\D', '', term) or None
+    with read() as cur:
+        cur.execute(f"""
+            SELECT u.user_id, u.username, u.full_name, u.phone,
+                   CASE WHEN u.username ILIKE %s OR u.full_name ILIKE %s
+                             OR u.phone_digits LIKE %s || '%%' THEN 1 ELSE 0 END
+                   + GREATEST(similarity(COALESCE(u.username, ''), %s),
+                              similarity(COALESCE(u.full_name, ''), %s)) AS rank
+            FROM users u
+            WHERE {condition}
+            ORDER BY rank DESC, u.user_id
+            LIMIT %s
+        """, (prefix, prefix, digits, term, term, *params, limit))
+        return [{
             'user_id': r[0],
             'username': r[1],
             'full_name': r[2],
             'phone': r[3],
-            'notes': r[4],
-            'is_admin': r[5],
-            'created_at': r[6]
-        } for r in rows]
-        return users, total
-    finally:
-        cur.close()
-        return_db_connection(conn)
+        } for r in cur.fetchall()]
 
 def update_user(user_id, data):
     """Update user fields (notes, is_admin, etc)."""
-    conn = get_db_connection()
-    cur = conn.cursor()
     try:
-        cur.execute("""
-            UPDATE users SET
-                notes = COALESCE(%s, notes),
-                is_admin = COALESCE(%s, is_admin)
-            WHERE user_id = %s
-        """, (data.get('notes'), data.get('is_admin'), user_id))
-        conn.commit()
+        with transaction() as cur:
+            cur.execute("""
+                UPDATE users SET
+                    notes = COALESCE(%s, notes),
+                    is_admin = COALESCE(%s, is_admin)
+                WHERE user_id = %s
+            """, (data.get('notes'), data.get('is_admin'), user_id))
+            updated = cur.rowcount > 0
+        invalidate_user_context(user_id)
         logger.info(f"User {user_id} updated.")
+        return updated
     except Exception as e:
-        conn.rollback()
         logger.error(f"Error updating user {user_id}: {e}")
         raise
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def delete_user(user_id):
     """Delete user (and related records due to CASCADE)."""
-    conn = get_db_connection()
-    cur = conn.cursor()
     try:
-        cur.execute("DELETE FROM users WHERE user_id = %s", (user_id,))
-        conn.commit()
+        with transaction() as cur:
+            cur.execute("DELETE FROM users WHERE user_id = %s", (user_id,))
+            deleted = cur.rowcount > 0
+        invalidate_user_context(user_id)
         logger.info(f"User {user_id} deleted.")
+        return deleted
     except Exception as e:
-        conn.rollback()
         logger.error(f"Error deleting user {user_id}: {e}")
         raise
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def is_user_registered(user_id):
     """Check if user exists."""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with read() as cur:
         cur.execute("SELECT 1 FROM users WHERE user_id = %s", (user_id,))
         return cur.fetchone() is not None
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def get_admin_ids():
     """Get list of admin user IDs."""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with read() as cur:
         cur.execute("SELECT user_id FROM users WHERE is_admin = TRUE")
         return [row[0] for row in cur.fetchall()]
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def get_users_count(registered_after=None):
     """Get total number of users (optionally after date)."""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with read() as cur:
         if registered_after:
             cur.execute("SELECT COUNT(*) FROM users WHERE created_at >= %s", (registered_after,))
         else:
             cur.execute("SELECT COUNT(*) FROM users")
         return cur.fetchone()[0]
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
-def get_all_users(only_active: bool = True) -> list:
+def get_all_users() -> list:
     """
-    Возвращает список всех пользователей (обычно для рассылки).
+    Возвращает список всех пользователей.
+    Для рассылок и массовых задач используйте database.crud_async.users.iter_user_id_batches —
+    он не держит всех в памяти.
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        query = "SELECT user_id, username, full_name, phone, is_admin, notes, created_at FROM users"
-        if only_active:
-            query += " WHERE is_active = TRUE"  # предполагаем, что есть поле is_active
-        query += " ORDER BY created_at DESC"
-        cur.execute(query)
+    with read() as cur:
+        cur.execute("SELECT user_id, username, full_name, phone, is_admin, notes, created_at FROM users ORDER BY created_at DESC")
         rows = cur.fetchall()
         return [{
             'user_id': r[0],
@@ -194,20 +202,12 @@ def get_all_users(only_active: bool = True) -> list:
             'notes': r[5],
             'created_at': r[6]
         } for r in rows]
-    finally:
-        cur.close()
-        return_db_connection(conn)
 
 def is_admin(user_id: int) -> bool:
     """
     Проверяет, является ли пользователь администратором.
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with read() as cur:
         cur.execute("SELECT is_admin FROM users WHERE user_id = %s", (user_id,))
         row = cur.fetchone()
-        return bool(row and row[0])
-    finally:
-        cur.close()
-        return_db_connection(conn)
\ No newline at end of file
+        return bool(row and row[0])
\ No newline at end of file
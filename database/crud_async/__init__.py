@@ -0,0 +1,2 @@
+# This file makes the crud_async directory a Python package.
+# Async counterparts of database.crud functions (same names), backed by asyncpg.
\ No newline at end of file
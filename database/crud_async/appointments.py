@@ -0,0 +1,173 @@
+from datetime import date as date_type, time as time_type
+from database.async_connection import get_async_pool
+from utils.cache import add_occupancy, invalidate_occupancy
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _to_date(value):
+    """asyncpg требует объекты date, а FSM хранит дату строкой YYYY-MM-DD."""
+    if isinstance(value, str):
+        return date_type.fromisoformat(value)
+    return value
+
+def _to_time(value):
+    """Преобразует строку HH:MM в объект time."""
+    if isinstance(value, str):
+        return time_type.fromisoformat(value)
+    return value
+
+def _minute_of_day(value):
+    return value.hour * 60 + value.minute
+
+async def _slot_is_full(conn, day, start, duration, capacity):
+    """
+    True if `capacity` active appointments already overlap [start, start + duration).
+    Takes the per-date advisory lock first, so the caller's transaction keeps
+    the answer valid until it commits.
+    """
+    await conn.execute("SELECT pg_advisory_xact_lock(hashtext('appointments'), $1)", day.toordinal())
+    # Наибольшая одновременная занятость внутри интервала достигается
+    # в его начале или в начале одной из пересекающихся записей
+    overlap = await conn.fetchval("""
+        WITH busy AS (
+            SELECT EXTRACT(HOUR FROM time)::int * 60 + EXTRACT(MINUTE FROM time)::int AS s,
+                   duration_minutes
+            FROM appointments
+            WHERE date = $1 AND status <> 'cancelled'
+        )
+        SELECT COALESCE(MAX((
+            SELECT COUNT(*) FROM busy b WHERE b.s <= p.m AND b.s + b.duration_minutes > p.m
+        )), 0)
+        FROM (SELECT $2::int AS m UNION SELECT s FROM busy WHERE s > $2 AND s < $3) p
+    """, day, _minute_of_day(start), _minute_of_day(start) + duration)
+    if overlap >= capacity:
+        logger.info(f"Slot {day} {start} is full ({overlap}/{capacity}).")
+        return True
+    return False
+
+async def create_appointment(data, capacity):
+    """
+    Create a new appointment.
+
+    capacity: number of bays. The insert happens only while fewer than
+    `capacity` active appointments overlap [time, time + duration_minutes);
+    bookings of one date are serialized by an advisory lock, so two users
+    cannot take the last bay at once. Returns None if the slot is full.
+    """
+    pool = await get_async_pool()
+    day = _to_date(data['date'])
+    start = _to_time(data['time'])
+    duration = data.get('duration_minutes') or 30
+    status = data.get('status', 'pending')
+    try:
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                if status != 'cancelled' and await _slot_is_full(conn, day, start, duration, capacity):
+                    return None
+                apt_id = await conn.fetchval("""
+                    INSERT INTO appointments
+                        (user_id, service_id, user_car_id, tire_size_id, date, time, status, notes, duration_minutes)
+                    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+                    RETURNING id
+                """,
+                    data['user_id'],
+                    data.get('service_id'),
+                    data.get('user_car_id'),
+                    data.get('tire_size_id'),
+                    day,
+                    start,
+                    status,
+                    data.get('notes'),
+                    duration
+                )
+        if status != 'cancelled':
+            add_occupancy(day, _minute_of_day(start), duration)
+        logger.info(f"Appointment {apt_id} created.")
+        return apt_id
+    except Exception as e:
+        logger.error(f"Error creating appointment: {e}")
+        raise
+
+async def get_occupancy(date_from, date_to):
+    """
+    Active appointments of a date range, one grouped row per day:
+    {date: [(start minute of day, duration_minutes), ...]}. Days without
+    appointments are absent.
+    """
+    pool = await get_async_pool()
+    rows = await pool.fetch("""
+        SELECT date,
+               array_agg(EXTRACT(HOUR FROM time)::int * 60 + EXTRACT(MINUTE FROM time)::int) AS starts,
+               array_agg(duration_minutes) AS durations
+        FROM appointments
+        WHERE date BETWEEN $1 AND $2 AND status <> 'cancelled'
+        GROUP BY date
+    """, _to_date(date_from), _to_date(date_to))
+    return {r['date']: list(zip(r['starts'], r['durations'])) for r in rows}
+
+async def update_appointment_status(appointment_id, status, capacity, admin_comment=None):
+    """
+    Update appointment status.
+
+    A cancelled appointment brought back to an active status takes a bay
+    again, so it goes through the same capacity check as create_appointment.
+    Returns True if updated, False if its slot is full, None if there is no
+    such appointment.
+    """
+    pool = await get_async_pool()
+    try:
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                row = await conn.fetchrow("""
+                    SELECT date, time, duration_minutes, status FROM appointments
+                    WHERE id = $1 FOR UPDATE
+                """, appointment_id)
+                if row is None:
+                    logger.warning(f"Appointment {appointment_id} not found.")
+                    return None
+                if (row['status'] == 'cancelled' and status != 'cancelled'
+                        and await _slot_is_full(conn, row['date'], row['time'], row['duration_minutes'], capacity)):
+                    return False
+                await conn.execute(
+                    "UPDATE appointments SET status = $1, admin_comment = $2 WHERE id = $3",
+                    status, admin_comment, appointment_id
+                )
+        invalidate_occupancy(row['date'])
+        logger.info(f"Appointment {appointment_id} status updated to {status}.")
+        return True
+    except Exception as e:
+        logger.error(f"Error updating appointment {appointment_id}: {e}")
+        raise
+
+async def get_appointments_count(status=None):
+    """Get count of appointments (optionally by status)."""
+    pool = await get_async_pool()
+    if status:
+        return await pool.fetchval("SELECT COUNT(*) FROM appointments WHERE status = $1", status)
+    return await pool.fetchval("SELECT COUNT(*) FROM appointments")
+
+async def get_appointments_today_count():
+    """Get count of appointments for today."""
+    pool = await get_async_pool()
+    return await pool.fetchval("SELECT COUNT(*) FROM appointments WHERE date = $1", date_type.today())
+
+async def get_user_appointments(user_id: int) -> list:
+    """
+    Возвращает список записей для конкретного пользователя.
+    """
+    pool = await get_async_pool()
+    rows = await pool.fetch("""
+        SELECT a.id, a.date, a.time, s.name as service, a.status
+        FROM appointments a
+        LEFT JOIN services s ON a.service_id = s.id
+        WHERE a.user_id = $1
+        ORDER BY a.date DESC, a.time DESC
+    """, user_id)
+    return [{
+        'id': r['id'],
+        'date': r['date'],
+        'time': str(r['time']),
+        'service': r['service'],
+        'status': r['status']
+    } for r in rows]
@@ -0,0 +1,181 @@
+from database.async_connection import get_async_pool
+from database.crud_async.users import user_segment_sql
+import logging
+
+logger = logging.getLogger(__name__)
+
+async def create_broadcast_job(text, created_by=None, **segment):
+    """
+    Create a job and its recipient list in one transaction.
+    segment: has_appointments / registered_after / vehicle_type_id (see user_segment_sql);
+    recipients are copied server-side, without loading users into the bot.
+    """
+    pool = await get_async_pool()
+    where, args = user_segment_sql(2, **segment)
+    try:
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                job_id = await conn.fetchval("""
+                    INSERT INTO broadcast_jobs (text, created_by) VALUES ($1, $2) RETURNING id
+                """, text, created_by)
+                await conn.execute(f"""
+                    INSERT INTO broadcast_recipients (job_id, user_id)
+                    SELECT $1, u.user_id FROM users u
+                    WHERE TRUE{where}
+                """, job_id, *args)
+                total = await conn.fetchval("""
+                    UPDATE broadcast_jobs
+                    SET total = (SELECT COUNT(*) FROM broadcast_recipients WHERE job_id = $1)
+                    WHERE id = $1
+                    RETURNING total
+                """, job_id)
+        logger.info(f"Broadcast job {job_id} created for {total} recipients.")
+        return job_id
+    except Exception as e:
+        logger.error(f"Error creating broadcast job: {e}")
+        raise
+
+async def get_broadcast_job(job_id):
+    pool = await get_async_pool()
+    row = await pool.fetchrow("""
+        SELECT id, text, status, total, sent, failed, created_by,
+               progress_chat_id, progress_message_id, created_at, finished_at
+        FROM broadcast_jobs WHERE id = $1
+    """, job_id)
+    return dict(row) if row else None
+
+async def get_unfinished_broadcast_ids(lock_key=None):
+    """
+    Jobs that are running or paused. With lock_key, only jobs nobody runs now:
+    no session holds the advisory lock (lock_key, job_id).
+    """
+    pool = await get_async_pool()
+    if lock_key is None:
+        rows = await pool.fetch("SELECT id FROM broadcast_jobs WHERE status IN ('running', 'paused') ORDER BY id")
+    else:
+        rows = await pool.fetch("""
+            SELECT j.id FROM broadcast_jobs j
+            WHERE j.status IN ('running', 'paused')
+              AND NOT EXISTS (
+                  SELECT 1 FROM pg_locks l
+                  WHERE l.locktype = 'advisory' AND l.granted AND l.objsubid = 2
+                    AND l.classid::bigint = $1 AND l.objid::bigint = j.id
+              )
+            ORDER BY j.id
+        """, lock_key)
+    return [r['id'] for r in rows]
+
+async def set_progress_message(job_id, chat_id, message_id):
+    pool = await get_async_pool()
+    await pool.execute("""
+        UPDATE broadcast_jobs SET progress_chat_id = $1, progress_message_id = $2 WHERE id = $3
+    """, chat_id, message_id, job_id)
+
+async def set_broadcast_status(job_id, status, expected=('running', 'paused')):
+    """
+    Change the job status if it is one of `expected` (a finished job is never
+    reopened). Pause/resume/cancel go through this row, so they reach the
+    worker running the job whichever bot process handled the button.
+    Returns True if the status was changed.
+    """
+    pool = await get_async_pool()
+    job = await pool.fetchval("""
+        UPDATE broadcast_jobs
+        SET status = $1,
+            finished_at = CASE WHEN $1 IN ('completed', 'cancelled') THEN NOW() ELSE NULL END
+        WHERE id = $2 AND status = ANY($3::varchar[])
+        RETURNING id
+    """, status, job_id, list(expected))
+    if job is not None:
+        logger.info(f"Broadcast job {job_id} status set to {status}.")
+    return job is not None
+
+async def get_broadcast_status(job_id, conn=None):
+    """Current status of a job; conn lets the job runner poll on its own connection."""
+    if conn is None:
+        conn = await get_async_pool()
+    return await conn.fetchval("SELECT status FROM broadcast_jobs WHERE id = $1", job_id)
+
+async def claim_recipients(job_id, limit=500):
+    """
+    Claim the next batch of pending recipients and commit at once.
+
+    The rows move to 'sending' in a single UPDATE over a FOR UPDATE SKIP
+    LOCKED subquery, so concurrent claims never get the same recipient and
+    no transaction stays open during the sends.
+    """
+    pool = await get_async_pool()
+    rows = await pool.fetch("""
+        UPDATE broadcast_recipients r SET status = 'sending'
+        FROM (
+            SELECT user_id FROM broadcast_recipients
+            WHERE job_id = $1 AND status = 'pending'
+            ORDER BY user_id
+            LIMIT $2
+            FOR UPDATE SKIP LOCKED
+        ) c
+        WHERE r.job_id = $1 AND r.user_id = c.user_id
+        RETURNING r.user_id
+    """, job_id, limit)
+    return sorted(r['user_id'] for r in rows)
+
+async def release_recipients(job_id, user_ids=None):
+    """
+    Return claimed recipients to 'pending': the given ones (skipped on pause),
+    or all of the job's claims when a runner takes over the job after a
+    worker died mid-batch. Returns the number of released rows.
+    """
+    pool = await get_async_pool()
+    if user_ids is None:
+        result = await pool.execute("""
+            UPDATE broadcast_recipients SET status = 'pending'
+            WHERE job_id = $1 AND status = 'sending'
+        """, job_id)
+    else:
+        result = await pool.execute("""
+            UPDATE broadcast_recipients SET status = 'pending'
+            WHERE job_id = $1 AND user_id = ANY($2::bigint[]) AND status = 'sending'
+        """, job_id, list(user_ids))
+    return int(result.split()[-1])
+
+async def mark_recipients(job_id, sent_ids, failed):
+    """
+    Record a batch of results in one round trip.
+    failed: list of (user_id, error). Only claimed ('sending') rows are
+    updated and counted. Returns updated (sent, failed) totals.
+    """
+    pool = await get_async_pool()
+    failed_ids = [uid for uid, _ in failed]
+    errors = [err[:500] for _, err in failed]
+    try:
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                sent_count = failed_count = 0
+                if sent_ids:
+                    sent_count = await conn.fetchval("""
+                        WITH done AS (
+                            UPDATE broadcast_recipients SET status = 'sent', sent_at = NOW()
+                            WHERE job_id = $1 AND user_id = ANY($2::bigint[]) AND status = 'sending'
+                            RETURNING 1
+                        )
+                        SELECT COUNT(*) FROM done
+                    """, job_id, sent_ids)
+                if failed_ids:
+                    failed_count = await conn.fetchval("""
+                        WITH done AS (
+                            UPDATE broadcast_recipients r SET status = 'failed', error = f.error, sent_at = NOW()
+                            FROM unnest($2::bigint[], $3::text[]) AS f(user_id, error)
+                            WHERE r.job_id = $1 AND r.user_id = f.user_id AND r.status = 'sending'
+                            RETURNING 1
+                        )
+                        SELECT COUNT(*) FROM done
+                    """, job_id, failed_ids, errors)
+                row = await conn.fetchrow("""
+                    UPDATE broadcast_jobs SET sent = sent + $2, failed = failed + $3
+                    WHERE id = $1
+                    RETURNING sent, failed
+                """, job_id, sent_count, failed_count)
+        return row['sent'], row['failed']
+    except Exception as e:
+        logger.error(f"Error saving broadcast {job_id} results: {e}")
+        raise
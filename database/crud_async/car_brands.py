@@ -0,0 +1,42 @@
+from database.async_connection import get_async_pool
+import logging
+
+logger = logging.getLogger(__name__)
+
+async def get_brands_count():
+    pool = await get_async_pool()
+    return await pool.fetchval("SELECT COUNT(*) FROM car_brands WHERE is_active = TRUE")
+
+async def get_brands_grouped_by_letter():
+    """
+    Возвращает словарь {буква: [марки]} для всех активных марок.
+    Используется для построения клавиатуры выбора по первой букве.
+    """
+    pool = await get_async_pool()
+    rows = await pool.fetch("""
+        SELECT first_letter, id, name, logo_url
+        FROM car_brands
+        WHERE is_active = TRUE
+        ORDER BY first_letter, name
+    """)
+    result = {}
+    for r in rows:
+        result.setdefault(r['first_letter'], []).append({
+            'id': r['id'],
+            'name': r['name'],
+            'logo_url': r['logo_url']
+        })
+    return result
+
+async def get_brands_by_letter(letter):
+    """
+    Возвращает список марок, начинающихся на указанную букву.
+    """
+    pool = await get_async_pool()
+    rows = await pool.fetch("""
+        SELECT id, name, logo_url, country
+        FROM car_brands
+        WHERE first_letter = $1 AND is_active = TRUE
+        ORDER BY name
+    """, letter)
+    return [dict(r) for r in rows]
@@ -0,0 +1,21 @@
+from database.async_connection import get_async_pool
+import logging
+
+logger = logging.getLogger(__name__)
+
+async def get_models_by_brand(brand_id, vehicle_type_id=None):
+    pool = await get_async_pool()
+    query = """
+        SELECT cm.id, cm.name, cm.start_year, cm.end_year, cm.is_active,
+               vt.name as vehicle_type_name
+        FROM car_models cm
+        LEFT JOIN vehicle_types vt ON cm.vehicle_type_id = vt.id
+        WHERE cm.brand_id = $1
+    """
+    params = [brand_id]
+    if vehicle_type_id:
+        query += " AND cm.vehicle_type_id = $2"
+        params.append(vehicle_type_id)
+    query += " ORDER BY cm.name"
+    rows = await pool.fetch(query, *params)
+    return [dict(r) for r in rows]
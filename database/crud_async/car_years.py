@@ -0,0 +1,12 @@
+from database.async_connection import get_async_pool
+import logging
+
+logger = logging.getLogger(__name__)
+
+async def get_years_by_model(model_id):
+    pool = await get_async_pool()
+    rows = await pool.fetch(
+        "SELECT id, year FROM car_years WHERE model_id = $1 AND is_active = TRUE ORDER BY year",
+        model_id
+    )
+    return [dict(r) for r in rows]
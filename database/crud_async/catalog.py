@@ -0,0 +1,35 @@
+from database.async_connection import get_async_pool
+import logging
+
+logger = logging.getLogger(__name__)
+
+CATALOG_CHANNEL = 'catalog_changed'  # см. migrations/v23_catalog_notify.sql
+
+async def load_catalog():
+    """
+    Весь справочник автомобилей одним соединением и одним снимком (REPEATABLE READ):
+    (vehicle_types, brands, models, years) — списки записей в порядке показа.
+    """
+    pool = await get_async_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction(isolation='repeatable_read', readonly=True):
+            vehicle_types = await conn.fetch("SELECT id, name, code FROM vehicle_types ORDER BY name")
+            brands = await conn.fetch("""
+                SELECT id, name, first_letter, logo_url, country
+                FROM car_brands
+                WHERE is_active = TRUE
+                ORDER BY first_letter, name
+            """)
+            models = await conn.fetch("""
+                SELECT cm.id, cm.brand_id, cm.vehicle_type_id, cm.name, cm.start_year, cm.end_year,
+                       cm.is_active, vt.name AS vehicle_type_name
+                FROM car_models cm
+                LEFT JOIN vehicle_types vt ON cm.vehicle_type_id = vt.id
+                ORDER BY cm.brand_id, cm.name
+            """)
+            years = await conn.fetch("""
+                SELECT id, model_id, year FROM car_years
+                WHERE is_active = TRUE
+                ORDER BY model_id, year
+            """)
+    return vehicle_types, brands, models, years
@@ -0,0 +1,40 @@
+from database.async_connection import get_async_pool
+import logging
+
+logger = logging.getLogger(__name__)
+
+async def get_service(service_id):
+    pool = await get_async_pool()
+    row = await pool.fetchrow("""
+        SELECT s.id, s.name, s.description, s.price, vt.name as vehicle_type, s.is_active,
+               s.duration_minutes
+        FROM services s
+        LEFT JOIN vehicle_types vt ON s.vehicle_type_id = vt.id
+        WHERE s.id = $1
+    """, service_id)
+    return dict(row) if row else None
+
+async def get_services(vehicle_type_id=None):
+    pool = await get_async_pool()
+    if vehicle_type_id:
+        rows = await pool.fetch("""
+            SELECT s.id, s.name, s.description, s.price, vt.name as vehicle_type_name, s.is_active,
+                   s.duration_minutes
+            FROM services s
+            LEFT JOIN vehicle_types vt ON s.vehicle_type_id = vt.id
+            WHERE s.vehicle_type_id = $1 OR s.vehicle_type_id IS NULL
+            ORDER BY s.name
+        """, vehicle_type_id)
+    else:
+        rows = await pool.fetch("""
+            SELECT s.id, s.name, s.description, s.price, vt.name as vehicle_type_name, s.is_active,
+                   s.duration_minutes
+            FROM services s
+            LEFT JOIN vehicle_types vt ON s.vehicle_type_id = vt.id
+            ORDER BY s.name
+        """)
+    return [dict(r) for r in rows]
+
+async def get_services_count():
+    pool = await get_async_pool()
+    return await pool.fetchval("SELECT COUNT(*) FROM services WHERE is_active = TRUE")
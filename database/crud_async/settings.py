@@ -0,0 +1,21 @@
+from database.async_connection import get_async_pool
+from database.crud.settings import snapshot, SettingsSnapshot
+import logging
+
+logger = logging.getLogger(__name__)
+
+async def load_settings() -> SettingsSnapshot:
+    """Reload the shared settings snapshot with one query (asyncpg)."""
+    pool = await get_async_pool()
+    rows = await pool.fetch("SELECT key, value FROM settings")
+    snapshot.replace({r['key']: r['value'] for r in rows})
+    return snapshot
+
+async def get_settings() -> SettingsSnapshot:
+    """Settings snapshot shared with the sync CRUD, loaded on first use."""
+    if not snapshot.loaded:
+        await load_settings()
+    return snapshot
+
+async def get_setting(key, default=None):
+    return (await get_settings()).get(key, default)
@@ -0,0 +1,18 @@
+from database.async_connection import get_async_pool
+import logging
+
+logger = logging.getLogger(__name__)
+
+async def seconds_until_next_notification():
+    """
+    Seconds until the earliest pending notification is due (<= 0 if overdue),
+    None when the queue is empty. Measured by the database clock, the same
+    one claim_due_notifications compares against.
+    """
+    pool = await get_async_pool()
+    delay = await pool.fetchval("""
+        SELECT EXTRACT(EPOCH FROM (MIN(scheduled_for) - NOW()))
+        FROM silenced_notifications
+        WHERE status = 'pending'
+    """)
+    return float(delay) if delay is not None else None
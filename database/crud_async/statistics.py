@@ -0,0 +1,12 @@
+from datetime import date
+from database.async_connection import get_async_pool
+from database.crud.statistics import STATS_SUMMARY_SQL
+
+_SUMMARY_QUERY = STATS_SUMMARY_SQL.format(today='$1', month_start='$2')
+
+async def get_stats_summary():
+    """Counters for /stats from the daily rollup (one round trip)."""
+    pool = await get_async_pool()
+    today = date.today()
+    row = await pool.fetchrow(_SUMMARY_QUERY, today, today.replace(day=1))
+    return dict(row)
\ No newline at end of file
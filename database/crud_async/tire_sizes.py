@@ -0,0 +1,68 @@
+from database.async_connection import get_async_pool
+import logging
+
+logger = logging.getLogger(__name__)
+
+async def get_tire_size(size_id):
+    pool = await get_async_pool()
+    row = await pool.fetchrow("""
+        SELECT id, width, profile, diameter, description
+        FROM tire_sizes WHERE id = $1
+    """, size_id)
+    if row:
+        return {
+            'id': row['id'],
+            'width': row['width'],
+            'profile': row['profile'],
+            'diameter': float(row['diameter']),
+            'description': row['description']
+        }
+    return None
+
+async def get_common_tire_sizes(limit: int = 20) -> list:
+    """
+    Возвращает список популярных размеров шин.
+    Используется для быстрого выбора при добавлении автомобиля.
+    """
+    pool = await get_async_pool()
+    rows = await pool.fetch("""
+        SELECT id, width, profile, diameter, description,
+               width || '/' || profile || ' R' || diameter as display
+        FROM tire_sizes
+        WHERE is_active = TRUE
+        ORDER BY width, profile, diameter
+        LIMIT $1
+    """, limit)
+    return [{
+        'id': r['id'],
+        'width': r['width'],
+        'profile': r['profile'],
+        'diameter': float(r['diameter']),
+        'description': r['description'],
+        'display': r['display']
+    } for r in rows]
+
+async def get_or_create_tire_size(width: int, profile: int, diameter: float, description: str = None) -> int:
+    """
+    Возвращает ID существующего размера шин или создаёт новый, если такого нет.
+    """
+    pool = await get_async_pool()
+    try:
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                tire_id = await conn.fetchval("""
+                    SELECT id FROM tire_sizes
+                    WHERE width = $1 AND profile = $2 AND diameter = $3
+                """, width, profile, diameter)
+                if tire_id:
+                    return tire_id
+                tire_id = await conn.fetchval("""
+                    INSERT INTO tire_sizes (width, profile, diameter, description)
+                    VALUES ($1, $2, $3, $4)
+                    RETURNING id
+                """, width, profile, diameter, description)
+        logger.info(f"Created new tire size: {width}/{profile} R{diameter}")
+        return tire_id
+    except Exception as e:
+        logger.error(f"Error in get_or_create_tire_size: {e}")
+        raise
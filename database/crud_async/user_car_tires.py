@@ -0,0 +1,39 @@
+from database.async_connection import get_async_pool
+import logging
+
+logger = logging.getLogger(__name__)
+
+async def add_tire_to_user_car(user_car_id, tire_size_id, is_primary=False, quantity=4):
+    pool = await get_async_pool()
+    try:
+        await pool.execute("""
+            INSERT INTO user_car_tires (user_car_id, tire_size_id, is_primary, quantity)
+            VALUES ($1, $2, $3, $4)
+            ON CONFLICT (user_car_id, tire_size_id) DO UPDATE SET
+                is_primary = EXCLUDED.is_primary,
+                quantity = EXCLUDED.quantity
+        """, user_car_id, tire_size_id, is_primary, quantity)
+        logger.info(f"Tire {tire_size_id} added to car {user_car_id}.")
+    except Exception as e:
+        logger.error(f"Error adding tire to car: {e}")
+        raise
+
+async def get_tires_for_user_car(user_car_id):
+    pool = await get_async_pool()
+    rows = await pool.fetch("""
+        SELECT ts.id, ts.width, ts.profile, ts.diameter, ts.description,
+               uct.is_primary, uct.quantity
+        FROM user_car_tires uct
+        JOIN tire_sizes ts ON uct.tire_size_id = ts.id
+        WHERE uct.user_car_id = $1
+    """, user_car_id)
+    return [{
+        'id': r['id'],
+        'width': r['width'],
+        'profile': r['profile'],
+        'diameter': float(r['diameter']),
+        'description': r['description'],
+        'is_primary': r['is_primary'],
+        'quantity': r['quantity'],
+        'display': f"{r['width']}/{r['profile']} R{r['diameter']}"
+    } for r in rows]
@@ -0,0 +1,52 @@
+from database.async_connection import get_async_pool
+import logging
+
+logger = logging.getLogger(__name__)
+
+async def create_user_car(user_id, brand_id, model_id, year_id=None):
+    pool = await get_async_pool()
+    try:
+        car_id = await pool.fetchval("""
+            INSERT INTO user_cars (user_id, brand_id, model_id, year_id)
+            VALUES ($1, $2, $3, $4)
+            RETURNING id
+        """, user_id, brand_id, model_id, year_id)
+        logger.info(f"User car {car_id} created for user {user_id}.")
+        return car_id
+    except Exception as e:
+        logger.error(f"Error creating user car: {e}")
+        raise
+
+async def get_user_cars(user_id):
+    pool = await get_async_pool()
+    rows = await pool.fetch("""
+        SELECT uc.id, cb.name AS brand, cm.name AS model, cy.year, uc.is_active
+        FROM user_cars uc
+        JOIN car_brands cb ON uc.brand_id = cb.id
+        JOIN car_models cm ON uc.model_id = cm.id
+        LEFT JOIN car_years cy ON uc.year_id = cy.id
+        WHERE uc.user_id = $1 AND uc.is_active = TRUE
+        ORDER BY uc.created_at DESC
+    """, user_id)
+    return [dict(r) for r in rows]
+
+async def get_user_car(car_id):
+    pool = await get_async_pool()
+    row = await pool.fetchrow("""
+        SELECT uc.id, uc.user_id, cb.name AS brand, cm.name AS model, cy.year, uc.is_active
+        FROM user_cars uc
+        JOIN car_brands cb ON uc.brand_id = cb.id
+        JOIN car_models cm ON uc.model_id = cm.id
+        LEFT JOIN car_years cy ON uc.year_id = cy.id
+        WHERE uc.id = $1
+    """, car_id)
+    return dict(row) if row else None
+
+async def delete_user_car(car_id):
+    pool = await get_async_pool()
+    try:
+        await pool.execute("DELETE FROM user_cars WHERE id = $1", car_id)
+        logger.info(f"User car {car_id} deleted.")
+    except Exception as e:
+        logger.error(f"Error deleting user car {car_id}: {e}")
+        raise
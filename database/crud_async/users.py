@@ -0,0 +1,118 @@
+from database.async_connection import get_async_pool
+from utils.cache import UserContext, set_user_context
+import logging
+
+logger = logging.getLogger(__name__)
+
+async def create_user(user_id, username, full_name, phone=None, is_admin=False):
+    """Create a new user record."""
+    pool = await get_async_pool()
+    try:
+        new_id = await pool.fetchval("""
+            INSERT INTO users (user_id, username, full_name, phone, is_admin)
+            VALUES ($1, $2, $3, $4, $5)
+            ON CONFLICT (user_id) DO UPDATE SET
+                username = EXCLUDED.username,
+                full_name = EXCLUDED.full_name,
+                phone = EXCLUDED.phone,
+                is_admin = EXCLUDED.is_admin
+            RETURNING user_id
+        """, user_id, username, full_name, phone, is_admin)
+        set_user_context(user_id, UserContext(registered=True, is_admin=is_admin, phone=phone))
+        logger.info(f"User {new_id} created/updated.")
+        return new_id
+    except Exception as e:
+        logger.error(f"Error creating user {user_id}: {e}")
+        raise
+
+async def get_user(user_id):
+    """Get user by ID."""
+    pool = await get_async_pool()
+    row = await pool.fetchrow("""
+        SELECT user_id, username, full_name, phone, is_admin, notes, created_at
+        FROM users WHERE user_id = $1
+    """, user_id)
+    return dict(row) if row else None
+
+async def get_user_brief(user_id):
+    """Only the fields AuthMiddleware needs (is_admin, phone)."""
+    pool = await get_async_pool()
+    row = await pool.fetchrow("SELECT is_admin, phone FROM users WHERE user_id = $1", user_id)
+    return dict(row) if row else None
+
+async def is_user_registered(user_id):
+    """Check if user exists."""
+    pool = await get_async_pool()
+    return await pool.fetchval("SELECT 1 FROM users WHERE user_id = $1", user_id) is not None
+
+async def get_admin_ids():
+    """Get list of admin user IDs."""
+    pool = await get_async_pool()
+    rows = await pool.fetch("SELECT user_id FROM users WHERE is_admin = TRUE")
+    return [r['user_id'] for r in rows]
+
+async def get_users_count(registered_after=None):
+    """Get total number of users (optionally after date)."""
+    pool = await get_async_pool()
+    if registered_after:
+        return await pool.fetchval("SELECT COUNT(*) FROM users WHERE created_at >= $1::date", registered_after)
+    return await pool.fetchval("SELECT COUNT(*) FROM users")
+
+async def get_all_users() -> list:
+    """
+    Возвращает список всех пользователей.
+    Для рассылок и массовых задач используйте iter_user_id_batches — он не держит всех в памяти.
+    """
+    pool = await get_async_pool()
+    rows = await pool.fetch("SELECT user_id, username, full_name, phone, is_admin, notes, created_at FROM users ORDER BY created_at DESC")
+    return [dict(r) for r in rows]
+
+def user_segment_sql(first_arg, has_appointments=None, registered_after=None, vehicle_type_id=None):
+    """
+    SQL conditions (AND ...) over alias `u` and their args for a user segment.
+    Placeholders start at $first_arg.
+    """
+    conditions, args = [], []
+    if has_appointments is not None:
+        conditions.append(("" if has_appointments else "NOT ") +
+                          "EXISTS (SELECT 1 FROM appointments a WHERE a.user_id = u.user_id)")
+    if registered_after:
+        args.append(registered_after)
+        conditions.append(f"u.created_at >= ${first_arg + len(args) - 1}::date")
+    if vehicle_type_id:
+        args.append(vehicle_type_id)
+        conditions.append(f"""EXISTS (
+            SELECT 1 FROM user_cars uc JOIN car_models m ON m.id = uc.model_id
+            WHERE uc.user_id = u.user_id AND m.vehicle_type_id = ${first_arg + len(args) - 1})""")
+    return "".join(f" AND {c}" for c in conditions), args
+
+async def iter_user_id_batches(batch_size=1000, has_appointments=None, registered_after=None, vehicle_type_id=None):
+    """
+    Async generator of user ID lists (ordered by user_id) matching the segment.
+    One keyset query per batch: flat memory, no connection held between batches.
+    """
+    pool = await get_async_pool()
+    where, args = user_segment_sql(3, has_appointments, registered_after, vehicle_type_id)
+    query = f"""
+        SELECT u.user_id FROM users u
+        WHERE u.user_id > $1{where}
+        ORDER BY u.user_id
+        LIMIT $2
+    """
+    last_id = 0
+    while True:
+        rows = await pool.fetch(query, last_id, batch_size, *args)
+        if not rows:
+            return
+        batch = [r['user_id'] for r in rows]
+        yield batch
+        if len(batch) < batch_size:
+            return
+        last_id = batch[-1]
+
+async def is_admin(user_id: int) -> bool:
+    """
+    Проверяет, является ли пользователь администратором.
+    """
+    pool = await get_async_pool()
+    return bool(await pool.fetchval("SELECT is_admin FROM users WHERE user_id = $1", user_id))
@@ -0,0 +1,14 @@
+from database.async_connection import get_async_pool
+import logging
+
+logger = logging.getLogger(__name__)
+
+async def get_all_vehicle_types():
+    pool = await get_async_pool()
+    rows = await pool.fetch("SELECT id, name, code FROM vehicle_types ORDER BY name")
+    return [dict(r) for r in rows]
+
+async def get_vehicle_type(type_id):
+    pool = await get_async_pool()
+    row = await pool.fetchrow("SELECT id, name, code FROM vehicle_types WHERE id = $1", type_id)
+    return dict(row) if row else None
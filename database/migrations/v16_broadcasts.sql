@@ -0,0 +1,30 @@
+-- =====================================================
+-- Broadcast jobs (resumable /broadcast)
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS broadcast_jobs (
+    id SERIAL PRIMARY KEY,
+    text TEXT NOT NULL,
+    status VARCHAR(20) DEFAULT 'running',   -- 'running', 'paused', 'cancelled', 'completed'
+    total INTEGER DEFAULT 0,
+    sent INTEGER DEFAULT 0,
+    failed INTEGER DEFAULT 0,
+    created_by BIGINT REFERENCES users(user_id) ON DELETE SET NULL,
+    progress_chat_id BIGINT,                -- сообщение с прогрессом, которое редактируется
+    progress_message_id INTEGER,
+    created_at TIMESTAMP DEFAULT NOW(),
+    finished_at TIMESTAMP
+);
+
+-- One row per recipient: pending rows are the cursor of an unfinished job
+CREATE TABLE IF NOT EXISTS broadcast_recipients (
+    job_id INTEGER NOT NULL REFERENCES broadcast_jobs(id) ON DELETE CASCADE,
+    user_id BIGINT NOT NULL,
+    status VARCHAR(10) DEFAULT 'pending',   -- 'pending', 'sent', 'failed'
+    error TEXT,
+    sent_at TIMESTAMP,
+    PRIMARY KEY (job_id, user_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_broadcast_recipients_pending ON broadcast_recipients(job_id, user_id) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_broadcast_jobs_status ON broadcast_jobs(status);
\ No newline at end of file
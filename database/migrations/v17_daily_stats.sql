@@ -0,0 +1,101 @@
+-- =====================================================
+-- Daily statistics rollup (dashboard and /stats read O(days), not O(rows))
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS daily_stats (
+    day DATE PRIMARY KEY,
+    appointments INTEGER NOT NULL DEFAULT 0,            -- записи на этот день (appointments.date)
+    pending INTEGER NOT NULL DEFAULT 0,                 -- из них в статусе pending
+    revenue DECIMAL(12,2) NOT NULL DEFAULT 0,           -- цены услуг для confirmed/completed
+    new_users INTEGER NOT NULL DEFAULT 0                -- регистрации за день (users.created_at)
+);
+
+-- Add deltas to one day
+CREATE OR REPLACE FUNCTION daily_stats_apply(p_day DATE, p_appointments INTEGER, p_pending INTEGER,
+                                             p_revenue DECIMAL, p_new_users INTEGER)
+RETURNS void AS $$
+    INSERT INTO daily_stats (day, appointments, pending, revenue, new_users)
+    VALUES (p_day, p_appointments, p_pending, p_revenue, p_new_users)
+    ON CONFLICT (day) DO UPDATE SET
+        appointments = daily_stats.appointments + EXCLUDED.appointments,
+        pending = daily_stats.pending + EXCLUDED.pending,
+        revenue = daily_stats.revenue + EXCLUDED.revenue,
+        new_users = daily_stats.new_users + EXCLUDED.new_users;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION appointments_daily_stats_trigger()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM daily_stats_apply(
+            OLD.date, -1,
+            CASE WHEN OLD.status = 'pending' THEN -1 ELSE 0 END,
+            -COALESCE((SELECT price FROM services WHERE id = OLD.service_id
+                       AND OLD.status IN ('confirmed', 'completed')), 0),
+            0);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM daily_stats_apply(
+            NEW.date, 1,
+            CASE WHEN NEW.status = 'pending' THEN 1 ELSE 0 END,
+            COALESCE((SELECT price FROM services WHERE id = NEW.service_id
+                      AND NEW.status IN ('confirmed', 'completed')), 0),
+            0);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION users_daily_stats_trigger()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM daily_stats_apply(COALESCE(NEW.created_at, NOW())::date, 0, 0, 0, 1);
+    ELSE
+        PERFORM daily_stats_apply(COALESCE(OLD.created_at, NOW())::date, 0, 0, 0, -1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS appointments_daily_stats ON appointments;
+CREATE TRIGGER appointments_daily_stats
+    AFTER INSERT OR DELETE OR UPDATE OF date, status, service_id ON appointments
+    FOR EACH ROW EXECUTE FUNCTION appointments_daily_stats_trigger();
+
+DROP TRIGGER IF EXISTS users_daily_stats ON users;
+CREATE TRIGGER users_daily_stats
+    AFTER INSERT OR DELETE ON users
+    FOR EACH ROW EXECUTE FUNCTION users_daily_stats_trigger();
+
+-- Recompute days >= from_day from the source tables (backfill and nightly reconciliation,
+-- e.g. after service prices change). The table lock makes concurrent trigger updates wait.
+CREATE OR REPLACE FUNCTION refresh_daily_stats(from_day DATE)
+RETURNS void AS $$
+BEGIN
+    LOCK TABLE daily_stats IN EXCLUSIVE MODE;
+    DELETE FROM daily_stats WHERE day >= from_day;
+    INSERT INTO daily_stats (day, appointments, pending, revenue, new_users)
+    SELECT day, SUM(appointments), SUM(pending), SUM(revenue), SUM(new_users)
+    FROM (
+        SELECT a.date AS day,
+               COUNT(*) AS appointments,
+               COUNT(*) FILTER (WHERE a.status = 'pending') AS pending,
+               COALESCE(SUM(s.price) FILTER (WHERE a.status IN ('confirmed', 'completed')), 0) AS revenue,
+               0 AS new_users
+        FROM appointments a
+        LEFT JOIN services s ON s.id = a.service_id
+        WHERE a.date >= from_day
+        GROUP BY a.date
+        UNION ALL
+        SELECT created_at::date, 0, 0, 0, COUNT(*)
+        FROM users
+        WHERE created_at >= from_day
+        GROUP BY created_at::date
+    ) t
+    GROUP BY day;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Backfill from existing data
+SELECT refresh_daily_stats('-infinity'::date);
\ No newline at end of file
@@ -0,0 +1,18 @@
+-- =====================================================
+-- Keyset pagination: indexes matching the listing sort orders
+-- =====================================================
+
+-- Сравнение кортежей (created_at, user_id) < (...) не видит NULL, поэтому колонка обязательна
+UPDATE users SET created_at = '1970-01-01' WHERE created_at IS NULL;
+ALTER TABLE users ALTER COLUMN created_at SET NOT NULL;
+
+-- Список пользователей в админке: ORDER BY created_at DESC, user_id DESC
+CREATE INDEX IF NOT EXISTS idx_users_created_at_user_id ON users(created_at DESC, user_id DESC);
+
+-- Список записей: ORDER BY date DESC, time DESC, id DESC (заменяет idx_appointments_date)
+CREATE INDEX IF NOT EXISTS idx_appointments_date_time_id ON appointments(date DESC, time DESC, id DESC);
+DROP INDEX IF EXISTS idx_appointments_date;
+
+-- Журнал ошибок листается по id (PRIMARY KEY); для фильтра по уровню — составной индекс
+CREATE INDEX IF NOT EXISTS idx_error_logs_level_id ON error_logs(level, id DESC);
+DROP INDEX IF EXISTS idx_error_logs_level;
@@ -0,0 +1,16 @@
+-- =====================================================
+-- Indexed user search for the admin panel (trigram + normalized phone)
+-- =====================================================
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Телефон только цифрами: "+7 (900) 123-45-67" -> "79001234567"
+ALTER TABLE users ADD COLUMN IF NOT EXISTS phone_digits VARCHAR(20)
+    GENERATED ALWAYS AS (NULLIF(regexp_replace(COALESCE(phone, ''), '\D', '', 'g'), '')) STORED;
+
+-- ILIKE '%term%' и similarity() по имени и username
+CREATE INDEX IF NOT EXISTS idx_users_username_trgm ON users USING GIN (username gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_users_full_name_trgm ON users USING GIN (full_name gin_trgm_ops);
+
+-- Поиск по фрагменту номера
+CREATE INDEX IF NOT EXISTS idx_users_phone_digits_trgm ON users USING GIN (phone_digits gin_trgm_ops);
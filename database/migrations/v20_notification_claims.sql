@@ -0,0 +1,6 @@
+-- =====================================================
+-- Delayed notifications: claim-then-send delivery
+-- =====================================================
+
+-- Строки в статусе 'sending' захвачены воркером; зависшие (воркер упал) возвращаются в очередь
+CREATE INDEX IF NOT EXISTS idx_silenced_notifications_sending ON silenced_notifications(last_attempt) WHERE status = 'sending';
@@ -0,0 +1,16 @@
+-- =====================================================
+-- Background job run history (scheduler with leader election)
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS job_runs (
+    id BIGSERIAL PRIMARY KEY,
+    job_id VARCHAR(100) NOT NULL,
+    node VARCHAR(255) NOT NULL,                 -- host:pid процесса-лидера
+    started_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    finished_at TIMESTAMP,
+    duration_ms INTEGER,
+    status VARCHAR(20) NOT NULL DEFAULT 'running',  -- running, success, error
+    error TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_job_runs_job_started ON job_runs(job_id, started_at DESC);
@@ -0,0 +1,7 @@
+-- =====================================================
+-- Backups: streaming dumps with checksum and format
+-- =====================================================
+
+ALTER TABLE backups ADD COLUMN IF NOT EXISTS checksum VARCHAR(64);                -- sha256 файла (или каталога для format = directory)
+ALTER TABLE backups ADD COLUMN IF NOT EXISTS format VARCHAR(20) DEFAULT 'gzip';   -- gzip, zstd, directory
+ALTER TABLE backups ADD COLUMN IF NOT EXISTS finished_at TIMESTAMP;
@@ -0,0 +1,34 @@
+-- =====================================================
+-- Catalog change notifications
+-- Бот держит справочник автомобилей в памяти (services/catalog.py) и
+-- перестраивает его по NOTIFY catalog_changed. Триггер уровня оператора
+-- срабатывает на любую правку: из админки, импорта или вручную в psql.
+-- Одинаковые NOTIFY в одной транзакции PostgreSQL склеивает в одно.
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION notify_catalog_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('catalog_changed', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_car_brands_catalog_changed ON car_brands;
+CREATE TRIGGER trg_car_brands_catalog_changed
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON car_brands
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_catalog_changed();
+
+DROP TRIGGER IF EXISTS trg_car_models_catalog_changed ON car_models;
+CREATE TRIGGER trg_car_models_catalog_changed
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON car_models
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_catalog_changed();
+
+DROP TRIGGER IF EXISTS trg_car_years_catalog_changed ON car_years;
+CREATE TRIGGER trg_car_years_catalog_changed
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON car_years
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_catalog_changed();
+
+DROP TRIGGER IF EXISTS trg_vehicle_types_catalog_changed ON vehicle_types;
+CREATE TRIGGER trg_vehicle_types_catalog_changed
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON vehicle_types
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_catalog_changed();
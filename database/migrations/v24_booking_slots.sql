@@ -0,0 +1,20 @@
+-- =====================================================
+-- Booking slots: service duration and shop capacity
+-- =====================================================
+
+-- Длительность услуги; запись хранит свою копию, чтобы правка услуги не сдвигала уже занятые слоты
+ALTER TABLE services ADD COLUMN IF NOT EXISTS duration_minutes INTEGER NOT NULL DEFAULT 30
+    CHECK (duration_minutes > 0);
+ALTER TABLE appointments ADD COLUMN IF NOT EXISTS duration_minutes INTEGER NOT NULL DEFAULT 30
+    CHECK (duration_minutes > 0);
+
+-- Занятость считается по дате без отменённых записей (services/slots.py)
+CREATE INDEX IF NOT EXISTS idx_appointments_active_date ON appointments(date, time)
+    INCLUDE (duration_minutes) WHERE status <> 'cancelled';
+
+INSERT INTO settings (key, value, description) VALUES
+    ('booking_bays', '1', 'Число постов: сколько машин обслуживается одновременно'),
+    ('booking_day_start', '09:00', 'Начало приёма записей (ЧЧ:ММ)'),
+    ('booking_day_end', '20:00', 'Окончание работы: к этому времени услуга должна завершиться (ЧЧ:ММ)'),
+    ('booking_slot_minutes', '30', 'Шаг сетки времени записи, минут')
+ON CONFLICT (key) DO NOTHING;
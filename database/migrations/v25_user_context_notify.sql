@@ -0,0 +1,24 @@
+-- =====================================================
+-- User context change notifications
+-- Бот кеширует контекст пользователя (registered, is_admin, phone) на 5 минут
+-- (utils/cache.py). Правка из админки или регистрация через другой воркер
+-- меняют строку в другом процессе, поэтому каждый процесс бота слушает
+-- user_changed и сбрасывает контекст пользователя из payload
+-- (services/user_contexts.py).
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION notify_user_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('user_changed', OLD.user_id::text);
+    ELSE
+        PERFORM pg_notify('user_changed', NEW.user_id::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_users_context_changed ON users;
+CREATE TRIGGER trg_users_context_changed
+    AFTER INSERT OR DELETE OR UPDATE OF is_admin, phone ON users
+    FOR EACH ROW EXECUTE FUNCTION notify_user_changed();
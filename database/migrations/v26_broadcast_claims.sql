@@ -0,0 +1,8 @@
+-- =====================================================
+-- Broadcast recipients: claim-then-send delivery
+-- =====================================================
+
+-- Получатели в статусе 'sending' захвачены воркером, который держит
+-- advisory lock рассылки; если он упал, следующий владелец блокировки
+-- возвращает их в 'pending' (database/crud_async/broadcasts.py)
+CREATE INDEX IF NOT EXISTS idx_broadcast_recipients_sending ON broadcast_recipients(job_id) WHERE status = 'sending';
@@ -0,0 +1,13 @@
+-- =====================================================
+-- daily_stats: users moved to 1970-01-01 by v18
+-- =====================================================
+
+-- Бэкфилл v17 не посчитал пользователей с created_at IS NULL, а v18 перенёс их
+-- на 1970-01-01 через UPDATE, на который триггер users_daily_stats не срабатывает.
+-- Пересчитываем этот день из users, так что повторный запуск ничего не меняет.
+LOCK TABLE daily_stats IN EXCLUSIVE MODE;
+INSERT INTO daily_stats (day, new_users)
+SELECT '1970-01-01'::date, COUNT(*)
+FROM users
+WHERE created_at >= '1970-01-01' AND created_at < '1970-01-02'
+ON CONFLICT (day) DO UPDATE SET new_users = EXCLUDED.new_users;
@@ -3,93 +3,173 @@
 Импорт марок и моделей автомобилей из JSON-файла (json.csv) в PostgreSQL.
 Файл должен быть в формате JSON (массив объектов) с полями:
     brand, model, start_year, end_year
+
+Файл читается потоково, дубликаты сводятся в памяти, строки загружаются
+через COPY во временную таблицу и сливаются в car_brands / car_models /
+car_years одной транзакцией. Повторный запуск ничего не дублирует: он
+обновляет годы выпуска и добавляет только новое.
 """
 
+import io
 import json
-import asyncio
+import time
 import logging
-from database.connection import get_db_connection, return_db_connection
-from database.crud.car_brands import create_brand, get_brand_by_name  # нужна функция поиска марки по имени
-from database.crud.car_models import create_model
+from datetime import date
+from database.connection import transaction
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 JSON_FILE = "json.csv"  # хотя расширение .csv, это JSON
+DEFAULT_VEHICLE_TYPE_ID = 1  # легковой автомобиль
+READ_SIZE = 64 * 1024
+
+def iter_json_array(f):
+    """Потоково разбирает JSON-массив объектов, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buf = ''
+    started = False
+    while True:
+        chunk = f.read(READ_SIZE)
+        buf += chunk
+        pos = 0
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos += 1
+            if not started:
+                if pos < len(buf) and buf[pos] == '[':
+                    started = True
+                    pos += 1
+                    continue
+                if pos < len(buf):
+                    raise ValueError("JSON file must contain an array")
+                break
+            if pos < len(buf) and buf[pos] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise
+                break  # объект обрезан границей блока — дочитываем
+            yield item
+            pos = end
+        buf = buf[pos:]
+        if not chunk:
+            return
+
+def _year(value):
+    """'2016' -> 2016, '' / None -> None."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    return int(value) if value else None
 
-def load_data():
-    """Загружает данные из JSON-файла."""
-    with open(JSON_FILE, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    return data
-
-def get_brand_id_by_name(name):
-    """Возвращает ID марки по имени, если она уже существует."""
-    # Можно добавить функцию в car_brands.py: get_brand_by_name
-    # Здесь временно используем прямой запрос
-    from database.connection import get_db_connection
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT id FROM car_brands WHERE name = %s", (name,))
-    row = cur.fetchone()
-    cur.close()
-    return_db_connection(conn)
-    return row[0] if row else None
-
-async def import_brands_and_models():
-    data = load_data()
-    logger.info(f"Загружено записей: {len(data)}")
-
-    brand_cache = {}  # имя марки -> её ID в БД
-
-    for item in data:
-        brand_name = item['brand'].strip()
-        model_name = item['model'].strip()
-        start_year = item['start_year']
-        end_year = item['end_year']
-
-        # Преобразуем пустые строки в None
-        start_year = int(start_year) if start_year and start_year.strip() else None
-        end_year = int(end_year) if end_year and end_year.strip() else None
-
-        # Проверяем, есть ли марка в кеше
-        if brand_name not in brand_cache:
-            # Ищем марку в БД
-            brand_id = get_brand_id_by_name(brand_name)
-            if not brand_id:
-                # Создаём новую марку
-                brand_data = {
-                    'name': brand_name,
-                    'country': None,
-                    'logo_url': None,
-                    'is_active': True,
-                    'sort_order': 0
-                }
-                brand_id = await asyncio.to_thread(create_brand, brand_data)
-                logger.info(f"Создана марка: {brand_name} (ID {brand_id})")
-            brand_cache[brand_name] = brand_id
-
-        brand_id = brand_cache[brand_name]
-
-        # Создаём модель
-        model_data = {
-            'brand_id': brand_id,
-            'name': model_name,
-            'start_year': start_year,
-            'end_year': end_year,
-            'vehicle_type_id': 1,  # по умолчанию легковой автомобиль
-            'is_active': True
-        }
+def collect_models(items):
+    """
+    Сводит записи в {(марка, модель): (start_year, end_year)}.
+    У дубликатов берётся самый широкий диапазон лет (нет end_year — выпускается до сих пор).
+    """
+    models = {}
+    skipped = 0
+    for item in items:
+        brand = (item.get('brand') or '').strip()
+        model = (item.get('model') or '').strip()
         try:
-            new_model_id = await asyncio.to_thread(create_model, model_data)
-            logger.info(f"Создана модель: {model_name} (ID {new_model_id}) для марки {brand_name}")
-        except Exception as e:
-            logger.error(f"Ошибка при создании модели {model_name}: {e}")
+            start, end = _year(item.get('start_year')), _year(item.get('end_year'))
+        except ValueError:
+            start = end = None
+        if not brand or not model:
+            skipped += 1
+            continue
+        key = (brand, model)
+        if key in models:
+            old_start, old_end = models[key]
+            starts = [y for y in (start, old_start) if y is not None]
+            start = min(starts) if starts else None
+            end = None if end is None or old_end is None else max(end, old_end)
+        models[key] = (start, end)
+    if skipped:
+        logger.warning(f"Пропущено записей без марки или модели: {skipped}")
+    return models
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+def import_catalog(models, vehicle_type_id=DEFAULT_VEHICLE_TYPE_ID):
+    """
+    Загружает модели во временную таблицу через COPY и сливает их одной транзакцией.
+    Возвращает число добавленных марок, добавленных/обновлённых моделей и добавленных годов.
+    """
+    buf = io.StringIO()
+    for (brand, model), (start, end) in models.items():
+        buf.write('\t'.join(_copy_value(v) for v in (brand, model, start, end)) + '\n')
+    buf.seek(0)
+
+    with transaction() as cur:
+        cur.execute("""
+            CREATE TEMP TABLE catalog_import (
+                brand VARCHAR(100) NOT NULL,
+                model VARCHAR(100) NOT NULL,
+                start_year INTEGER,
+                end_year INTEGER
+            ) ON COMMIT DROP
+        """)
+        cur.copy_expert("COPY catalog_import (brand, model, start_year, end_year) FROM STDIN", buf)
+
+        cur.execute("""
+            INSERT INTO car_brands (name)
+            SELECT DISTINCT brand FROM catalog_import
+            ON CONFLICT (name) DO NOTHING
+        """)
+        brands = cur.rowcount
+
+        # Тип ТС существующих моделей не трогаем: его мог поменять администратор
+        cur.execute("""
+            INSERT INTO car_models (brand_id, name, start_year, end_year, vehicle_type_id)
+            SELECT b.id, s.model, s.start_year, s.end_year, %s
+            FROM catalog_import s
+            JOIN car_brands b ON b.name = s.brand
+            ON CONFLICT (brand_id, name) DO UPDATE SET
+                start_year = EXCLUDED.start_year,
+                end_year = EXCLUDED.end_year
+            WHERE (car_models.start_year, car_models.end_year)
+                  IS DISTINCT FROM (EXCLUDED.start_year, EXCLUDED.end_year)
+        """, (vehicle_type_id,))
+        models_changed = cur.rowcount
+
+        # Годы выпуска; без end_year — по текущий год. Лишние годы не удаляем: на них ссылаются user_cars
+        cur.execute("""
+            INSERT INTO car_years (model_id, year)
+            SELECT m.id, y
+            FROM catalog_import s
+            JOIN car_brands b ON b.name = s.brand
+            JOIN car_models m ON m.brand_id = b.id AND m.name = s.model
+            CROSS JOIN LATERAL generate_series(s.start_year, COALESCE(s.end_year, %s)) AS y
+            WHERE s.start_year IS NOT NULL
+            ON CONFLICT (model_id, year) DO NOTHING
+        """, (date.today().year,))
+        years = cur.rowcount
+
+    return {'brands': brands, 'models': models_changed, 'years': years}
 
-    logger.info("Импорт завершён.")
+def import_brands_and_models(path=JSON_FILE):
+    started = time.monotonic()
+    with open(path, 'r', encoding='utf-8') as f:
+        models = collect_models(iter_json_array(f))
+    logger.info(f"Уникальных моделей в файле: {len(models)}")
+    result = import_catalog(models)
+    logger.info(
+        f"Импорт завершён за {time.monotonic() - started:.2f} с: "
+        f"новых марок {result['brands']}, новых/обновлённых моделей {result['models']}, "
+        f"новых годов выпуска {result['years']}"
+    )
+    return result
 
-async def main():
-    await import_brands_and_models()
+def main():
+    import_brands_and_models()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    main()
\ No newline at end of file
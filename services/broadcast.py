@@ -0,0 +1,366 @@
+import asyncio
+import time
+import logging
+from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError, TelegramBadRequest
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from database.async_connection import open_dedicated_async_connection
+from database.crud_async.broadcasts import (
+    get_broadcast_job,
+    get_broadcast_status,
+    get_unfinished_broadcast_ids,
+    set_broadcast_status,
+    claim_recipients,
+    release_recipients,
+    mark_recipients,
+)
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """
+    Async token bucket: `rate` tokens per second, bursts up to `capacity`.
+    pause() blocks everyone until the given moment (Telegram flood control).
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # Под блокировкой: ожидающие получают токены по очереди, без гонки за один токен
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+class ChatRateLimiter:
+    """Global bucket plus a minimum interval between messages to the same chat."""
+
+    def __init__(self, global_rate=30, per_chat_interval=1.0):
+        self.bucket = TokenBucket(global_rate)
+        self.per_chat_interval = per_chat_interval
+        self._next_allowed = {}  # chat_id -> monotonic time
+
+    async def acquire(self, chat_id):
+        now = time.monotonic()
+        slot = max(now, self._next_allowed.get(chat_id, 0))
+        self._next_allowed[chat_id] = slot + self.per_chat_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+        await self.bucket.acquire()
+        if len(self._next_allowed) > 10000:
+            self._prune()
+
+    def _prune(self):
+        now = time.monotonic()
+        self._next_allowed = {c: t for c, t in self._next_allowed.items() if t > now}
+
+def broadcast_keyboard(job_id, status):
+    """Pause/resume/cancel buttons under the progress message."""
+    if status in ('completed', 'cancelled'):
+        return None
+    toggle = (InlineKeyboardButton(text="▶️ Продолжить", callback_data=f"bc_resume:{job_id}")
+              if status == 'paused' else
+              InlineKeyboardButton(text="⏸ Пауза", callback_data=f"bc_pause:{job_id}"))
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [toggle, InlineKeyboardButton(text="⛔ Отменить", callback_data=f"bc_cancel:{job_id}")]
+    ])
+
+def format_progress(job_id, status, total, sent, failed):
+    titles = {
+        'running': '📤 Идёт рассылка',
+        'paused': '⏸ Рассылка на паузе',
+        'cancelled': '⛔ Рассылка отменена',
+        'completed': '✅ Рассылка завершена',
+    }
+    done = sent + failed
+    percent = int(done * 100 / total) if total else 100
+    return (
+        f"{titles.get(status, status)} #{job_id}\n\n"
+        f"📊 Прогресс: {done}/{total} ({percent}%)\n"
+        f"📨 Успешно отправлено: {sent}\n"
+        f"❌ Ошибок: {failed}"
+    )
+
+# Ключ pg advisory lock рассылок: (ключ, id рассылки) держит воркер, который её выполняет
+BROADCAST_LOCK_KEY = 0x62_63_73_74  # 'bcst'
+
+class _JobControl:
+    def __init__(self, status):
+        self.status = status
+        self.resumed = asyncio.Event()
+        if status == 'running':
+            self.resumed.set()
+
+    def apply(self, status):
+        """Take a status read from the job row; returns True if it changed."""
+        if status == self.status:
+            return False
+        self.status = status
+        if status == 'paused':
+            self.resumed.clear()
+        else:
+            self.resumed.set()  # running — продолжить, cancelled/lost — разбудить, чтобы задача завершилась
+        return True
+
+class BroadcastService:
+    """
+    Runs broadcast jobs stored in broadcast_jobs/broadcast_recipients.
+
+    A job runs in one bot process at a time: the runner holds the advisory
+    lock (BROADCAST_LOCK_KEY, job_id) on its own connection, and every
+    process periodically picks up unfinished jobs whose lock is free, e.g.
+    after their worker died. Recipients are claimed in batches (FOR UPDATE
+    SKIP LOCKED), sent concurrently through a shared rate limiter and marked
+    in bulk. Pause, resume and cancel are written to the job row and read
+    by the runner every `control_interval` seconds, so the buttons work from
+    any process. The admin sees progress in one message that is edited at
+    most every `progress_interval` seconds.
+    """
+
+    def __init__(self, bot, rate=30, concurrency=30, batch_size=500, progress_interval=3.0, max_attempts=3,
+                 control_interval=2.0, rescan_interval=60.0):
+        self.bot = bot
+        self.limiter = ChatRateLimiter(global_rate=rate)
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.progress_interval = progress_interval
+        self.max_attempts = max_attempts
+        self.control_interval = control_interval
+        self.rescan_interval = rescan_interval
+        self._tasks = {}     # job_id -> asyncio.Task
+        self._controls = {}  # job_id -> _JobControl
+        self._progress = {}  # job_id -> {'job': dict, 'reported_at': float}
+        self._rescan_task = None
+
+    # ---------- Управление ----------
+    def start(self, job_id):
+        """Run the job here unless this process already does; another process holding its lock wins."""
+        if job_id in self._tasks:
+            return
+        task = asyncio.create_task(self._run(job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._forget(job_id))
+
+    def _forget(self, job_id):
+        self._tasks.pop(job_id, None)
+        self._controls.pop(job_id, None)
+
+    def is_active(self, job_id):
+        """True if the job runs in this process."""
+        return job_id in self._tasks
+
+    async def pause(self, job_id):
+        return await self._control(job_id, 'paused', ('running',))
+
+    async def resume(self, job_id):
+        return await self._control(job_id, 'running', ('paused',))
+
+    async def cancel(self, job_id):
+        return await self._control(job_id, 'cancelled', ('running', 'paused'))
+
+    async def _control(self, job_id, status, expected):
+        """Write the new status to the job row; False if the job is not in an `expected` state."""
+        if not await set_broadcast_status(job_id, status, expected):
+            return False
+        # Если рассылка идёт в этом процессе, не ждём её следующего опроса
+        control = self._controls.get(job_id)
+        if control and control.apply(status):
+            await self._report(job_id, force=True)
+        return True
+
+    async def resume_unfinished(self):
+        """Pick up running/paused jobs that no process is running (previous process stopped or died)."""
+        for job_id in await get_unfinished_broadcast_ids(BROADCAST_LOCK_KEY):
+            if job_id not in self._tasks:
+                logger.info(f"Picking up broadcast job {job_id}")
+                self.start(job_id)
+
+    async def start_rescan(self):
+        """Resume orphaned jobs now and then every `rescan_interval` seconds."""
+        await self.resume_unfinished()
+        if self._rescan_task is None:
+            self._rescan_task = asyncio.create_task(self._rescan())
+
+    async def _rescan(self):
+        while True:
+            await asyncio.sleep(self.rescan_interval)
+            try:
+                await self.resume_unfinished()
+            except Exception as e:
+                logger.warning(f"Cannot check unfinished broadcasts: {e}")
+
+    async def stop(self):
+        """Stop all tasks; their jobs stay running/paused in the database for another process."""
+        tasks = list(self._tasks.values())
+        if self._rescan_task is not None:
+            tasks.append(self._rescan_task)
+            self._rescan_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # ---------- Отправка ----------
+    async def _run(self, job_id):
+        try:
+            conn = await open_dedicated_async_connection()
+        except Exception as e:
+            logger.error(f"Broadcast job {job_id}: cannot open lock connection: {e}")
+            return
+        watcher = None
+        try:
+            # Блокировка сессии: освобождается сама, если процесс или соединение умрут
+            if not await conn.fetchval("SELECT pg_try_advisory_lock($1, $2)", BROADCAST_LOCK_KEY, job_id):
+                logger.info(f"Broadcast job {job_id} is run by another process")
+                return
+            job = await get_broadcast_job(job_id)
+            if not job or job['status'] not in ('running', 'paused'):
+                return
+            released = await release_recipients(job_id)
+            if released:
+                logger.warning(f"Broadcast job {job_id}: {released} recipients claimed by a stopped worker returned to the queue")
+            control = self._controls[job_id] = _JobControl(job['status'])
+            self._progress[job_id] = {'job': job, 'reported_at': 0.0}
+            watcher = asyncio.create_task(self._watch(job_id, conn, control))
+            await self._send_job(job_id, job, control)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Broadcast job {job_id} crashed: {e}", exc_info=True)
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+                await asyncio.gather(watcher, return_exceptions=True)
+            self._progress.pop(job_id, None)
+            try:
+                await conn.close()
+            except Exception:
+                pass
+
+    async def _watch(self, job_id, conn, control):
+        """Poll the job row for pause/resume/cancel; losing the lock connection stops the job here."""
+        while True:
+            await asyncio.sleep(self.control_interval)
+            try:
+                status = await get_broadcast_status(job_id, conn)
+            except Exception as e:
+                logger.warning(f"Broadcast job {job_id}: lock connection lost ({e}), stopping here")
+                control.apply('lost')
+                return
+            if status and control.apply(status):
+                await self._report(job_id, force=True)
+
+    async def _send_job(self, job_id, job, control):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        await self._report(job_id, force=True)
+        while True:
+            await control.resumed.wait()
+            if control.status != 'running':
+                break
+            batch = await claim_recipients(job_id, self.batch_size)
+            if not batch:
+                break
+            results = await asyncio.gather(*(
+                self._send_guarded(semaphore, control, user_id, job['text']) for user_id in batch
+            ))
+            sent_ids = [uid for uid, error in results if error is None]
+            failed = [(uid, error) for uid, error in results if error not in (None, False)]
+            skipped = [uid for uid, error in results if error is False]
+            if sent_ids or failed:
+                job['sent'], job['failed'] = await mark_recipients(job_id, sent_ids, failed)
+            if skipped:
+                # Пауза или отмена посреди пачки: неотправленные возвращаются в очередь
+                await release_recipients(job_id, skipped)
+            await self._report(job_id)
+        if control.status == 'lost':
+            # Блокировки больше нет — рассылку подберёт другой процесс
+            return
+        if control.status != 'cancelled':
+            await set_broadcast_status(job_id, 'completed')
+        control.status = await get_broadcast_status(job_id) or control.status
+        await self._report(job_id, force=True)
+        logger.info(f"Broadcast job {job_id} {control.status}: sent {job['sent']}, failed {job['failed']}")
+
+    async def _send_guarded(self, semaphore, control, user_id, text):
+        """Returns (user_id, None) on success, (user_id, error) on failure, (user_id, False) if skipped."""
+        async with semaphore:
+            if control.status != 'running':
+                return user_id, False
+            return user_id, await self._send(user_id, text, control)
+
+    async def _send(self, user_id, text, control=None):
+        """
+        None when sent, an error text when the recipient failed, False if the
+        job stopped while the message waited for flood control to end.
+        """
+        error = 'retry limit exceeded'
+        attempts = 0
+        while attempts < self.max_attempts:
+            await self.limiter.acquire(user_id)
+            if control is not None and control.status != 'running':
+                return False
+            try:
+                await self.bot.send_message(user_id, text)
+                return None
+            except TelegramRetryAfter as e:
+                # Flood control касается всего бота, а не получателя: останавливаем
+                # общий bucket и повторяем, не расходуя попытку
+                logger.warning(f"Flood control: pausing broadcast for {e.retry_after}s")
+                self.limiter.bucket.pause(e.retry_after)
+                continue
+            except TelegramForbiddenError:
+                return 'blocked by user'
+            except TelegramBadRequest as e:
+                return str(e)
+            except Exception as e:
+                logger.error(f"Failed to send to {user_id}: {e}")
+                error = str(e) or e.__class__.__name__
+                attempts += 1
+                if attempts < self.max_attempts:
+                    await asyncio.sleep(1)
+        return error
+
+    async def _report(self, job_id, force=False):
+        """Edit the admin's progress message (throttled)."""
+        progress = self._progress.get(job_id)
+        if not progress:
+            return
+        now = time.monotonic()
+        if not force and now - progress['reported_at'] < self.progress_interval:
+            return
+        progress['reported_at'] = now
+        job = progress['job']
+        if not job.get('progress_chat_id'):
+            job.update(await get_broadcast_job(job_id) or {})
+            if not job.get('progress_chat_id'):
+                return
+        control = self._controls.get(job_id)
+        status = control.status if control else job['status']
+        try:
+            await self.bot.edit_message_text(
+                format_progress(job_id, status, job['total'], job['sent'], job['failed']),
+                chat_id=job['progress_chat_id'],
+                message_id=job['progress_message_id'],
+                reply_markup=broadcast_keyboard(job_id, status)
+            )
+        except TelegramBadRequest as e:
+            if 'not modified' not in str(e):
+                logger.warning(f"Cannot update broadcast {job_id} progress: {e}")
+        except Exception as e:
+            logger.warning(f"Cannot update broadcast {job_id} progress: {e}")
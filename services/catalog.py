@@ -0,0 +1,169 @@
+import asyncio
+import time
+import logging
+from database.async_connection import open_dedicated_async_connection
+from database.crud_async.catalog import load_catalog, CATALOG_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+class CatalogIndex:
+    """
+    Immutable in-memory snapshot of the vehicle catalog.
+
+    Built from one bulk load; every lookup of the add-car flow is a dict
+    access. Never modified after construction — a change in the database
+    produces a new index with the next version, swapped in atomically.
+    """
+
+    __slots__ = ('version', 'loaded_at', 'vehicle_types', 'brands_by_letter',
+                 '_models', '_years')
+
+    def __init__(self, version, vehicle_types, brands, models, years):
+        self.version = version
+        self.loaded_at = time.time()
+        self.vehicle_types = [dict(r) for r in vehicle_types]
+
+        brands_by_letter = {}
+        for r in brands:
+            brands_by_letter.setdefault(r['first_letter'], []).append({
+                'id': r['id'],
+                'name': r['name'],
+                'logo_url': r['logo_url'],
+                'country': r['country'],
+            })
+        self.brands_by_letter = brands_by_letter
+
+        # (brand_id, None) — все модели марки, (brand_id, vehicle_type_id) — модели типа ТС
+        models_index = {}
+        for r in models:
+            model = {
+                'id': r['id'],
+                'name': r['name'],
+                'start_year': r['start_year'],
+                'end_year': r['end_year'],
+                'is_active': r['is_active'],
+                'vehicle_type_name': r['vehicle_type_name'],
+            }
+            models_index.setdefault((r['brand_id'], None), []).append(model)
+            if r['vehicle_type_id'] is not None:
+                models_index.setdefault((r['brand_id'], r['vehicle_type_id']), []).append(model)
+        self._models = models_index
+
+        years_index = {}
+        for r in years:
+            years_index.setdefault(r['model_id'], []).append({'id': r['id'], 'year': r['year']})
+        self._years = years_index
+
+    def brands(self, letter):
+        return self.brands_by_letter.get((letter or '').upper(), [])
+
+    def models(self, brand_id, vehicle_type_id=None):
+        return self._models.get((brand_id, vehicle_type_id or None), [])
+
+    def years(self, model_id):
+        return self._years.get(model_id, [])
+
+    def __repr__(self):
+        return f"<CatalogIndex v{self.version}: {sum(map(len, self.brands_by_letter.values()))} brands>"
+
+class CatalogService:
+    """
+    Holds the current CatalogIndex and keeps it fresh.
+
+    The index is loaded once at startup; a LISTEN on catalog_changed
+    (fired by table triggers, see migrations/v23_catalog_notify.sql)
+    triggers a rebuild after a short quiet period, so a bulk import costs
+    a single reload. Readers never wait for a rebuild: they keep using the
+    previous index until the new one is assigned.
+    """
+
+    DEBOUNCE = 1.0      # секунд тишины после NOTIFY перед перезагрузкой
+    RETRY_DELAY = 5     # пауза после ошибки соединения
+
+    def __init__(self):
+        self._index = None
+        self._version = 0
+        self._changed = asyncio.Event()
+        self._reload_lock = asyncio.Lock()
+        self._conn = None
+        self._task = None
+
+    @property
+    def version(self):
+        return self._index.version if self._index else 0
+
+    async def get(self) -> CatalogIndex:
+        """Current index; loads it on first use if start() has not run yet."""
+        index = self._index
+        if index is None:
+            index = await self.reload()
+        return index
+
+    async def reload(self) -> CatalogIndex:
+        async with self._reload_lock:
+            started = time.monotonic()
+            rows = await load_catalog()
+            self._version += 1
+            index = CatalogIndex(self._version, *rows)
+            self._index = index  # атомарная замена: читатели видят либо старый, либо новый индекс
+        logger.info(f"Catalog index v{index.version} loaded in {(time.monotonic() - started) * 1000:.0f} ms")
+        return index
+
+    async def start(self):
+        await self.reload()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self._close()
+
+    def _on_notify(self, conn, pid, channel, payload):
+        self._changed.set()
+
+    async def _listen(self):
+        if self._conn is None or self._conn.is_closed():
+            self._conn = await open_dedicated_async_connection()
+            await self._conn.add_listener(CATALOG_CHANNEL, self._on_notify)
+            return True
+        return False
+
+    async def _close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None and not conn.is_closed():
+            try:
+                await conn.close()
+            except Exception:
+                pass
+
+    async def _run(self):
+        reconnected = False
+        while True:
+            try:
+                if await self._listen() and reconnected:
+                    # Пока соединения не было, изменения могли пройти мимо
+                    self._changed.set()
+                await self._changed.wait()
+                # Склеиваем серию изменений (импорт, правки в админке) в одну перезагрузку
+                while True:
+                    self._changed.clear()
+                    try:
+                        # asyncio.timeout: wait_for теряет отмену (stop()), если она совпала с NOTIFY
+                        async with asyncio.timeout(self.DEBOUNCE):
+                            await self._changed.wait()
+                    except TimeoutError:
+                        break
+                await self.reload()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Catalog listener error: {e}")
+                await self._close()
+                reconnected = True
+                await asyncio.sleep(self.RETRY_DELAY)
+
+# Общий экземпляр: запускается в on_startup бота
+catalog = CatalogService()
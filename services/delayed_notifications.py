@@ -1,119 +1,245 @@
 import asyncio
 import json
-from datetime import datetime
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from database.connection import get_db_connection
-from database.crud.settings import get_setting
+from datetime import datetime, timedelta
+from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError, TelegramBadRequest
+from database.connection import transaction
+from database.crud.settings import get_settings
+from database.async_connection import open_dedicated_async_connection
+from database.crud.silenced_notifications import (
+    NOTIFY_CHANNEL,
+    claim_due_notifications,
+    release_stale_claims,
+    complete_notifications,
+)
+from database.crud_async.silenced_notifications import seconds_until_next_notification
+from services.broadcast import TokenBucket
 from services.notifications import NotificationService
+from config import Config
 import logging
 
 logger = logging.getLogger(__name__)
 
 class DelayedNotificationProcessor:
-    """Processes delayed notifications and sends them at scheduled time."""
+    """
+    Processes delayed notifications and sends them at scheduled time.
+
+    Due rows are claimed in batches (FOR UPDATE SKIP LOCKED, committed right
+    away), sent concurrently through a shared rate limit and written back in
+    one bulk update. Transient errors are retried with exponential backoff.
+    Run by NotificationDispatcher; cleanup is scheduled by SchedulerManager.
+    """
     
-    def __init__(self, bot):
+    def __init__(self, bot, batch_size=None, concurrency=None, rate=None):
         self.bot = bot
         self.notification_service = NotificationService(bot)
-        self.scheduler = AsyncIOScheduler()
-        self.is_running = False
+        self.batch_size = batch_size or Config.DELAYED_BATCH_SIZE
+        self.concurrency = concurrency or Config.DELAYED_CONCURRENCY
+        self.bucket = TokenBucket(rate or Config.DELAYED_SEND_RATE)
+        self.retry_base = Config.DELAYED_RETRY_BASE
+        self.retry_max = Config.DELAYED_RETRY_MAX
     
     async def process_pending_notifications(self):
-        """Send all pending notifications whose time has come."""
-        logger.info("Processing delayed notifications...")
-        conn = get_db_connection()
-        cur = conn.cursor()
+        """Send all pending notifications whose time has come (batch after batch)."""
         try:
-            cur.execute("""
-                SELECT id, notification_type, user_id, appointment_id,
-                       message_text, notification_data, retry_count
-                FROM silenced_notifications
-                WHERE status = 'pending' AND scheduled_for <= NOW()
-                ORDER BY scheduled_for
-                LIMIT 100
-            """)
-            notifs = cur.fetchall()
-            if not notifs:
+            await asyncio.to_thread(release_stale_claims, Config.DELAYED_CLAIM_LEASE)
+            total = 0
+            while True:
+                batch = await asyncio.to_thread(claim_due_notifications, self.batch_size)
+                if not batch:
+                    break
+                await self._process_batch(batch)
+                total += len(batch)
+                if len(batch) < self.batch_size:
+                    break
+            if total:
+                logger.info(f"Processed {total} delayed notifications.")
+            else:
                 logger.debug("No pending notifications.")
-                return
-            
-            for notif in notifs:
-                await self._send_notification(cur, notif)
-            conn.commit()
         except Exception as e:
             logger.error(f"Error processing delayed notifications: {e}")
-            conn.rollback()
-        finally:
-            cur.close()
-            conn.close()
     
-    async def _send_notification(self, cur, notif):
-        """Send a single delayed notification."""
+    async def _process_batch(self, batch):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        max_retries = get_settings().get_int('max_notification_retries', 3)
+        results = await asyncio.gather(*(self._send_notification(semaphore, notif) for notif in batch))
+        sent_ids, failed_ids, retries = [], [], []
+        for notif, (outcome, retry_after) in zip(batch, results):
+            notif_id, retry = notif[0], notif[6]
+            if outcome == 'sent':
+                sent_ids.append(notif_id)
+            elif outcome == 'retry' and retry + 1 < max_retries:
+                retries.append((notif_id, self._retry_at(retry, retry_after)))
+            else:
+                failed_ids.append(notif_id)
+                logger.error(f"Notification {notif_id} failed after {retry + 1} attempts.")
+        await asyncio.to_thread(complete_notifications, sent_ids, failed_ids, retries)
+    
+    def _retry_at(self, retry, retry_after=0):
+        """
+        Exponential backoff (base * 2^retry, capped); never inside silent hours.
+        Returns an aware datetime: scheduled_for is TIMESTAMP and is compared
+        with NOW(), so a naive value would be read in the server's time zone.
+        """
+        from services.silent_hours import silent_hours_service
+        delay = max(min(self.retry_base * 2 ** retry, self.retry_max), retry_after)
+        at_local = datetime.now(silent_hours_service.rules.tz) + timedelta(seconds=delay)
+        if silent_hours_service.is_silent_hours_now(at_local):
+            return silent_hours_service.calculate_next_morning_time(at_local)
+        return at_local
+    
+    async def _send_notification(self, semaphore, notif):
+        """
+        Send a single delayed notification to its admins.
+        Returns (outcome, retry_after): 'sent' if any admin got it, 'retry' on
+        transient errors, 'failed' when it can never be delivered.
+        """
         notif_id, n_type, user_id, apt_id, msg_text, data_json, retry = notif
         try:
-            data = json.loads(data_json) if data_json else {}
-            admin_ids = data.get('admin_ids', [])
+            data = data_json if isinstance(data_json, dict) else json.loads(data_json) if data_json else {}
+            admin_ids = data.get('admin_ids') or []
             kwargs = data.get('kwargs', {})
             
             # Optionally prepend marker
-            if msg_text and not msg_text.startswith('(🔔 Отложенное)'):
+            if msg_text and not msg_text.startswith('(🔔 Отложенное'):
                 msg_text = f"(🔔 Отложенное с {datetime.now().strftime('%H:%M')})\n\n{msg_text}"
             
-            sent = 0
-            for admin_id in admin_ids:
-                try:
-                    await self.bot.send_message(admin_id, msg_text, **kwargs)
-                    sent += 1
-                except Exception as e:
-                    logger.error(f"Failed to send to admin {admin_id}: {e}")
-            
-            if sent > 0:
-                cur.execute("UPDATE silenced_notifications SET status = 'sent', last_attempt = NOW() WHERE id = %s", (notif_id,))
-                logger.info(f"Delayed notification {notif_id} sent to {sent} admins.")
-            else:
-                # Retry logic
-                max_retries = int(get_setting('max_notification_retries') or 3)
-                new_retry = retry + 1
-                if new_retry >= max_retries:
-                    cur.execute("UPDATE silenced_notifications SET status = 'failed', last_attempt = NOW() WHERE id = %s", (notif_id,))
-                    logger.error(f"Notification {notif_id} failed after {max_retries} attempts.")
-                else:
-                    from services.silent_hours import silent_hours_service
-                    new_schedule = silent_hours_service.calculate_next_morning_time()
-                    cur.execute("UPDATE silenced_notifications SET scheduled_for = %s, retry_count = %s, last_attempt = NOW() WHERE id = %s",
-                                (new_schedule, new_retry, notif_id))
-                    logger.info(f"Notification {notif_id} rescheduled to {new_schedule}")
+            sends = await asyncio.gather(*(
+                self._send_one(semaphore, admin_id, msg_text, kwargs) for admin_id in admin_ids
+            ))
         except Exception as e:
             logger.error(f"Critical error sending notification {notif_id}: {e}")
-            cur.execute("UPDATE silenced_notifications SET status = 'failed', last_attempt = NOW() WHERE id = %s", (notif_id,))
+            return 'failed', 0
+        
+        sent = sum(1 for outcome, _ in sends if outcome == 'sent')
+        if sent:
+            logger.info(f"Delayed notification {notif_id} sent to {sent} admins.")
+            return 'sent', 0
+        if any(outcome == 'retry' for outcome, _ in sends):
+            return 'retry', max(delay for _, delay in sends)
+        return 'failed', 0
+    
+    async def _send_one(self, semaphore, admin_id, text, kwargs):
+        async with semaphore:
+            await self.bucket.acquire()
+            try:
+                await self.bot.send_message(admin_id, text, **kwargs)
+                return 'sent', 0
+            except TelegramRetryAfter as e:
+                # Flood control касается всего бота: притормаживаем все отправки
+                self.bucket.pause(e.retry_after)
+                return 'retry', e.retry_after
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                logger.error(f"Failed to send to admin {admin_id}: {e}")
+                return 'failed', 0
+            except Exception as e:
+                # Сеть, 5xx Telegram и т.п. — временные ошибки
+                logger.warning(f"Failed to send to admin {admin_id}: {e}")
+                return 'retry', 0
     
     async def cleanup_old_notifications(self):
         """Remove old notifications from database."""
-        conn = get_db_connection()
-        cur = conn.cursor()
         try:
-            cur.execute("DELETE FROM silenced_notifications WHERE created_at < NOW() - INTERVAL '30 days' AND status IN ('sent','failed')")
-            deleted = cur.rowcount
-            conn.commit()
+            with transaction() as cur:
+                cur.execute("DELETE FROM silenced_notifications WHERE created_at < NOW() - INTERVAL '30 days' AND status IN ('sent','failed')")
+                deleted = cur.rowcount
             logger.info(f"Cleaned up {deleted} old notifications.")
         except Exception as e:
             logger.error(f"Cleanup error: {e}")
-            conn.rollback()
-        finally:
-            cur.close()
-            conn.close()
+            raise
+
+class NotificationDispatcher:
+    """
+    Event-driven loop around DelayedNotificationProcessor.
+
+    Sleeps until the earliest pending scheduled_for and wakes early on
+    NOTIFY from save_delayed_notification, so notifications go out within a
+    fraction of a second of their time while an idle node sends no queries.
+    A safety poll covers notifications lost while the LISTEN connection was
+    down. Works only while is_active() is true (the scheduler leader).
+    """
+    
+    INACTIVE_CHECK = 5      # секунд между проверками, не стали ли мы лидером
+    RETRY_DELAY = 5         # пауза после ошибки соединения
+    BUSY_DELAY = 1          # строки просрочены, но захвачены другим узлом
+    
+    def __init__(self, processor, is_active=lambda: True, safety_poll=None):
+        self.processor = processor
+        self.is_active = is_active
+        self.safety_poll = safety_poll or Config.DELAYED_SAFETY_POLL
+        self._wakeup = asyncio.Event()
+        self._due_at = None     # loop.time() ближайшего известного уведомления
+        self._conn = None
+        self._task = None
     
     def start(self):
-        if self.is_running:
-            return
-        self.scheduler.add_job(self.process_pending_notifications, 'interval', minutes=1, id='process_delayed')
-        self.scheduler.add_job(self.cleanup_old_notifications, 'cron', hour=3, minute=0, id='cleanup_notifications')
-        self.scheduler.start()
-        self.is_running = True
-        logger.info("Delayed notification processor started.")
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self._close()
     
-    def stop(self):
-        if self.is_running:
-            self.scheduler.shutdown()
-            self.is_running = False
-            logger.info("Delayed notification processor stopped.")
\ No newline at end of file
+    def _on_notify(self, conn, pid, channel, payload):
+        try:
+            delay = max(float(payload), 0.0)
+        except (TypeError, ValueError):
+            delay = 0.0
+        due_at = asyncio.get_running_loop().time() + delay
+        if self._due_at is None or due_at < self._due_at:
+            self._due_at = due_at
+            self._wakeup.set()
+    
+    async def _listen(self):
+        if self._conn is None or self._conn.is_closed():
+            self._conn = await open_dedicated_async_connection()
+            await self._conn.add_listener(NOTIFY_CHANNEL, self._on_notify)
+            self._due_at = None  # пока не слушали, могли пропустить уведомления
+    
+    async def _close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None and not conn.is_closed():
+            try:
+                await conn.close()
+            except Exception:
+                pass
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                if not self.is_active():
+                    await self._close()
+                    self._due_at = None
+                    await asyncio.sleep(self.INACTIVE_CHECK)
+                    continue
+                await self._listen()
+                
+                if self._due_at is None or self._due_at <= loop.time():
+                    await self.processor.process_pending_notifications()
+                    delay = await seconds_until_next_notification()
+                    if delay is None:
+                        self._due_at = None
+                    else:
+                        self._due_at = loop.time() + (delay if delay > 0 else self.BUSY_DELAY)
+                
+                timeout = self.safety_poll
+                if self._due_at is not None:
+                    timeout = min(max(self._due_at - loop.time(), 0.0), timeout)
+                self._wakeup.clear()
+                try:
+                    # asyncio.timeout, а не wait_for: wait_for теряет отмену (stop()),
+                    # если она совпала с NOTIFY
+                    async with asyncio.timeout(timeout):
+                        await self._wakeup.wait()
+                except TimeoutError:
+                    # Наступил срок или сработал страховочный опрос
+                    self._due_at = loop.time()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification dispatcher error: {e}")
+                await self._close()
+                await asyncio.sleep(self.RETRY_DELAY)
\ No newline at end of file
@@ -1,6 +1,6 @@
 import logging
 from services.silent_hours import silent_hours_service
-from database.crud.telegram_channels import get_admin_ids
+from database.crud_async.users import get_admin_ids
 
 logger = logging.getLogger(__name__)
 
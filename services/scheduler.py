@@ -1,60 +1,182 @@
+import asyncio
+import os
+import socket
+import time
 import logging
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from services.delayed_notifications import DelayedNotificationProcessor
-from services.silent_hours import silent_hours_service
-from utils.backup import BackupManager
-from config import Config
+from services.delayed_notifications import DelayedNotificationProcessor, NotificationDispatcher
+from utils.backup import BackupManager, BackupError
+from database.connection import open_dedicated_connection
+from database.crud.statistics import refresh_daily_stats
+from database.crud.job_runs import start_job_run, finish_job_run, cleanup_job_runs
 
 logger = logging.getLogger(__name__)
 
+# Ключ pg advisory lock, которым узлы выбирают лидера планировщика
+SCHEDULER_LOCK_KEY = 0x62_6F_74_33  # 'bot3'
+
+class LeaderElection:
+    """
+    Leader election over a session-level pg_try_advisory_lock.
+
+    The lock is held on a dedicated connection, so it is released by
+    PostgreSQL as soon as the leader process or its connection dies; another
+    node takes it on its next check.
+    """
+
+    def __init__(self, lock_key=SCHEDULER_LOCK_KEY):
+        self.lock_key = lock_key
+        self.node = f"{socket.gethostname()}:{os.getpid()}"
+        self.is_leader = False
+        self._conn = None
+
+    def check(self):
+        """Try to become leader, or confirm the lock is still held. Blocking; run in a thread."""
+        try:
+            if self._conn is None or self._conn.closed:
+                self.is_leader = False
+                self._conn = open_dedicated_connection()
+                self._conn.autocommit = True
+            with self._conn.cursor() as cur:
+                if self.is_leader:
+                    cur.execute("SELECT 1")  # блокировка живёт, пока живёт сессия
+                else:
+                    cur.execute("SELECT pg_try_advisory_lock(%s)", (self.lock_key,))
+                    if cur.fetchone()[0]:
+                        self.is_leader = True
+                        logger.info(f"Scheduler leader: {self.node}")
+        except Exception as e:
+            if self.is_leader:
+                logger.warning(f"Scheduler leadership lost: {e}")
+            else:
+                logger.warning(f"Leader election failed: {e}")
+            self.is_leader = False
+            self.release()
+        return self.is_leader
+
+    def release(self):
+        """Close the connection, which releases the lock."""
+        conn, self._conn = self._conn, None
+        self.is_leader = False
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
 class SchedulerManager:
-    """Manages all background tasks."""
+    """
+    Single registry of background jobs.
+
+    Every process runs the scheduler, but a job body runs only on the node
+    that holds the advisory lock, and each run is recorded in job_runs with
+    its duration and outcome. Jobs never overlap (max_instances=1), missed
+    runs are coalesced into one and dropped after their misfire grace time.
+    Delayed notifications are sent by NotificationDispatcher, not by a job.
+    """
+
+    ELECTION_INTERVAL = 15  # секунд между проверками лидерства
     
     def __init__(self, bot):
         self.bot = bot
-        self.scheduler = AsyncIOScheduler()
-        self.delayed_processor = DelayedNotificationProcessor(bot)
-        self.backup_manager = BackupManager({
-            'host': Config.DB_HOST,
-            'port': Config.DB_PORT,
-            'database': Config.DB_NAME,
-            'user': Config.DB_USER,
-            'password': Config.DB_PASSWORD
+        self.scheduler = AsyncIOScheduler(job_defaults={
+            'coalesce': True,
+            'max_instances': 1,
+            'misfire_grace_time': 60,
         })
+        self.leader = LeaderElection()
+        self.delayed_processor = DelayedNotificationProcessor(bot)
+        # Отложенные уведомления отправляются по событию, а не по расписанию — тоже только на лидере
+        self.dispatcher = NotificationDispatcher(self.delayed_processor, is_active=lambda: self.leader.is_leader)
+        self.backup_manager = BackupManager.from_config()
     
+    # ---------- Задачи ----------
     async def daily_backup(self):
         """Create automatic daily backup."""
         logger.info("Running daily backup...")
+        backup = await self.backup_manager.create_backup(
+            backup_type='automatic',
+            comment='Ежедневный автоматический бекап'
+        )
+        if backup is None:
+            raise BackupError("daily backup failed, see backups table")
+    
+    async def backup_retention(self):
+        """Remove backups outside the daily/weekly/monthly retention policy."""
+        await asyncio.to_thread(self.backup_manager.apply_retention)
+    
+    async def reconcile_daily_stats(self):
+        """Recompute recent days of daily_stats (e.g. after service price changes)."""
+        await asyncio.to_thread(refresh_daily_stats, 60)
+        logger.info("daily_stats reconciled.")
+    
+    async def cleanup_job_history(self):
+        deleted = await asyncio.to_thread(cleanup_job_runs, 30)
+        logger.info(f"Removed {deleted} old job runs.")
+    
+    # ---------- Реестр ----------
+    def register(self, job_id, func, trigger, misfire_grace_time=None, **trigger_args):
+        """Add a job that runs only on the leader and is recorded in job_runs."""
+        options = {} if misfire_grace_time is None else {'misfire_grace_time': misfire_grace_time}
+        self.scheduler.add_job(self._run_job, trigger, args=[job_id, func], id=job_id,
+                               replace_existing=True, **options, **trigger_args)
+    
+    async def _run_job(self, job_id, func):
+        if not self.leader.is_leader:
+            return
+        started = time.monotonic()
         try:
-            self.backup_manager.create_backup(
-                backup_type='automatic',
-                comment='Ежедневный автоматический бекап'
-            )
+            run_id = await asyncio.to_thread(start_job_run, job_id, self.leader.node)
         except Exception as e:
-            logger.exception(f"Daily backup failed: {e}")
-    
-    async def weekly_cleanup(self):
-        """Clean up old backups."""
-        logger.info("Cleaning old backups...")
+            logger.warning(f"Cannot record start of job {job_id}: {e}")
+            run_id = None
+        status, error = 'success', None
         try:
-            self.backup_manager.cleanup_old_backups(keep_days=30)
+            await func()
         except Exception as e:
-            logger.exception(f"Backup cleanup failed: {e}")
+            status, error = 'error', f"{e.__class__.__name__}: {e}"
+            logger.exception(f"Job {job_id} failed: {e}")
+        duration_ms = int((time.monotonic() - started) * 1000)
+        logger.info(f"Job {job_id}: {status} in {duration_ms} ms")
+        if run_id is not None:
+            try:
+                await asyncio.to_thread(finish_job_run, run_id, status, duration_ms, error)
+            except Exception as e:
+                logger.warning(f"Cannot record result of job {job_id}: {e}")
+    
+    async def _elect(self):
+        await asyncio.to_thread(self.leader.check)
     
-    def start(self):
-        """Start all scheduled jobs."""
-        # Delayed notifications processing (every minute)
-        self.scheduler.add_job(self.delayed_processor.process_pending_notifications, 'interval', minutes=1)
+    async def start(self):
+        """Register all jobs, run the first election and start the scheduler."""
+        self.register('cleanup_notifications', self.delayed_processor.cleanup_old_notifications,
+                      'cron', hour=3, minute=0, misfire_grace_time=3600)
+        
+        # Daily backup at 3:00 AM (если узел был недоступен, делаем в течение часа)
+        self.register('daily_backup', self.daily_backup, 'cron', hour=3, minute=0, misfire_grace_time=3600)
+        
+        # Nightly daily_stats reconciliation at 2:30 AM
+        self.register('reconcile_daily_stats', self.reconcile_daily_stats, 'cron', hour=2, minute=30,
+                      misfire_grace_time=3600)
+        
+        # Backup retention after the nightly backup (4:00 AM)
+        self.register('backup_retention', self.backup_retention, 'cron', hour=4, minute=0,
+                      misfire_grace_time=6 * 3600)
         
-        # Daily backup at 3:00 AM
-        self.scheduler.add_job(self.daily_backup, 'cron', hour=3, minute=0)
+        self.register('cleanup_job_runs', self.cleanup_job_history, 'cron', hour=4, minute=30,
+                      misfire_grace_time=6 * 3600)
         
-        # Weekly backup cleanup (Sunday at 4:00 AM)
-        self.scheduler.add_job(self.weekly_cleanup, 'cron', day_of_week='sun', hour=4, minute=0)
+        # Выборы лидера идут на каждом узле и не пишутся в историю
+        self.scheduler.add_job(self._elect, 'interval', seconds=self.ELECTION_INTERVAL, id='leader_election',
+                               replace_existing=True)
+        await self._elect()
         
         self.scheduler.start()
-        logger.info("Scheduler started.")
+        self.dispatcher.start()
+        logger.info(f"Scheduler started on {self.leader.node} (leader: {self.leader.is_leader}).")
     
-    def stop(self):
-        self.scheduler.shutdown()
-        logger.info("Scheduler stopped.")
\ No newline at end of file
+    async def stop(self):
+        await self.dispatcher.stop()
+        self.scheduler.shutdown(wait=False)
+        await asyncio.to_thread(self.leader.release)
+        logger.info("Scheduler stopped.")
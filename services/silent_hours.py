@@ -1,84 +1,120 @@
-from datetime import datetime, time
+import re
+from datetime import datetime, time, timedelta
+from typing import FrozenSet, NamedTuple, Optional, Pattern
 import pytz
 import json
-from database.crud.settings import get_silent_hours_settings, get_setting
-from database.connection import get_db_connection
+from database.crud.settings import get_settings, subscribe
+from database.connection import transaction
+from database.crud.silenced_notifications import NOTIFY_CHANNEL
 import logging
 
 logger = logging.getLogger(__name__)
 
+class SilentHoursRules(NamedTuple):
+    """Silent hours settings parsed once: everything a notification decision needs."""
+    enabled: bool
+    tz: object
+    start: time
+    end: time
+    morning: time
+    allow_emergency: bool
+    keyword_re: Optional[Pattern]     # все ключевые слова одним регулярным выражением
+    emergency_user_ids: FrozenSet[int]
+
+    def is_silent(self, current: time) -> bool:
+        if self.start <= self.end:
+            return self.start <= current <= self.end
+        # overnight interval (e.g., 22:00-07:00)
+        return current >= self.start or current <= self.end
+
+def _build_rules(settings) -> SilentHoursRules:
+    tz_name = settings.get('silent_hours_timezone') or 'Europe/Moscow'
+    try:
+        tz = pytz.timezone(tz_name)
+    except Exception as e:
+        logger.error(f"Timezone error: {e}, using UTC")
+        tz = pytz.UTC
+    keywords = {k.lower() for k in settings.get_list('emergency_keywords', ['срочно', 'важно', 'критично'])}
+    # Длинные слова первыми, чтобы в лог попадало самое полное совпадение
+    keyword_re = re.compile(
+        '|'.join(re.escape(k) for k in sorted(keywords, key=len, reverse=True)), re.IGNORECASE
+    ) if keywords else None
+    user_ids = frozenset(int(uid) for uid in settings.get_list('emergency_user_ids') if uid.lstrip('-').isdigit())
+    return SilentHoursRules(
+        enabled=settings.get_bool('silent_hours_enabled'),
+        tz=tz,
+        start=settings.get_time('silent_hours_start', time(22, 0)),
+        end=settings.get_time('silent_hours_end', time(7, 0)),
+        morning=settings.get_time('morning_notification_time', time(9, 0)),
+        allow_emergency=settings.get_bool('silent_hours_allow_emergency'),
+        keyword_re=keyword_re,
+        emergency_user_ids=user_ids,
+    )
+
+# Настройки, от которых зависят правила тихих часов
+_RULE_KEYS = ('silent_hours_', 'emergency_', 'morning_notification_time')
+
 class SilentHoursService:
-    """Handles silent hours logic: check if now is silent and delay notifications."""
+    """
+    Handles silent hours logic: check if now is silent and delay notifications.
+
+    Settings are parsed into SilentHoursRules on first use and rebuilt when
+    the settings snapshot reports a change, so decisions are in-memory and
+    admin edits apply without a restart.
+    """
     
     def __init__(self):
-        self.settings = None
-        self.tz = None
-        self._load_settings()
+        self._rules = None
+        subscribe(self._on_settings_changed)
     
-    def _load_settings(self):
-        self.settings = get_silent_hours_settings()
-        try:
-            self.tz = pytz.timezone(self.settings['timezone'])
-        except Exception as e:
-            logger.error(f"Timezone error: {e}, using UTC")
-            self.tz = pytz.UTC
+    def _on_settings_changed(self, keys):
+        if any(key.startswith(_RULE_KEYS) for key in keys):
+            self._rules = None  # пересоберём при следующем обращении
     
-    def _parse_time(self, time_str):
-        try:
-            if isinstance(time_str, str):
-                return datetime.strptime(time_str, '%H:%M').time()
-            return time_str
-        except:
-            return time(22, 0)
+    @property
+    def rules(self) -> SilentHoursRules:
+        rules = self._rules
+        if rules is None:
+            rules = self._rules = _build_rules(get_settings())
+        return rules
     
-    def is_silent_hours_now(self):
+    def is_silent_hours_now(self, now=None):
         """Return True if current time is within silent hours."""
-        if not self.settings['enabled']:
+        rules = self.rules
+        if not rules.enabled:
             return False
-        
-        now = datetime.now(self.tz)
-        current_time = now.time()
-        start = self._parse_time(self.settings['start'])
-        end = self._parse_time(self.settings['end'])
-        
-        if start <= end:
-            is_silent = start <= current_time <= end
-        else:
-            # overnight interval (e.g., 22:00-07:00)
-            is_silent = current_time >= start or current_time <= end
-        
-        return is_silent
+        now = now or datetime.now(rules.tz)
+        return rules.is_silent(now.time())
     
-    def calculate_next_morning_time(self):
-        """Return datetime (UTC) when to send delayed notifications."""
-        now = datetime.now(self.tz)
-        morning_time_str = get_setting('morning_notification_time') or '09:00'
-        morning_time = self._parse_time(morning_time_str)
-        
+    def calculate_next_morning_time(self, now=None):
+        """Return aware datetime (UTC) when to send delayed notifications."""
+        rules = self.rules
+        now = now or datetime.now(rules.tz)
         scheduled = now.replace(
-            hour=morning_time.hour,
-            minute=morning_time.minute,
+            hour=rules.morning.hour,
+            minute=rules.morning.minute,
             second=0,
             microsecond=0
         )
         if now > scheduled:
             scheduled += timedelta(days=1)
         
-        scheduled_utc = scheduled.astimezone(pytz.UTC)
-        return scheduled_utc.replace(tzinfo=None)
+        # С часовым поясом: PostgreSQL сам приведёт его к времени сессии
+        return scheduled.astimezone(pytz.UTC)
     
     def is_emergency_message(self, message_text, user_id):
         """Check if message is marked as emergency."""
-        if not self.settings['allow_emergency']:
+        rules = self.rules
+        if not rules.allow_emergency:
             return False
         
-        text_lower = message_text.lower()
-        for keyword in self.settings['emergency_keywords']:
-            if keyword.strip().lower() in text_lower:
-                logger.info(f"Emergency keyword triggered: {keyword}")
+        if message_text and rules.keyword_re is not None:
+            match = rules.keyword_re.search(message_text)
+            if match:
+                logger.info(f"Emergency keyword triggered: {match.group(0)}")
                 return True
         
-        if str(user_id) in self.settings['emergency_user_ids']:
+        if user_id is not None and int(user_id) in rules.emergency_user_ids:
             logger.info(f"Emergency user ID: {user_id}")
             return True
         
@@ -90,35 +126,32 @@ class SilentHoursService:
         """Store notification for later delivery."""
         scheduled_for = self.calculate_next_morning_time()
         
-        conn = get_db_connection()
-        cur = conn.cursor()
         try:
-            cur.execute("""
-                INSERT INTO silenced_notifications
-                (notification_type, user_id, appointment_id, message_text,
-                 scheduled_for, status, notification_data)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                RETURNING id
-            """, (
-                notification_type,
-                user_id,
-                appointment_id,
-                message_text[:500] if message_text else None,
-                scheduled_for,
-                'pending',
-                json.dumps({'admin_ids': admin_ids, 'kwargs': kwargs})
-            ))
-            notif_id = cur.fetchone()[0]
-            conn.commit()
+            with transaction() as cur:
+                cur.execute("""
+                    INSERT INTO silenced_notifications
+                    (notification_type, user_id, appointment_id, message_text,
+                     scheduled_for, status, notification_data)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    RETURNING id
+                """, (
+                    notification_type,
+                    user_id,
+                    appointment_id,
+                    message_text[:500] if message_text else None,
+                    scheduled_for,
+                    'pending',
+                    json.dumps({'admin_ids': admin_ids, 'kwargs': kwargs})
+                ))
+                notif_id = cur.fetchone()[0]
+                # Будим диспетчер: он спит до ближайшего scheduled_for
+                cur.execute("SELECT pg_notify(%s, EXTRACT(EPOCH FROM (%s - NOW()))::text)",
+                            (NOTIFY_CHANNEL, scheduled_for))
             logger.info(f"Saved delayed notification {notif_id} for {scheduled_for}")
             return notif_id
         except Exception as e:
             logger.error(f"Error saving delayed notification: {e}")
-            conn.rollback()
             return None
-        finally:
-            cur.close()
-            conn.close()
     
     def should_notify_now(self, notification_type, user_id, message_text="",
                           appointment_id=None, admin_ids=None, **kwargs):
@@ -126,7 +159,7 @@ class SilentHoursService:
         Determine if notification should be sent now or delayed.
         Returns (should_send_now, delay_info).
         """
-        if not self.settings['enabled']:
+        if not self.rules.enabled:
             return True, None
         
         if self.is_emergency_message(message_text, user_id):
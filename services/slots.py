@@ -0,0 +1,236 @@
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, NamedTuple, Tuple
+import logging
+from database.crud.settings import get_settings, subscribe
+from database.crud.appointments import (
+    get_occupancy as fetch_occupancy_sync, update_appointment_status as update_status_sync
+)
+from database.crud_async.appointments import (
+    create_appointment, get_occupancy as fetch_occupancy, update_appointment_status as update_status
+)
+from utils.cache import get_occupancy, set_occupancy, get_calendar, set_calendar
+
+logger = logging.getLogger(__name__)
+
+class SlotUnavailableError(Exception):
+    """All bays are taken for the requested time (someone booked it first)."""
+
+class BookingGrid(NamedTuple):
+    """Booking time grid parsed from settings: minutes of the day and the number of bays."""
+    start: int      # первый слот, минут от полуночи
+    end: int        # к этому времени услуга должна завершиться
+    step: int       # шаг сетки, минут
+    bays: int
+
+    @property
+    def size(self) -> int:
+        return max((self.end - self.start) // self.step, 0)
+
+    def slot_time(self, index: int) -> time:
+        minute = self.start + index * self.step
+        return time(minute // 60, minute % 60)
+
+    def slots_needed(self, duration: int) -> int:
+        return max(-(-duration // self.step), 1)
+
+    def load(self, busy: List[Tuple[int, int]]) -> List[int]:
+        """
+        Occupied bays per slot: difference array over the appointments of a day,
+        O(appointments + slots) regardless of how many bookings share a slot.
+        """
+        diff = [0] * (self.size + 1)
+        for start, duration in busy:
+            first = max((start - self.start) // self.step, 0)
+            last = min(-(-(start + duration - self.start) // self.step), self.size)
+            if first < last:
+                diff[first] += 1
+                diff[last] -= 1
+        load, current = [], 0
+        for delta in diff[:-1]:
+            current += delta
+            load.append(current)
+        return load
+
+class DayLoad(NamedTuple):
+    """Calendar cell: active appointments and slots that still have a free bay."""
+    date: date
+    appointments: int
+    free_slots: int     # слоты со свободным постом, которые ещё можно забронировать (без прошедших)
+    open_slots: int     # слоты дня со свободным постом, без учёта текущего времени
+    slots: int          # всего слотов в дне
+
+    @property
+    def full(self) -> bool:
+        """Every slot of the day has all bays booked; a past day is not full just because it is over."""
+        return self.open_slots == 0 and self.slots > 0
+
+    def as_dict(self) -> dict:
+        return {
+            'date': self.date.isoformat(),
+            'appointments': self.appointments,
+            'free_slots': self.free_slots,
+            'open_slots': self.open_slots,
+            'slots': self.slots,
+            'full': self.full,
+        }
+
+def _build_grid(settings) -> BookingGrid:
+    start = settings.get_time('booking_day_start', time(9, 0))
+    end = settings.get_time('booking_day_end', time(20, 0))
+    return BookingGrid(
+        start=start.hour * 60 + start.minute,
+        end=end.hour * 60 + end.minute,
+        step=max(settings.get_int('booking_slot_minutes', 30), 5),
+        bays=max(settings.get_int('booking_bays', 1), 1),
+    )
+
+def _to_date(value) -> date:
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+class SlotEngine:
+    """
+    Free booking capacity per date and time slot.
+
+    Occupancy of a day (start and duration of active appointments) is read
+    with one range query per date window and kept in utils.cache; CRUD
+    updates it on create and drops it on status change or delete. The cache
+    only decides what to show: capacity is enforced by create_appointment
+    and update_appointment_status under a per-date advisory lock, and a
+    lost race surfaces as SlotUnavailableError.
+    """
+
+    def __init__(self):
+        self._grid = None
+        subscribe(self._on_settings_changed)
+
+    def _on_settings_changed(self, keys):
+        if any(key.startswith('booking_') for key in keys):
+            self._grid = None
+
+    @property
+    def grid(self) -> BookingGrid:
+        grid = self._grid
+        if grid is None:
+            grid = self._grid = _build_grid(get_settings())
+        return grid
+
+    async def occupancy(self, date_from, date_to=None) -> Dict[date, List[Tuple[int, int]]]:
+        """Busy intervals for every day of the window; uncached days are read in one grouped query."""
+        result, missing = _cached_occupancy(date_from, date_to)
+        if missing:
+            _store_occupancy(result, missing, await fetch_occupancy(missing[0], missing[-1]))
+        return result
+
+    def occupancy_sync(self, date_from, date_to=None) -> Dict[date, List[Tuple[int, int]]]:
+        """occupancy() for the web panel (Flask, psycopg2)."""
+        result, missing = _cached_occupancy(date_from, date_to)
+        if missing:
+            _store_occupancy(result, missing, fetch_occupancy_sync(missing[0], missing[-1]))
+        return result
+
+    def _first_open_slot(self, day: date, now: datetime) -> int:
+        """Index of the first slot that has not started yet (slot count for past days)."""
+        grid = self.grid
+        if day < now.date():
+            return grid.size
+        if day > now.date():
+            return 0
+        return min(max(-(-(now.hour * 60 + now.minute - grid.start) // grid.step), 0), grid.size)
+
+    def _day_load(self, day: date, busy, now: datetime) -> DayLoad:
+        grid = self.grid
+        load = grid.load(busy)
+        first = self._first_open_slot(day, now)
+        open_slots = [index for index in range(grid.size) if load[index] < grid.bays]
+        free = sum(1 for index in open_slots if index >= first)
+        return DayLoad(day, len(busy), free, len(open_slots), grid.size)
+
+    async def calendar(self, date_from, date_to, now: datetime = None) -> List[DayLoad]:
+        """
+        Per-day load for a date range: one query for the uncached days, cached per range.
+
+        The cached days keep free_slots computed at the time they were built,
+        so for today it can lag by up to the cache TTL (a minute); `full`
+        does not depend on the time. An explicit `now` bypasses the cache.
+        """
+        date_from, date_to = _to_date(date_from), _to_date(date_to)
+        days = get_calendar(date_from, date_to) if now is None else None
+        if days is None:
+            current = now or datetime.now()
+            occupancy = await self.occupancy(date_from, date_to)
+            days = [self._day_load(day, busy, current) for day, busy in occupancy.items()]
+            if now is None:
+                set_calendar(date_from, date_to, days)
+        return days
+
+    def calendar_sync(self, date_from, date_to, now: datetime = None) -> List[DayLoad]:
+        """calendar() for the web panel."""
+        date_from, date_to = _to_date(date_from), _to_date(date_to)
+        days = get_calendar(date_from, date_to) if now is None else None
+        if days is None:
+            current = now or datetime.now()
+            occupancy = self.occupancy_sync(date_from, date_to)
+            days = [self._day_load(day, busy, current) for day, busy in occupancy.items()]
+            if now is None:
+                set_calendar(date_from, date_to, days)
+        return days
+
+    async def full_days(self, date_from, date_to) -> frozenset:
+        """Days of the range without a single free slot (for the bot's date keyboard)."""
+        return frozenset(d.date for d in await self.calendar(date_from, date_to) if d.full)
+
+    async def free_slots(self, day, duration: int = 30, now: datetime = None) -> List[Tuple[time, int]]:
+        """
+        Start times at which a service of `duration` minutes fits into the day,
+        with the number of free bays for each; past times of today are skipped.
+        """
+        day = _to_date(day)
+        grid = self.grid
+        load = grid.load((await self.occupancy(day))[day])
+        needed = grid.slots_needed(duration)
+        first = self._first_open_slot(day, now or datetime.now())
+        result = []
+        for index in range(first, grid.size - needed + 1):
+            free = grid.bays - max(load[index:index + needed])
+            if free > 0:
+                result.append((grid.slot_time(index), free))
+        return result
+
+    async def book(self, data, duration: int = 30):
+        """Create an appointment if the slot still has a free bay; raises SlotUnavailableError otherwise."""
+        apt_id = await create_appointment(dict(data, duration_minutes=duration), capacity=self.grid.bays)
+        if apt_id is None:
+            raise SlotUnavailableError(f"{data['date']} {data['time']}")
+        return apt_id
+
+    async def set_status(self, appointment_id, status, admin_comment=None) -> bool:
+        """
+        Change an appointment's status; False if there is no such appointment.
+        Restoring a cancelled one raises SlotUnavailableError if its slot has filled up.
+        """
+        updated = await update_status(appointment_id, status, capacity=self.grid.bays, admin_comment=admin_comment)
+        if updated is False:
+            raise SlotUnavailableError(f"appointment {appointment_id}")
+        return bool(updated)
+
+    def set_status_sync(self, appointment_id, status, admin_comment=None) -> bool:
+        """set_status() for the web panel."""
+        updated = update_status_sync(appointment_id, status, capacity=self.grid.bays, admin_comment=admin_comment)
+        if updated is False:
+            raise SlotUnavailableError(f"appointment {appointment_id}")
+        return bool(updated)
+
+def _cached_occupancy(date_from, date_to):
+    date_from = _to_date(date_from)
+    date_to = _to_date(date_to) if date_to else date_from
+    days = [date_from + timedelta(days=i) for i in range((date_to - date_from).days + 1)]
+    result = {day: get_occupancy(day) for day in days}
+    return result, [day for day, busy in result.items() if busy is None]
+
+def _store_occupancy(result, missing, loaded):
+    for day in missing:
+        result[day] = loaded.get(day, [])
+        set_occupancy(day, result[day])
+
+# Общий экземпляр для хендлеров записи и календаря админки
+slots = SlotEngine()
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+from database.async_connection import open_dedicated_async_connection
+from utils.cache import invalidate_user_context, clear_user_contexts
+
+logger = logging.getLogger(__name__)
+
+USER_CHANNEL = 'user_changed'
+
+class UserContextListener:
+    """
+    Drops cached user contexts changed by other processes.
+
+    A trigger on users (migrations/v25_user_context_notify.sql) sends
+    NOTIFY user_changed with the user id on registration, admin status or
+    phone change and deletion. While the connection is down notifications
+    are lost, so after a reconnect the whole context cache is cleared.
+    """
+
+    RETRY_DELAY = 5     # пауза после ошибки соединения
+
+    def __init__(self):
+        self._conn = None
+        self._task = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self._close()
+
+    def _on_notify(self, conn, pid, channel, payload):
+        try:
+            invalidate_user_context(int(payload))
+        except ValueError:
+            clear_user_contexts()
+
+    async def _close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None and not conn.is_closed():
+            try:
+                await conn.close()
+            except Exception:
+                pass
+
+    async def _run(self):
+        reconnected = False
+        while True:
+            try:
+                if self._conn is None or self._conn.is_closed():
+                    self._conn = await open_dedicated_async_connection()
+                    await self._conn.add_listener(USER_CHANNEL, self._on_notify)
+                    if reconnected:
+                        clear_user_contexts()
+                # Уведомления приходят в _on_notify; здесь только следим за соединением
+                await asyncio.sleep(self.RETRY_DELAY)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"User context listener error: {e}")
+                await self._close()
+                reconnected = True
+                await asyncio.sleep(self.RETRY_DELAY)
+
+# Общий экземпляр: запускается в on_startup бота
+user_contexts = UserContextListener()
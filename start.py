@@ -1,11 +1,61 @@
 import asyncio
+import sys
 import logging
 from bot.bot import bot, dp
+from config import Config
 
 logging.basicConfig(level=logging.INFO)
 
-async def main():
+async def run_polling():
+    # Если раньше был установлен вебхук, getUpdates с ним не работает
+    await bot.delete_webhook()
     await dp.start_polling(bot)
 
+async def run_webhook():
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config as HypercornConfig
+    from hypercorn.middleware import AsyncioWSGIMiddleware
+    from bot.webhook import WebhookApp
+    from web.app import app as flask_app
+
+    asgi_app = WebhookApp(
+        dp, bot,
+        path=Config.WEBHOOK_PATH,
+        secret_token=Config.WEBHOOK_SECRET or None,
+        url=Config.WEBHOOK_URL or None,
+        fallback=AsyncioWSGIMiddleware(flask_app),
+        workers=Config.WEBHOOK_WORKERS,
+        queue_size=Config.WEBHOOK_QUEUE_SIZE,
+    )
+    hypercorn_config = HypercornConfig()
+    hypercorn_config.bind = [f"{Config.WEBHOOK_HOST}:{Config.WEBHOOK_PORT}"]
+    await serve(asgi_app, hypercorn_config)
+
+async def run_web():
+    """Только веб-панель, отдельным процессом (бот при этом работает в режиме polling)."""
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config as HypercornConfig
+    from hypercorn.middleware import AsyncioWSGIMiddleware
+    from web.app import app as flask_app
+    from database.crud.settings import start_settings_listener, stop_settings_listener
+
+    # Снимок настроек обновляется по NOTIFY, когда их меняет бот или другой воркер.
+    # В режиме webhook панель живёт в процессе бота, и слушатель запускает on_startup.
+    start_settings_listener()
+    hypercorn_config = HypercornConfig()
+    hypercorn_config.bind = [f"{Config.WEB_HOST}:{Config.WEB_PORT}"]
+    try:
+        await serve(AsyncioWSGIMiddleware(flask_app), hypercorn_config)
+    finally:
+        stop_settings_listener()
+
+async def main():
+    if sys.argv[1:] == ['web']:
+        await run_web()
+    elif Config.BOT_MODE == 'webhook':
+        await run_webhook()
+    else:
+        await run_polling()
+
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
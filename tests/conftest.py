@@ -1,7 +1,12 @@
+import os
 import pytest
 import asyncio
 from flask import Flask
-from database.connection import get_db_connection, init_db
+
+# Config требует BOT_TOKEN при импорте; модульным тестам настоящий токен не нужен
+os.environ.setdefault('BOT_TOKEN', '123456:TEST')
+
+from database.connection import get_db_connection
 from config import Config
 
 # Fixture for Flask test client
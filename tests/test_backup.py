@@ -0,0 +1,265 @@
+import asyncio
+import contextlib
+import datetime
+import gzip
+import sys
+import pytest
+from utils import backup
+from utils.backup import BackupManager, BackupError, file_checksum
+
+DB = {'host': 'localhost', 'port': 5432, 'user': 'bot', 'password': 'secret', 'database': 'bot'}
+
+def run(coro):
+    return asyncio.run(coro)
+
+@pytest.fixture
+def fake_exec(monkeypatch):
+    """Runs a python script instead of pg_dump/psql/pg_restore; returns the commands that were asked for."""
+    real_exec = asyncio.create_subprocess_exec
+    calls = []
+
+    def install(script):
+        async def create_subprocess_exec(*cmd, **kwargs):
+            calls.append(cmd)
+            return await real_exec(sys.executable, '-c', script, **kwargs)
+        monkeypatch.setattr(backup.asyncio, 'create_subprocess_exec', create_subprocess_exec)
+        return calls
+    return install
+
+@pytest.fixture
+def records(monkeypatch):
+    """backups table rows written by the manager, keyed by id."""
+    rows = {}
+
+    def save(self, filename, filepath, **kwargs):
+        rows[len(rows) + 1] = dict(kwargs, filename=filename, filepath=filepath)
+        return len(rows)
+
+    def finish(self, backup_id, status, filesize=None, checksum=None, comment=None):
+        rows[backup_id].update(status=status, filesize=filesize, checksum=checksum)
+        if comment is not None:
+            rows[backup_id]['comment'] = comment
+
+    monkeypatch.setattr(BackupManager, '_save_backup_record', save)
+    monkeypatch.setattr(BackupManager, '_finish_backup_record', finish)
+    return rows
+
+@pytest.fixture
+def manager(tmp_path):
+    return BackupManager(DB, backup_dir=tmp_path / 'backups', fmt='gzip', level=6, jobs=2, timeout=30)
+
+# ~3 МБ: несколько чанков по CHUNK_SIZE
+DUMP_SCRIPT = (
+    "import sys\n"
+    "for i in range(30000):\n"
+    "    sys.stdout.write('INSERT INTO t VALUES (%d, \\'%s\\');\\n' % (i, 'x' * 80))\n"
+)
+
+def expected_dump():
+    return b''.join(b"INSERT INTO t VALUES (%d, '%s');\n" % (i, b'x' * 80) for i in range(30000))
+
+def test_dump_stream_compresses_and_hashes(manager, fake_exec, tmp_path):
+    calls = fake_exec(DUMP_SCRIPT)
+    reported = []
+    part = tmp_path / 'dump.sql.gz.part'
+    checksum, size = run(manager._dump_stream(part, progress=reported.append))
+    assert calls[0][0] == 'pg_dump'
+    assert gzip.decompress(part.read_bytes()) == expected_dump()
+    assert size == part.stat().st_size
+    assert checksum == file_checksum(part)
+    assert reported == sorted(reported) and reported[-1] == len(expected_dump())
+
+def test_dump_stream_error_carries_stderr(manager, fake_exec, tmp_path):
+    fake_exec("import sys; sys.stderr.write('FATAL: role does not exist'); sys.exit(1)")
+    with pytest.raises(BackupError, match='role does not exist'):
+        run(manager._dump_stream(tmp_path / 'dump.part'))
+
+def test_create_backup_renames_part_when_done(manager, fake_exec, records):
+    fake_exec(DUMP_SCRIPT)
+    info = run(manager.create_backup(comment='nightly'))
+    files = [p for p in manager.backup_dir.rglob('*') if p.is_file()]
+    assert [p.name for p in files] == [info['filename']]
+    assert info['filename'].endswith('.sql.gz')
+    row = records[info['id']]
+    assert row['status'] == 'completed' and row['backup_format'] == 'gzip'
+    assert row['checksum'] == file_checksum(files[0]) == info['checksum']
+    assert row['filesize'] == files[0].stat().st_size
+
+def test_create_backup_failure_leaves_no_file(manager, fake_exec, records):
+    fake_exec("import sys; sys.stdout.write('partial'); sys.stderr.write('disk full'); sys.exit(1)")
+    assert run(manager.create_backup()) is None
+    assert not [p for p in manager.backup_dir.rglob('*') if p.is_file()]
+    row = records[1]
+    assert row['status'] == 'failed' and 'disk full' in row['comment']
+
+def test_create_backup_timeout(manager, fake_exec, records):
+    manager.timeout = 0.5
+    fake_exec("import time; time.sleep(30)")
+    assert run(manager.create_backup()) is None
+    assert records[1]['status'] == 'failed' and records[1]['comment'] == 'timeout'
+
+def test_directory_checksum_covers_names_and_contents(tmp_path):
+    dump = tmp_path / 'backup.dump'
+    dump.mkdir()
+    (dump / 'toc.dat').write_bytes(b'toc')
+    (dump / '3001.dat.gz').write_bytes(b'data')
+    checksum = file_checksum(dump)
+    assert checksum == file_checksum(dump)
+    (dump / '3001.dat.gz').write_bytes(b'DATA')
+    assert file_checksum(dump) != checksum
+    (dump / '3001.dat.gz').write_bytes(b'data')
+    (dump / '3001.dat.gz').rename(dump / '3002.dat.gz')
+    assert file_checksum(dump) != checksum
+
+def test_read_limited_drains_but_keeps_prefix():
+    async def scenario():
+        stream = asyncio.StreamReader()
+        stream.feed_data(b'a' * 100 + b'b' * 100)
+        stream.feed_eof()
+        return await backup._read_limited(stream, limit=150), stream.at_eof()
+    text, drained = run(scenario())
+    assert text == 'a' * 100 + 'b' * 50 and drained
+
+
+@pytest.fixture
+def stored(monkeypatch, manager, tmp_path):
+    """Registers a backup file as backups.id = 1; returns a setter and the restore log."""
+    restored = []
+
+    def register(path, checksum='auto'):
+        if checksum == 'auto':
+            checksum = file_checksum(path)
+        monkeypatch.setattr(manager, '_get_backup_file', lambda backup_id: (path, checksum))
+    monkeypatch.setattr(manager, '_mark_restored', lambda backup_id, user_id: restored.append((backup_id, user_id)))
+    register.restored = restored
+    return register
+
+def test_decompressed_source_streams_gzip(tmp_path):
+    path = tmp_path / 'backup.sql.gz'
+    path.write_bytes(gzip.compress(expected_dump()))
+    source = backup._DecompressedSource(path)
+    chunks = list(iter(source.read, b''))
+    source.close()
+    assert b''.join(chunks) == expected_dump()
+
+def test_decompressed_source_plain_sql(tmp_path):
+    path = tmp_path / 'backup.sql'
+    path.write_bytes(b'SELECT 1;\n')
+    source = backup._DecompressedSource(path)
+    assert source.read() == b'SELECT 1;\n' and source.read() == b''
+    source.close()
+
+def test_restore_sql_pipes_decompressed_dump_into_psql(manager, fake_exec, stored, tmp_path):
+    path = tmp_path / 'backup.sql.gz'
+    path.write_bytes(gzip.compress(expected_dump()))
+    out = tmp_path / 'psql_stdin'
+    calls = fake_exec(f"import sys; open({str(out)!r}, 'wb').write(sys.stdin.buffer.read())")
+    stored(path)
+    assert run(manager.restore_backup(1, user_id=7)) is True
+    assert calls[0][0] == 'psql' and '--single-transaction' in calls[0]
+    assert out.read_bytes() == expected_dump()
+    assert stored.restored == [(1, 7)]
+
+def test_restore_sql_reports_psql_error(manager, fake_exec, stored, tmp_path):
+    # psql падает на первой же ошибке (ON_ERROR_STOP), не дочитав stdin
+    path = tmp_path / 'backup.sql.gz'
+    path.write_bytes(gzip.compress(expected_dump() * 4))
+    fake_exec("import sys; sys.stderr.write('ERROR: syntax error at line 1'); sys.exit(3)")
+    stored(path)
+    with pytest.raises(BackupError, match='syntax error'):
+        run(manager.restore_backup(1))
+    assert stored.restored == []
+
+def test_restore_refuses_damaged_file(manager, fake_exec, stored, tmp_path):
+    path = tmp_path / 'backup.sql.gz'
+    path.write_bytes(gzip.compress(b'SELECT 1;'))
+    calls = fake_exec("pass")
+    stored(path, checksum='0' * 64)
+    with pytest.raises(BackupError, match='checksum mismatch'):
+        run(manager.restore_backup(1))
+    assert calls == [] and stored.restored == []
+
+def test_restore_directory_uses_parallel_pg_restore(manager, fake_exec, stored, tmp_path):
+    path = tmp_path / 'backup.dump'
+    path.mkdir()
+    (path / 'toc.dat').write_bytes(b'toc')
+    calls = fake_exec("pass")
+    stored(path)
+    assert run(manager.restore_backup(1)) is True
+    cmd = calls[0]
+    assert cmd[0] == 'pg_restore' and cmd[cmd.index('-j') + 1] == '2'
+    assert cmd[-1] == str(path)
+
+
+def make_backup(backup_id, created_at, status='completed', restored_at=None, filepath=None, filesize=None):
+    return {'id': backup_id, 'status': status, 'created_at': created_at, 'restored_at': restored_at,
+            'filepath': filepath or f'backups/{backup_id}.sql.gz', 'filesize': filesize}
+
+NOW = datetime.datetime(2026, 6, 30, 12, 0)
+
+def test_gfs_keeps_newest_per_day_week_and_month():
+    # Ежедневный бэкап в 03:00 за полгода
+    backups = [make_backup(i, datetime.datetime(2026, 1, 1, 3) + datetime.timedelta(days=i)) for i in range(181)]
+    expired = backup.select_expired_backups(backups, daily=7, weekly=4, monthly=6, now=NOW)
+    kept = sorted(b['created_at'].date().isoformat() for b in backups if b not in expired)
+    assert kept == [
+        '2026-01-31', '2026-02-28', '2026-03-31', '2026-04-30', '2026-05-31',   # последний в месяце
+        '2026-06-14', '2026-06-21',                                             # последний в ISO-неделе
+        '2026-06-24', '2026-06-25', '2026-06-26', '2026-06-27', '2026-06-28', '2026-06-29', '2026-06-30',
+    ]
+
+def test_gfs_keeps_only_newest_of_a_day():
+    backups = [make_backup(1, datetime.datetime(2026, 6, 30, 3)),
+               make_backup(2, datetime.datetime(2026, 6, 30, 9)),
+               make_backup(3, datetime.datetime(2026, 6, 29, 3))]
+    expired = backup.select_expired_backups(backups, daily=2, weekly=0, monthly=0, now=NOW)
+    assert [b['id'] for b in expired] == [1]
+
+def test_gfs_restored_failed_and_in_progress():
+    old = datetime.datetime(2025, 1, 1)
+    backups = [
+        make_backup(1, old, restored_at=datetime.datetime(2025, 1, 2)),  # восстанавливали — храним
+        make_backup(2, old, status='failed'),
+        make_backup(3, NOW - datetime.timedelta(hours=1), status='in_progress'),  # ещё пишется
+        make_backup(4, NOW - datetime.timedelta(days=2), status='in_progress'),   # брошенная запись
+        make_backup(5, old),
+    ]
+    expired = backup.select_expired_backups(backups, daily=0, weekly=0, monthly=0, now=NOW)
+    assert [b['id'] for b in expired] == [2, 4, 5]
+
+def test_apply_retention_removes_files_and_records(manager, monkeypatch):
+    root = manager.backup_dir.parent
+    month = manager.backup_dir / '2026' / '01'
+    month.mkdir(parents=True)
+    (month / 'old.sql.gz').write_bytes(b'x' * 10)
+    (month / 'stale.sql.gz.part').write_bytes(b'x')
+    recent = manager.backup_dir / '2026' / '06'
+    recent.mkdir(parents=True)
+    (recent / 'new.sql.gz').write_bytes(b'x' * 20)
+    rows = [
+        make_backup(1, datetime.datetime(2026, 1, 5), filepath='backups/2026/01/old.sql.gz', filesize=10),
+        make_backup(2, datetime.datetime(2026, 1, 6), status='failed', filepath='backups/2026/01/stale.sql.gz'),
+        make_backup(3, datetime.datetime(2026, 6, 30, 3), filepath=str(root / 'backups/2026/06/new.sql.gz'),
+                    filesize=20),
+    ]
+
+    class Cursor:
+        def execute(self, sql, params=None):
+            pass
+
+        def fetchall(self):
+            return [(r['id'], r['filepath'], r['filesize'], r['status'], r['created_at'], r['restored_at'])
+                    for r in rows]
+
+    @contextlib.contextmanager
+    def read():
+        yield Cursor()
+    deleted = []
+    monkeypatch.setattr(backup, 'read', read)
+    monkeypatch.setattr(backup, 'delete_backup_records', deleted.extend)
+
+    result = manager.apply_retention(daily=1, weekly=0, monthly=0, now=NOW)
+    assert result == {'deleted': 2, 'freed_bytes': 10, 'kept': 1}
+    assert sorted(deleted) == [1, 2]
+    assert (recent / 'new.sql.gz').exists()
+    assert not month.exists()     # опустевший каталог месяца удалён
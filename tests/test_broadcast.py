@@ -0,0 +1,255 @@
+import asyncio
+import time
+from aiogram.exceptions import TelegramRetryAfter
+from services import broadcast as broadcast_module
+from services.broadcast import (
+    BroadcastService, TokenBucket, ChatRateLimiter, broadcast_keyboard, format_progress, _JobControl,
+)
+
+class FakeBroadcastDB:
+    """In-memory broadcast_jobs/broadcast_recipients with advisory locks per job."""
+
+    def __init__(self, recipients, status='running'):
+        self.job = {'id': 1, 'text': 'Привет', 'status': status, 'total': len(recipients),
+                    'sent': 0, 'failed': 0, 'progress_chat_id': None, 'progress_message_id': None}
+        self.recipients = {uid: 'pending' for uid in recipients}
+        self.locks = {}
+
+    def install(self, monkeypatch):
+        db = self
+
+        class Conn:
+            async def fetchval(self, query, key, job_id):
+                owner = db.locks.setdefault(job_id, self)
+                return owner is self
+
+            async def close(self):
+                for job_id, owner in list(db.locks.items()):
+                    if owner is self:
+                        del db.locks[job_id]
+
+        async def open_connection():
+            return Conn()
+
+        async def get_broadcast_job(job_id):
+            return dict(db.job)
+
+        async def get_broadcast_status(job_id, conn=None):
+            return db.job['status']
+
+        async def get_unfinished_broadcast_ids(lock_key=None):
+            if db.job['status'] in ('running', 'paused') and 1 not in db.locks:
+                return [1]
+            return []
+
+        async def set_broadcast_status(job_id, status, expected=('running', 'paused')):
+            if db.job['status'] not in expected:
+                return False
+            db.job['status'] = status
+            return True
+
+        async def claim_recipients(job_id, limit=500):
+            batch = sorted(uid for uid, s in db.recipients.items() if s == 'pending')[:limit]
+            for uid in batch:
+                db.recipients[uid] = 'sending'
+            return batch
+
+        async def release_recipients(job_id, user_ids=None):
+            ids = [uid for uid, s in db.recipients.items() if s == 'sending'] if user_ids is None else user_ids
+            for uid in ids:
+                db.recipients[uid] = 'pending'
+            return len(ids)
+
+        async def mark_recipients(job_id, sent_ids, failed):
+            for uid in sent_ids:
+                db.recipients[uid] = 'sent'
+            for uid, _ in failed:
+                db.recipients[uid] = 'failed'
+            db.job['sent'] += len(sent_ids)
+            db.job['failed'] += len(failed)
+            return db.job['sent'], db.job['failed']
+
+        monkeypatch.setattr(broadcast_module, 'open_dedicated_async_connection', open_connection)
+        for func in (get_broadcast_job, get_broadcast_status, get_unfinished_broadcast_ids,
+                     set_broadcast_status, claim_recipients, release_recipients, mark_recipients):
+            monkeypatch.setattr(broadcast_module, func.__name__, func)
+
+class FakeBot:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.sent = []
+
+    async def send_message(self, chat_id, text):
+        await asyncio.sleep(self.delay)
+        self.sent.append(chat_id)
+
+    async def edit_message_text(self, *args, **kwargs):
+        pass
+
+def service(bot, **kwargs):
+    kwargs.setdefault('rate', 10000)
+    kwargs.setdefault('control_interval', 0.01)
+    s = BroadcastService(bot, **kwargs)
+    s.limiter.per_chat_interval = 0
+    return s
+
+async def wait_finished(*services, timeout=5):
+    deadline = time.monotonic() + timeout
+    while any(s._tasks for s in services):
+        assert time.monotonic() < deadline, "broadcast did not finish"
+        await asyncio.sleep(0.01)
+
+def test_sends_every_recipient_once(monkeypatch):
+    db = FakeBroadcastDB(range(1, 51))
+    db.install(monkeypatch)
+    bot = FakeBot()
+
+    async def run():
+        s = service(bot, batch_size=7)
+        s.start(1)
+        await wait_finished(s)
+    asyncio.run(run())
+    assert sorted(bot.sent) == list(range(1, 51))
+    assert db.job['status'] == 'completed' and db.job['sent'] == 50
+    assert db.locks == {}
+
+def test_job_runs_in_one_process_only(monkeypatch):
+    db = FakeBroadcastDB(range(1, 31))
+    db.install(monkeypatch)
+    first, second = FakeBot(delay=0.001), FakeBot(delay=0.001)
+
+    async def run():
+        a, b = service(first, batch_size=5), service(second, batch_size=5)
+        a.start(1)
+        b.start(1)
+        await b.resume_unfinished()
+        await wait_finished(a, b)
+    asyncio.run(run())
+    assert len(first.sent) + len(second.sent) == 30
+    assert not (first.sent and second.sent)
+
+def test_stale_claims_are_released_on_takeover(monkeypatch):
+    db = FakeBroadcastDB(range(1, 11))
+    db.recipients[3] = db.recipients[4] = 'sending'   # воркер упал посреди пачки
+    db.install(monkeypatch)
+    bot = FakeBot()
+
+    async def run():
+        s = service(bot)
+        await s.resume_unfinished()
+        await wait_finished(s)
+    asyncio.run(run())
+    assert sorted(bot.sent) == list(range(1, 11))
+
+def test_pause_and_cancel_go_through_job_row(monkeypatch):
+    db = FakeBroadcastDB(range(1, 201))
+    db.install(monkeypatch)
+    bot = FakeBot(delay=0.001)
+
+    async def run():
+        runner = service(bot, batch_size=10, concurrency=1)
+        other = service(FakeBot())          # кнопки нажали в другом процессе бота
+        runner.start(1)
+        await asyncio.sleep(0.05)
+        assert await other.pause(1)
+        assert not await other.pause(1)
+        await asyncio.sleep(0.05)
+        paused_at = len(bot.sent)
+        await asyncio.sleep(0.05)
+        assert len(bot.sent) == paused_at
+        assert 'sending' not in db.recipients.values()
+        assert await other.cancel(1)
+        await wait_finished(runner)
+    asyncio.run(run())
+    assert db.job['status'] == 'cancelled'
+    assert 0 < len(bot.sent) < 200
+
+def test_job_control_apply():
+    control = _JobControl('running')
+    assert not control.apply('running')
+    assert control.apply('paused') and not control.resumed.is_set()
+    assert control.apply('cancelled') and control.resumed.is_set()
+
+def test_token_bucket_limits_rate():
+    async def run():
+        bucket = TokenBucket(rate=100, capacity=5)
+        started = time.monotonic()
+        for _ in range(15):
+            await bucket.acquire()
+        return time.monotonic() - started
+    # 5 токенов сразу, остальные 10 — по 10 мс
+    assert 0.08 <= asyncio.run(run()) < 0.5
+
+def test_token_bucket_pause():
+    async def run():
+        bucket = TokenBucket(rate=1000)
+        bucket.pause(0.05)
+        started = time.monotonic()
+        await bucket.acquire()
+        return time.monotonic() - started
+    assert asyncio.run(run()) >= 0.05
+
+def test_chat_rate_limiter_spaces_same_chat():
+    async def run():
+        limiter = ChatRateLimiter(global_rate=1000, per_chat_interval=0.05)
+        started = time.monotonic()
+        await limiter.acquire(1)
+        await limiter.acquire(2)
+        fast = time.monotonic() - started
+        await limiter.acquire(1)
+        return fast, time.monotonic() - started
+    fast, total = asyncio.run(run())
+    assert fast < 0.04 and total >= 0.05
+
+def test_progress_text_and_keyboard():
+    text = format_progress(7, 'running', 200, 50, 10)
+    assert '#7' in text and '60/200 (30%)' in text
+    assert broadcast_keyboard(7, 'completed') is None
+    paused = broadcast_keyboard(7, 'paused').inline_keyboard[0]
+    assert [b.callback_data for b in paused] == ['bc_resume:7', 'bc_cancel:7']
+
+
+class FloodBot(FakeBot):
+    """Answers the first `floods` sends with flood control (retry_after=0)."""
+
+    def __init__(self, floods):
+        super().__init__()
+        self.floods = floods
+
+    async def send_message(self, chat_id, text):
+        if self.floods:
+            self.floods -= 1
+            raise TelegramRetryAfter(method=None, message='Flood', retry_after=0)
+        self.sent.append(chat_id)
+
+def test_flood_control_does_not_use_up_attempts():
+    bot = FloodBot(floods=5)
+    s = service(bot, max_attempts=2)
+    assert asyncio.run(s._send(10, 'text', _JobControl('running'))) is None
+    assert bot.sent == [10]
+
+def test_stop_during_flood_control_requeues_recipient():
+    bot = FloodBot(floods=1)
+    s = service(bot)
+    control = _JobControl('running')
+    original_pause = s.limiter.bucket.pause
+
+    def pause(seconds):
+        original_pause(seconds)
+        control.apply('paused')     # админ нажал паузу, пока ждали flood control
+    s.limiter.bucket.pause = pause
+    assert asyncio.run(s._send(10, 'text', control)) is False
+    assert bot.sent == []
+
+def test_job_under_flood_control_fails_nobody(monkeypatch):
+    db = FakeBroadcastDB(range(1, 11))
+    db.install(monkeypatch)
+    bot = FloodBot(floods=8)
+
+    async def run():
+        s = service(bot, batch_size=4, max_attempts=1)
+        s.start(1)
+        await wait_finished(s)
+    asyncio.run(run())
+    assert sorted(bot.sent) == list(range(1, 11))
+    assert db.job['sent'] == 10 and db.job['failed'] == 0
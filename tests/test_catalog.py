@@ -0,0 +1,120 @@
+import asyncio
+import pytest
+from services import catalog as catalog_module
+from services.catalog import CatalogIndex, CatalogService
+
+VEHICLE_TYPES = [{'id': 1, 'name': 'Легковой', 'code': 'car'}, {'id': 2, 'name': 'Грузовой', 'code': 'truck'}]
+BRANDS = [
+    {'id': 10, 'name': 'Audi', 'first_letter': 'A', 'logo_url': None, 'country': 'DE'},
+    {'id': 11, 'name': 'Alfa Romeo', 'first_letter': 'A', 'logo_url': None, 'country': 'IT'},
+    {'id': 12, 'name': 'Kia', 'first_letter': 'K', 'logo_url': None, 'country': 'KR'},
+]
+
+def model(model_id, brand_id, name, vehicle_type_id=1):
+    return {'id': model_id, 'brand_id': brand_id, 'vehicle_type_id': vehicle_type_id, 'name': name,
+            'start_year': 2000, 'end_year': None, 'is_active': True,
+            'vehicle_type_name': {1: 'Легковой', 2: 'Грузовой', None: None}[vehicle_type_id]}
+
+MODELS = [model(100, 10, 'A4'), model(101, 10, 'Q7'), model(102, 12, 'Bongo', 2), model(103, 12, 'Concept', None)]
+YEARS = [{'id': 1, 'model_id': 100, 'year': 2019}, {'id': 2, 'model_id': 100, 'year': 2020},
+         {'id': 3, 'model_id': 101, 'year': 2021}]
+
+def make_index(version=1):
+    return CatalogIndex(version, VEHICLE_TYPES, BRANDS, MODELS, YEARS)
+
+def test_index_brands_by_letter():
+    index = make_index()
+    assert [b['name'] for b in index.brands('a')] == ['Audi', 'Alfa Romeo']
+    assert index.brands('Z') == [] and index.brands(None) == []
+
+def test_index_models_by_brand_and_type():
+    index = make_index()
+    assert [m['name'] for m in index.models(12)] == ['Bongo', 'Concept']
+    assert [m['name'] for m in index.models(12, 2)] == ['Bongo']
+    assert [m['name'] for m in index.models(10, 1)] == ['A4', 'Q7']
+    assert index.models(10, 2) == [] and index.models(99) == []
+    assert index.models(12, 0) == index.models(12)       # 0 / None — все модели марки
+
+def test_index_years_and_snapshot():
+    index = make_index()
+    assert [y['year'] for y in index.years(100)] == [2019, 2020]
+    assert index.years(102) == []
+    # Индекс не ссылается на исходные записи
+    VEHICLE_TYPES[0]['name'] = 'changed'
+    try:
+        assert index.vehicle_types[0]['name'] == 'Легковой'
+    finally:
+        VEHICLE_TYPES[0]['name'] = 'Легковой'
+
+class FakeListenConnection:
+    def __init__(self):
+        self.listeners = {}
+        self.closed = False
+
+    async def add_listener(self, channel, callback):
+        self.listeners[channel] = callback
+
+    def is_closed(self):
+        return self.closed
+
+    async def close(self):
+        self.closed = True
+
+@pytest.fixture
+def database(monkeypatch):
+    state = {'loads': 0, 'conn': None}
+
+    async def load_catalog():
+        state['loads'] += 1
+        return VEHICLE_TYPES, BRANDS, MODELS, YEARS
+
+    async def connect():
+        state['conn'] = FakeListenConnection()
+        return state['conn']
+    monkeypatch.setattr(catalog_module, 'load_catalog', load_catalog)
+    monkeypatch.setattr(catalog_module, 'open_dedicated_async_connection', connect)
+    return state
+
+def notify(state):
+    state['conn'].listeners[catalog_module.CATALOG_CHANNEL](state['conn'], 1, catalog_module.CATALOG_CHANNEL, '')
+
+def test_get_loads_once(database):
+    async def run():
+        service = CatalogService()
+        first = await service.get()
+        return first, await service.get()
+    first, second = asyncio.run(run())
+    assert first is second and first.version == 1 and database['loads'] == 1
+
+def test_burst_of_notifies_reloads_once(database):
+    async def run():
+        service = CatalogService()
+        service.DEBOUNCE = 0.05
+        await service.start()
+        before = await service.get()
+        await asyncio.sleep(0.01)
+        for _ in range(5):                  # серия изменений чаще DEBOUNCE
+            notify(database)
+            await asyncio.sleep(0.02)
+        assert (await service.get()) is before      # пока идёт серия — старый индекс
+        await asyncio.sleep(0.1)
+        after = await service.get()
+        await service.stop()
+        return before, after
+    before, after = asyncio.run(run())
+    assert database['loads'] == 2
+    assert (before.version, after.version) == (1, 2)
+    assert database['conn'].closed
+
+def test_stop_right_after_notify(database):
+    async def run():
+        service = CatalogService()
+        service.DEBOUNCE = 0.05
+        await service.start()
+        await asyncio.sleep(0.01)
+        notify(database)
+        await asyncio.sleep(0.01)
+        notify(database)
+        await asyncio.wait_for(service.stop(), 1)
+    asyncio.run(run())
+    assert database['loads'] == 1
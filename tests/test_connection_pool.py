@@ -0,0 +1,137 @@
+import threading
+import time
+import pytest
+from psycopg2 import extensions, pool as pg_pool
+from database import connection
+from database.connection import BoundedConnectionPool, PoolTimeoutError
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, args=None):
+        self.conn.executed.append(query)
+
+class FakeConnection:
+    """Just enough of a psycopg2 connection for the pool."""
+
+    class Info:
+        transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+    def __init__(self):
+        self.closed = 0
+        self.info = self.Info()
+        self.executed = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.autocommit = False
+        self.readonly = None
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = 1
+
+@pytest.fixture
+def connect(monkeypatch):
+    opened = []
+    def fake_connect(**kwargs):
+        conn = FakeConnection()
+        opened.append(conn)
+        return conn
+    monkeypatch.setattr(connection.psycopg2, 'connect', fake_connect)
+    return opened
+
+def test_opens_minconn_and_reuses_idle(connect):
+    p = BoundedConnectionPool(1, 2)
+    assert len(connect) == 1
+    conn = p.getconn()
+    p.putconn(conn)
+    assert p.getconn() is conn
+    assert p.stats()['checkouts'] == 2
+
+def test_timeout_when_exhausted(connect):
+    p = BoundedConnectionPool(0, 1, timeout=0.05)
+    p.getconn()
+    started = time.monotonic()
+    with pytest.raises(PoolTimeoutError):
+        p.getconn()
+    assert time.monotonic() - started >= 0.05
+    assert p.stats()['timeouts'] == 1
+
+def test_waiter_gets_returned_connection(connect):
+    p = BoundedConnectionPool(0, 1, timeout=2)
+    conn = p.getconn()
+    threading.Timer(0.05, p.putconn, args=(conn,)).start()
+    assert p.getconn() is conn
+    stats = p.stats()
+    assert stats['waits'] == 1 and stats['wait_time_max'] > 0
+
+def test_recycles_old_connections(connect):
+    p = BoundedConnectionPool(0, 1, recycle=0.01)
+    old = p.getconn()
+    p.putconn(old)
+    time.sleep(0.02)
+    new = p.getconn()
+    assert new is not old
+    assert old.closed
+    assert p.stats()['recycled'] == 1
+
+def test_pings_connection_idle_too_long(connect):
+    p = BoundedConnectionPool(0, 1, ping_after=0)
+    conn = p.getconn()
+    p.putconn(conn)
+    assert p.getconn() is conn
+    assert conn.executed == ['SELECT 1']
+
+def test_rolls_back_open_transaction_on_return(connect):
+    p = BoundedConnectionPool(0, 1)
+    conn = p.getconn()
+    conn.info.transaction_status = extensions.TRANSACTION_STATUS_INTRANS
+    p.putconn(conn)
+    assert conn.rollbacks == 1
+
+def test_unknown_connection_rejected(connect):
+    p = BoundedConnectionPool(0, 1)
+    with pytest.raises(pg_pool.PoolError):
+        p.putconn(FakeConnection())
+
+def test_closeall_closes_connections_returned_later(connect):
+    p = BoundedConnectionPool(0, 2)
+    busy, idle = p.getconn(), p.getconn()
+    p.putconn(idle)
+    p.closeall()
+    assert idle.closed
+    assert not busy.closed
+    with pytest.raises(pg_pool.PoolError):
+        p.getconn()
+    p.putconn(busy)
+    assert busy.closed
+    assert p.stats()['size'] == 0
+
+def test_close_all_connections_does_not_leak(connect, monkeypatch):
+    monkeypatch.setattr(connection, 'connection_pool', BoundedConnectionPool(0, 2))
+    monkeypatch.setattr(connection, '_retired_pools', [])
+    busy = connection.get_db_connection()
+    connection.close_all_connections()
+    # Пул пересоздаётся при следующем обращении, а старое соединение всё равно закрывается при возврате
+    fresh = connection.get_db_connection()
+    assert fresh is not busy
+    connection.return_db_connection(busy)
+    assert busy.closed
+    assert connection._retired_pools == []
+    connection.return_db_connection(fresh)
+    assert not fresh.closed
@@ -0,0 +1,50 @@
+import asyncio
+from database.crud_async import users
+from utils.cache import peek_user_context, invalidate_user_context
+
+class FakePool:
+    """Stands in for asyncpg.Pool: returns canned rows and records queries."""
+
+    def __init__(self, row=None, value=None):
+        self.row = row
+        self.value = value
+        self.queries = []
+
+    async def fetchrow(self, query, *args):
+        self.queries.append((query, args))
+        return self.row
+
+    async def fetchval(self, query, *args):
+        self.queries.append((query, args))
+        return self.value
+
+def use_pool(monkeypatch, pool):
+    async def get_async_pool():
+        return pool
+    monkeypatch.setattr(users, 'get_async_pool', get_async_pool)
+
+def test_get_user_returns_dict(monkeypatch):
+    use_pool(monkeypatch, FakePool(row={'user_id': 1, 'full_name': 'Test User'}))
+    user = asyncio.run(users.get_user(1))
+    assert user == {'user_id': 1, 'full_name': 'Test User'}
+
+def test_get_user_missing(monkeypatch):
+    use_pool(monkeypatch, FakePool(row=None))
+    assert asyncio.run(users.get_user(2)) is None
+
+def test_is_user_registered(monkeypatch):
+    use_pool(monkeypatch, FakePool(value=1))
+    assert asyncio.run(users.is_user_registered(3)) is True
+    use_pool(monkeypatch, FakePool(value=None))
+    assert asyncio.run(users.is_user_registered(3)) is False
+
+def test_create_user_passes_username_and_caches_context(monkeypatch):
+    pool = FakePool(value=4)
+    use_pool(monkeypatch, pool)
+    invalidate_user_context(4)
+    assert asyncio.run(users.create_user(4, 'nick', 'Full Name', '+70000000000')) == 4
+    _, args = pool.queries[0]
+    assert args == (4, 'nick', 'Full Name', '+70000000000', False)
+    context = peek_user_context(4)
+    assert context.registered and not context.is_admin
+    assert context.phone == '+70000000000'
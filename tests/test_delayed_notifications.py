@@ -0,0 +1,117 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+import pytz
+import pytest
+from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError
+from database.crud.settings import SettingsSnapshot
+from services import delayed_notifications
+from services.delayed_notifications import DelayedNotificationProcessor
+
+class FakeBot:
+    """Answers per chat: 'ok', 'flood', 'blocked' or 'down'."""
+
+    def __init__(self, behaviour):
+        self.behaviour = behaviour
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        kind = self.behaviour.get(chat_id, 'ok')
+        if kind == 'flood':
+            raise TelegramRetryAfter(method=None, message='Flood', retry_after=0)
+        if kind == 'blocked':
+            raise TelegramForbiddenError(method=None, message='Forbidden')
+        if kind == 'down':
+            raise ConnectionError('network is down')
+        self.sent.append((chat_id, text))
+
+def row(notif_id, admin_ids, retry=0, text='Новая запись'):
+    return (notif_id, 'new_appointment', 1, None, text, json.dumps({'admin_ids': admin_ids, 'kwargs': {}}), retry)
+
+@pytest.fixture
+def completed(monkeypatch):
+    results = []
+    monkeypatch.setattr(delayed_notifications, 'complete_notifications',
+                        lambda sent, failed, retries: results.append((sent, failed, retries)))
+    snapshot = SettingsSnapshot()
+    snapshot.replace({'max_notification_retries': '3'})
+    monkeypatch.setattr(delayed_notifications, 'get_settings', lambda: snapshot)
+    return results
+
+def processor(bot):
+    p = DelayedNotificationProcessor(bot, batch_size=10, concurrency=5, rate=1000)
+    p._retry_at = lambda retry, retry_after=0: datetime(2026, 1, 1, 9, retry)
+    return p
+
+def test_batch_outcomes_written_in_one_call(completed):
+    bot = FakeBot({20: 'blocked', 30: 'down', 40: 'blocked'})
+    p = processor(bot)
+    batch = [
+        row(1, [10, 20]),       # хотя бы один админ получил — отправлено
+        row(2, [30]),           # временная ошибка — повтор
+        row(3, [40]),           # заблокировал бота — не доставить
+        row(4, [30], retry=2),  # попытки исчерпаны
+    ]
+    asyncio.run(p._process_batch(batch))
+    assert completed == [([1], [3, 4], [(2, datetime(2026, 1, 1, 9, 0))])]
+    assert bot.sent[0][0] == 10
+    assert bot.sent[0][1].startswith('(🔔 Отложенное с ')
+
+def test_flood_control_pauses_bucket(completed):
+    p = processor(FakeBot({10: 'flood'}))
+    asyncio.run(p._process_batch([row(1, [10])]))
+    assert completed[0][2][0][0] == 1
+    assert p.bucket.tokens == 0
+
+def test_broken_payload_fails_without_retry(completed):
+    p = processor(FakeBot({}))
+    broken = (5, 'x', 1, None, 'text', '{not json', 0)
+    asyncio.run(p._process_batch([broken]))
+    assert completed == [([], [5], [])]
+
+def test_claims_batches_until_queue_is_empty(monkeypatch, completed):
+    queue = [[row(i, [10]) for i in range(1, 11)], [row(11, [10])]]
+    claimed, released = [], []
+    monkeypatch.setattr(delayed_notifications, 'claim_due_notifications',
+                        lambda limit: claimed.append(limit) or (queue.pop(0) if queue else []))
+    monkeypatch.setattr(delayed_notifications, 'release_stale_claims', released.append)
+    p = processor(FakeBot({}))
+    asyncio.run(p.process_pending_notifications())
+    assert claimed == [10, 10]
+    assert len(released) == 1
+    assert sum(len(sent) for sent, _, _ in completed) == 11
+
+
+@pytest.fixture
+def silent_window(monkeypatch):
+    """Replaces the global silent hours service; returns a function that sets the window."""
+    from services import silent_hours
+    snapshot = SettingsSnapshot()
+    snapshot.replace({'silent_hours_enabled': 'false', 'silent_hours_timezone': 'Europe/Moscow',
+                      'morning_notification_time': '09:00'})
+    monkeypatch.setattr(silent_hours, 'get_settings', lambda: snapshot)
+    monkeypatch.setattr(silent_hours, 'subscribe', snapshot.subscribe)
+    monkeypatch.setattr(silent_hours, 'silent_hours_service', silent_hours.SilentHoursService())
+
+    def set_window(start, end):
+        snapshot.set('silent_hours_start', start)
+        snapshot.set('silent_hours_end', end)
+        snapshot.set('silent_hours_enabled', 'true')
+    return set_window
+
+def test_retry_at_is_time_zone_aware(silent_window):
+    p = DelayedNotificationProcessor(FakeBot({}), rate=1000)
+    before = datetime.now(timezone.utc)
+    at = p._retry_at(2)
+    assert at.tzinfo is not None
+    expected = timedelta(seconds=min(p.retry_base * 4, p.retry_max))
+    assert before + expected <= at <= datetime.now(timezone.utc) + expected
+    assert p._retry_at(0, retry_after=3600) - datetime.now(timezone.utc) > timedelta(minutes=59)
+
+def test_retry_at_skips_silent_hours(silent_window):
+    silent_window('00:00', '23:59')     # всё время — тихие часы
+    p = DelayedNotificationProcessor(FakeBot({}), rate=1000)
+    at = p._retry_at(0)
+    assert at.tzinfo is not None
+    morning = at.astimezone(pytz.timezone('Europe/Moscow'))
+    assert (morning.hour, morning.minute) == (9, 0)
@@ -0,0 +1,80 @@
+import contextlib
+import io
+import json
+import pytest
+import import_from_json
+from import_from_json import iter_json_array, collect_models, import_catalog
+
+ITEMS = [
+    {'brand': 'Lada', 'model': '2107', 'start_year': '1982', 'end_year': '2012'},
+    {'brand': 'Škoda', 'model': 'Octavia [A5], "RS"', 'start_year': '2004', 'end_year': ''},
+    {'brand': 'Kia', 'model': 'Rio', 'start_year': 2011, 'end_year': None},
+]
+
+@pytest.fixture
+def small_reads(monkeypatch):
+    # Маленький блок: объекты гарантированно режутся границей чтения
+    monkeypatch.setattr(import_from_json, 'READ_SIZE', 7)
+
+def test_iter_json_array_across_read_boundaries(small_reads):
+    text = json.dumps(ITEMS, ensure_ascii=False, indent=2)
+    assert list(iter_json_array(io.StringIO(text))) == ITEMS
+
+def test_iter_json_array_compact_and_empty(small_reads):
+    assert list(iter_json_array(io.StringIO(json.dumps(ITEMS, separators=(',', ':'))))) == ITEMS
+    assert list(iter_json_array(io.StringIO(' [ ] '))) == []
+
+def test_iter_json_array_rejects_non_array():
+    with pytest.raises(ValueError, match='array'):
+        list(iter_json_array(io.StringIO('{"brand": "Lada"}')))
+
+def test_iter_json_array_truncated_file(small_reads):
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_array(io.StringIO('[{"brand": "Lada"}, {"brand": "Ki')))
+
+def test_collect_models_merges_duplicates():
+    models = collect_models([
+        {'brand': ' Lada ', 'model': '2107', 'start_year': '1985', 'end_year': '2010'},
+        {'brand': 'Lada', 'model': '2107', 'start_year': '1982', 'end_year': '2012'},
+        {'brand': 'Kia', 'model': 'Rio', 'start_year': '2011', 'end_year': '2017'},
+        {'brand': 'Kia', 'model': 'Rio', 'start_year': '', 'end_year': ''},        # ещё выпускается
+        {'brand': 'Ford', 'model': 'Focus', 'start_year': 'n/a', 'end_year': '2018'},
+        {'brand': '', 'model': 'Nameless'},
+        {'model': 'No brand'},
+    ])
+    assert models == {
+        ('Lada', '2107'): (1982, 2012),
+        ('Kia', 'Rio'): (2011, None),
+        ('Ford', 'Focus'): (None, None),
+    }
+
+class CopyCursor:
+    def __init__(self):
+        self.statements = []
+        self.copied = None
+        self.rowcount = 3
+
+    def execute(self, sql, params=None):
+        self.statements.append((sql, params))
+
+    def copy_expert(self, sql, file):
+        self.copied = file.read()
+
+def test_import_catalog_copies_escaped_rows(monkeypatch):
+    cursor = CopyCursor()
+
+    @contextlib.contextmanager
+    def transaction():
+        yield cursor
+    monkeypatch.setattr(import_from_json, 'transaction', transaction)
+
+    result = import_catalog({
+        ('Lada', '2107'): (1982, 2012),
+        ('Tab\tBrand', 'Back\\slash\nModel'): (None, None),
+    }, vehicle_type_id=2)
+    assert cursor.copied == (
+        'Lada\t2107\t1982\t2012\n'
+        'Tab\\tBrand\tBack\\\\slash\\nModel\t\\N\t\\N\n'
+    )
+    assert result == {'brands': 3, 'models': 3, 'years': 3}
+    assert any(params == (2,) for _, params in cursor.statements)
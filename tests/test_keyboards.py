@@ -0,0 +1,58 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from bot.keyboards import cache, common
+from bot.keyboards.cache import get_keyboard, memoized_keyboard, clear_keyboards
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_keyboards()
+    yield
+    clear_keyboards()
+
+def test_get_keyboard_builds_once_per_key():
+    builds = []
+
+    def build():
+        builds.append(1)
+        return object()
+    first = get_keyboard('models', 3, (10, 1), build)
+    assert get_keyboard('models', 3, (10, 1), build) is first
+    assert get_keyboard('models', 4, (10, 1), build) is not first      # новая версия справочника
+    assert get_keyboard('models', 3, (10, 2), build) is not first
+    assert len(builds) == 3
+
+def test_memoized_keyboard_by_arguments():
+    calls = []
+
+    @memoized_keyboard('time_grid')
+    def keyboard(day, page=0):
+        calls.append((day, page))
+        return object()
+    assert keyboard('2026-06-01') is keyboard('2026-06-01')
+    assert keyboard('2026-06-01', page=1) is keyboard('2026-06-01', page=1)
+    assert keyboard('2026-06-01', page=1) is not keyboard('2026-06-01')
+    assert calls == [('2026-06-01', 0), ('2026-06-01', 1)]
+    assert keyboard.build('x') is not keyboard.build('x')     # .build — без кеша
+
+def test_clear_keyboards():
+    markup = common.back_keyboard()
+    assert common.back_keyboard() is markup
+    clear_keyboards()
+    assert common.back_keyboard() is not markup
+
+def test_main_menu_shared_per_registration_status(monkeypatch):
+    registered = {1: True, 2: True, 3: False}
+
+    async def get_user_context(user_id):
+        return SimpleNamespace(registered=registered[user_id])
+    monkeypatch.setattr(common, 'get_user_context', get_user_context)
+
+    async def menus():
+        return [await common.get_main_menu(user_id) for user_id in (1, 2, 3, None)]
+    first, second, guest, anonymous = asyncio.run(menus())
+    assert first is second
+    assert guest is anonymous and guest is not first
+    assert [len(row) for row in first.keyboard] == [2, 2]
+    assert [len(row) for row in guest.keyboard] == [2]
+    assert len(cache._keyboards) == 2
@@ -0,0 +1,100 @@
+import asyncio
+import pytest
+from services import delayed_notifications
+from services.delayed_notifications import NotificationDispatcher
+
+class FakeListenConnection:
+    def __init__(self):
+        self.listeners = {}
+        self.closed = False
+
+    async def add_listener(self, channel, callback):
+        self.listeners[channel] = callback
+
+    def is_closed(self):
+        return self.closed
+
+    async def close(self):
+        self.closed = True
+
+class FakeProcessor:
+    def __init__(self):
+        self.runs = 0
+
+    async def process_pending_notifications(self):
+        self.runs += 1
+
+@pytest.fixture
+def queue(monkeypatch):
+    """Seconds until the next pending notification, as the database would report it."""
+    state = {'next': None, 'conn': None}
+    async def connect():
+        state['conn'] = FakeListenConnection()
+        return state['conn']
+    async def seconds_until_next():
+        return state['next']
+    monkeypatch.setattr(delayed_notifications, 'open_dedicated_async_connection', connect)
+    monkeypatch.setattr(delayed_notifications, 'seconds_until_next_notification', seconds_until_next)
+    return state
+
+def notify(state, payload):
+    callback = state['conn'].listeners[delayed_notifications.NOTIFY_CHANNEL]
+    callback(state['conn'], 1, delayed_notifications.NOTIFY_CHANNEL, payload)
+
+def test_idle_until_notify(queue):
+    processor = FakeProcessor()
+
+    async def run():
+        dispatcher = NotificationDispatcher(processor, safety_poll=60)
+        dispatcher.start()
+        await asyncio.sleep(0.05)
+        assert processor.runs == 1          # первый проход при старте
+        await asyncio.sleep(0.1)
+        assert processor.runs == 1          # пустая очередь — без опроса
+        notify(queue, '0')
+        await asyncio.sleep(0.05)
+        await dispatcher.stop()
+        return dispatcher
+    dispatcher = asyncio.run(run())
+    assert processor.runs == 2
+    assert queue['conn'].closed
+
+def test_wakes_at_scheduled_time(queue):
+    processor = FakeProcessor()
+
+    async def run():
+        dispatcher = NotificationDispatcher(processor, safety_poll=60)
+        dispatcher.start()
+        await asyncio.sleep(0.02)
+        notify(queue, '0.1')                # уведомление через 100 мс
+        await asyncio.sleep(0.05)
+        early = processor.runs
+        await asyncio.sleep(0.15)
+        await dispatcher.stop()
+        return early
+    assert asyncio.run(run()) == 1
+    assert processor.runs == 2
+
+def test_later_notify_does_not_postpone_earlier(queue):
+    async def run():
+        dispatcher = NotificationDispatcher(FakeProcessor(), safety_poll=60)
+        dispatcher.start()
+        await asyncio.sleep(0.02)
+        notify(queue, '5')
+        first = dispatcher._due_at
+        notify(queue, '3600')
+        await dispatcher.stop()
+        return first, dispatcher._due_at
+    first, due_at = asyncio.run(run())
+    assert due_at == first
+
+def test_inactive_node_does_nothing(queue):
+    processor = FakeProcessor()
+
+    async def run():
+        dispatcher = NotificationDispatcher(processor, is_active=lambda: False)
+        dispatcher.start()
+        await asyncio.sleep(0.05)
+        await dispatcher.stop()
+    asyncio.run(run())
+    assert processor.runs == 0 and queue['conn'] is None
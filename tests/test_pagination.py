@@ -0,0 +1,58 @@
+from datetime import date, datetime, time
+from utils.pagination import encode_cursor, decode_cursor, page_from_rows, count_rows
+from utils.cache import delete_cache
+
+def test_cursor_round_trip():
+    token = encode_cursor(date(2026, 10, 18), time(9, 30), 42)
+    assert '=' not in token
+    assert decode_cursor(token, 'date', 'time', 'int') == (date(2026, 10, 18), time(9, 30), 42)
+
+def test_datetime_cursor():
+    moment = datetime(2026, 10, 18, 12, 0, 5)
+    assert decode_cursor(encode_cursor(moment, 7), 'datetime', 'int') == (moment, 7)
+
+def test_bad_cursor_means_first_page():
+    assert decode_cursor(None, 'int') is None
+    assert decode_cursor('', 'int') is None
+    assert decode_cursor('!!not-base64', 'int') is None
+    assert decode_cursor(encode_cursor(1, 2), 'int') is None           # другая длина ключа
+    assert decode_cursor(encode_cursor('x'), 'int') is None            # не тот тип
+    assert decode_cursor(encode_cursor(1), 'unknown') is None
+
+def test_page_from_rows():
+    rows = [(i, f'name{i}') for i in range(6)]
+    page = page_from_rows(rows, 5, lambda r: {'id': r[0]}, lambda r: (r[0],), total=100)
+    assert [item['id'] for item in page.items] == [0, 1, 2, 3, 4]
+    assert decode_cursor(page.next_cursor, 'int') == (4,)
+    assert page.total == 100
+    last = page_from_rows(rows[:3], 5, lambda r: {'id': r[0]}, lambda r: (r[0],))
+    assert last.next_cursor is None and len(last.items) == 3
+    assert page_from_rows([], 5, dict, tuple).items == []
+
+class CountCursor:
+    def __init__(self, reltuples, count):
+        self.results = {'reltuples': reltuples, 'count': count}
+        self.queries = []
+
+    def execute(self, query, params=()):
+        self.queries.append(query)
+        self.last = 'reltuples' if 'reltuples' in query else 'count'
+
+    def fetchone(self):
+        return (self.results[self.last],)
+
+def test_count_rows_modes():
+    cur = CountCursor(reltuples=1000, count=990)
+    assert count_rows(cur, 'users') == 1000
+    assert count_rows(cur, 'users', mode='exact') == 990
+    assert count_rows(cur, 'users', mode=None) is None
+    # Таблица ещё не анализировалась: честный COUNT(*)
+    delete_cache(('count', 'error_logs', '', ()))
+    assert count_rows(CountCursor(reltuples=-1, count=3), 'error_logs') == 3
+
+def test_filtered_count_is_cached():
+    delete_cache(('count', 'appointments', 'WHERE a.status = %s', ('pending',)))
+    cur = CountCursor(reltuples=0, count=12)
+    for _ in range(3):
+        assert count_rows(cur, 'appointments', 'WHERE a.status = %s', ['pending'], alias='a') == 12
+    assert len(cur.queries) == 1
@@ -0,0 +1,107 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from services import scheduler
+from services.scheduler import LeaderElection, SchedulerManager
+
+class LockConnection:
+    """Fake dedicated connection: pg_try_advisory_lock answers from a shared dict."""
+
+    def __init__(self, locks, owner):
+        self.locks = locks
+        self.owner = owner
+        self.closed = 0
+        self.autocommit = False
+        self.broken = False
+        self.result = None
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        if self.broken:
+            raise OSError("server closed the connection unexpectedly")
+        if 'pg_try_advisory_lock' in query:
+            holder = self.locks.setdefault(params[0], self.owner)
+            self.result = (holder == self.owner,)
+
+    def fetchone(self):
+        return self.result
+
+    def close(self):
+        self.closed = 1
+        for key, holder in list(self.locks.items()):
+            if holder == self.owner:
+                del self.locks[key]
+
+class Locks(dict):
+    """Advisory locks of the fake server plus the connections opened to it."""
+    connections = None
+
+@pytest.fixture
+def lock_table(monkeypatch):
+    table = Locks()
+    table.connections = []
+    def connect():
+        conn = LockConnection(table, owner=len(table.connections))
+        table.connections.append(conn)
+        return conn
+    monkeypatch.setattr(scheduler, 'open_dedicated_connection', connect)
+    return table
+
+def test_only_one_leader(lock_table):
+    a, b = LeaderElection(), LeaderElection()
+    assert a.check() is True
+    assert b.check() is False
+    assert a.check() is True          # лидер лишь подтверждает сессию
+
+def test_leadership_moves_when_leader_connection_dies(lock_table):
+    a, b = LeaderElection(), LeaderElection()
+    a.check()
+    lock_table.connections[0].broken = True
+    assert a.check() is False
+    assert lock_table.connections[0].closed      # закрытие освобождает блокировку
+    assert b.check() is True
+
+def test_release_gives_up_lock(lock_table):
+    a, b = LeaderElection(), LeaderElection()
+    a.check()
+    a.release()
+    assert not a.is_leader
+    assert b.check() is True
+
+@pytest.fixture
+def runs(monkeypatch):
+    runs = []
+    monkeypatch.setattr(scheduler, 'start_job_run', lambda job_id, node: runs.append(('start', job_id, node)) or 7)
+    monkeypatch.setattr(scheduler, 'finish_job_run',
+                        lambda run_id, status, duration_ms, error=None: runs.append(('finish', run_id, status, error)))
+    return runs
+
+def test_job_runs_only_on_leader(runs):
+    called = []
+    async def job():
+        called.append(True)
+    follower = SimpleNamespace(leader=SimpleNamespace(is_leader=False, node='b:2'))
+    asyncio.run(SchedulerManager._run_job(follower, 'daily_backup', job))
+    assert called == [] and runs == []
+
+def test_job_run_is_recorded(runs):
+    async def job():
+        pass
+    leader = SimpleNamespace(leader=SimpleNamespace(is_leader=True, node='a:1'))
+    asyncio.run(SchedulerManager._run_job(leader, 'daily_backup', job))
+    assert runs == [('start', 'daily_backup', 'a:1'), ('finish', 7, 'success', None)]
+
+def test_failed_job_is_recorded_with_error(runs):
+    async def job():
+        raise ValueError("disk full")
+    leader = SimpleNamespace(leader=SimpleNamespace(is_leader=True, node='a:1'))
+    asyncio.run(SchedulerManager._run_job(leader, 'daily_backup', job))
+    assert runs[-1] == ('finish', 7, 'error', 'ValueError: disk full')
@@ -0,0 +1,71 @@
+from datetime import time
+from database.crud import settings
+from database.crud.settings import SettingsSnapshot
+
+def recorder(snapshot):
+    calls = []
+    snapshot.subscribe(calls.append)
+    return calls
+
+def test_first_load_is_not_a_change():
+    snapshot = SettingsSnapshot()
+    calls = recorder(snapshot)
+    snapshot.replace({'shop_name': 'Шарах'})
+    assert snapshot.loaded and calls == []
+
+def test_reload_notifies_changed_keys_only():
+    snapshot = SettingsSnapshot()
+    calls = recorder(snapshot)
+    snapshot.replace({'a': '1', 'b': '2', 'c': '3'})
+    snapshot.replace({'a': '1', 'b': '20', 'd': '4'})
+    assert calls == [{'b', 'c', 'd'}]
+    snapshot.replace({'a': '1', 'b': '20', 'd': '4'})
+    assert len(calls) == 1
+
+def test_change_after_empty_load_is_notified():
+    snapshot = SettingsSnapshot()
+    calls = recorder(snapshot)
+    snapshot.replace({})
+    snapshot.replace({'booking_bays': '2'})
+    assert calls == [{'booking_bays'}]
+
+def test_local_set_notifies_once():
+    snapshot = SettingsSnapshot()
+    calls = recorder(snapshot)
+    snapshot.replace({'a': '1'})
+    snapshot.set('a', '2')
+    snapshot.set('a', '2')
+    assert calls == [{'a'}]
+    assert snapshot.get('a') == '2'
+
+def test_failing_subscriber_does_not_break_others():
+    snapshot = SettingsSnapshot()
+    def broken(keys):
+        raise RuntimeError("boom")
+    snapshot.subscribe(broken)
+    calls = recorder(snapshot)
+    snapshot.replace({})
+    snapshot.set('x', '1')
+    assert calls == [{'x'}]
+
+def test_typed_accessors():
+    snapshot = SettingsSnapshot()
+    snapshot.replace({
+        'flag': ' Yes ', 'count': '7', 'bad_count': 'seven',
+        'items': 'срочно, важно,, ', 'start': '09:30', 'bad_time': '9h',
+    })
+    assert snapshot.get_bool('flag') is True
+    assert snapshot.get_bool('missing', default=True) is True
+    assert snapshot.get_int('count') == 7 and snapshot.get_int('bad_count', 3) == 3
+    assert snapshot.get_list('items') == ['срочно', 'важно']
+    assert snapshot.get_list('missing', ['x']) == ['x']
+    assert snapshot.get_time('start') == time(9, 30)
+    assert snapshot.get_time('bad_time', time(8)) == time(8)
+    assert snapshot.get('missing', 'default') == 'default'
+
+def test_create_app_does_not_start_listener(monkeypatch):
+    started = []
+    monkeypatch.setattr(settings, 'start_settings_listener', lambda *a, **k: started.append(True))
+    from web.app import create_app
+    create_app()
+    assert started == []
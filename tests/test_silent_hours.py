@@ -0,0 +1,79 @@
+from datetime import datetime, time
+import pytz
+import pytest
+from database.crud.settings import SettingsSnapshot
+from services import silent_hours
+from services.silent_hours import SilentHoursService, _build_rules
+
+SETTINGS = {
+    'silent_hours_enabled': 'true',
+    'silent_hours_start': '22:00',
+    'silent_hours_end': '07:00',
+    'silent_hours_timezone': 'Europe/Moscow',
+    'silent_hours_allow_emergency': 'true',
+    'emergency_keywords': 'срочно, Авария',
+    'emergency_user_ids': '42, -100, abc',
+    'morning_notification_time': '09:00',
+}
+
+def snapshot_of(values):
+    snapshot = SettingsSnapshot()
+    snapshot.replace(values)
+    return snapshot
+
+@pytest.fixture
+def service(monkeypatch):
+    snapshot = snapshot_of(SETTINGS)
+    monkeypatch.setattr(silent_hours, 'get_settings', lambda: snapshot)
+    monkeypatch.setattr(silent_hours, 'subscribe', snapshot.subscribe)
+    svc = SilentHoursService()
+    svc.snapshot = snapshot
+    return svc
+
+def test_overnight_window():
+    rules = _build_rules(snapshot_of(SETTINGS))
+    assert rules.is_silent(time(23, 30)) and rules.is_silent(time(3, 0))
+    assert rules.is_silent(time(22, 0)) and rules.is_silent(time(7, 0))
+    assert not rules.is_silent(time(12, 0))
+
+def test_daytime_window():
+    rules = _build_rules(snapshot_of(dict(SETTINGS, silent_hours_start='13:00', silent_hours_end='15:00')))
+    assert rules.is_silent(time(14, 0))
+    assert not rules.is_silent(time(16, 0)) and not rules.is_silent(time(12, 59))
+
+def test_rules_parsing():
+    rules = _build_rules(snapshot_of(dict(SETTINGS, silent_hours_timezone='Mars/Olympus')))
+    assert rules.tz is pytz.UTC
+    assert rules.emergency_user_ids == frozenset({42, -100})
+    assert rules.keyword_re.search('Это СРОЧНО!') and rules.keyword_re.search('авария на дороге')
+
+def test_disabled_is_never_silent(service):
+    service.snapshot.set('silent_hours_enabled', 'false')
+    tz = service.rules.tz
+    assert not service.is_silent_hours_now(tz.localize(datetime(2026, 10, 18, 23, 0)))
+
+def test_rules_rebuilt_on_settings_change(service):
+    tz = service.rules.tz
+    night = tz.localize(datetime(2026, 10, 18, 23, 0))
+    assert service.is_silent_hours_now(night)
+    service.snapshot.set('silent_hours_start', '23:30')
+    assert not service.is_silent_hours_now(night)
+
+def test_unrelated_setting_keeps_rules(service):
+    rules = service.rules
+    service.snapshot.set('shop_name', 'Шарах')
+    assert service.rules is rules
+
+def test_emergency_by_keyword_or_user(service):
+    assert service.is_emergency_message('Срочно перезвоните', 1)
+    assert service.is_emergency_message('обычный текст', 42)
+    assert not service.is_emergency_message('обычный текст', 7)
+    service.snapshot.set('silent_hours_allow_emergency', 'false')
+    assert not service.is_emergency_message('срочно', 42)
+
+def test_next_morning_in_utc(service):
+    tz = service.rules.tz
+    # 23:00 МСК -> 09:00 МСК следующего дня = 06:00 UTC
+    assert service.calculate_next_morning_time(tz.localize(datetime(2026, 10, 18, 23, 0))) == pytz.UTC.localize(datetime(2026, 10, 19, 6, 0))
+    # 05:00 МСК -> тем же утром
+    assert service.calculate_next_morning_time(tz.localize(datetime(2026, 10, 18, 5, 0))) == pytz.UTC.localize(datetime(2026, 10, 18, 6, 0))
@@ -0,0 +1,203 @@
+import asyncio
+import contextlib
+from datetime import date, datetime, time
+import pytest
+from database.crud_async import appointments
+from services import slots as slots_module
+from services.slots import BookingGrid, SlotEngine, SlotUnavailableError
+from utils.cache import invalidate_occupancy
+
+# 09:00–11:00, шаг 30 минут, два поста
+GRID = BookingGrid(start=540, end=660, step=30, bays=2)
+DAY = date(2031, 3, 10)
+
+def test_grid_size_and_times():
+    assert GRID.size == 4
+    assert [GRID.slot_time(i) for i in range(GRID.size)] == [time(9, 0), time(9, 30), time(10, 0), time(10, 30)]
+    assert BookingGrid(600, 540, 30, 1).size == 0
+
+def test_slots_needed():
+    assert [GRID.slots_needed(d) for d in (0, 1, 30, 31, 60, 90)] == [1, 1, 1, 2, 2, 3]
+
+def test_load_counts_overlapping_appointments():
+    busy = [
+        (540, 60),      # 09:00–10:00
+        (570, 30),      # 09:30–10:00
+        (585, 20),      # 09:45–10:05: задевает два слота
+        (480, 90),      # 08:00–09:30: начинается до сетки
+        (630, 120),     # 10:30–12:30: выходит за сетку
+        (700, 30),      # целиком после сетки
+    ]
+    assert GRID.load(busy) == [2, 3, 1, 1]
+    assert GRID.load([]) == [0, 0, 0, 0]
+
+@pytest.fixture
+def engine(monkeypatch):
+    """SlotEngine on GRID whose database holds `busy[day]`."""
+    busy = {}
+
+    async def fetch_occupancy(date_from, date_to):
+        return {day: intervals for day, intervals in busy.items() if date_from <= day <= date_to}
+    monkeypatch.setattr(slots_module, 'fetch_occupancy', fetch_occupancy)
+    engine = SlotEngine()
+    engine._grid = GRID
+    engine.busy = busy
+    yield engine
+    for day in list(busy) + [DAY]:
+        invalidate_occupancy(day)
+
+def test_free_slots_fit_duration(engine):
+    engine.busy[DAY] = [(540, 30), (540, 30), (600, 30)]   # 09:00 занято полностью, 10:00 — один пост
+    morning = datetime(2031, 3, 9, 12, 0)
+    assert asyncio.run(engine.free_slots(DAY, 30, now=morning)) == [
+        (time(9, 30), 2), (time(10, 0), 1), (time(10, 30), 2)]
+    # 60 минут: нужны два подряд слота, свободных постов — минимум по ним
+    assert asyncio.run(engine.free_slots(DAY, 60, now=morning)) == [(time(9, 30), 1), (time(10, 0), 1)]
+
+def test_free_slots_skip_past_times_today(engine):
+    assert asyncio.run(engine.free_slots(DAY, 30, now=datetime(2031, 3, 10, 9, 40))) == [
+        (time(10, 0), 2), (time(10, 30), 2)]
+    assert asyncio.run(engine.free_slots(DAY, 30, now=datetime(2031, 3, 11, 9, 0))) == []
+
+def test_book_raises_when_full(engine, monkeypatch):
+    calls = []
+
+    async def create_appointment(data, capacity):
+        calls.append((data, capacity))
+        return None
+    monkeypatch.setattr(slots_module, 'create_appointment', create_appointment)
+    with pytest.raises(SlotUnavailableError):
+        asyncio.run(engine.book({'user_id': 1, 'date': DAY, 'time': '09:00'}, duration=60))
+    assert calls == [({'user_id': 1, 'date': DAY, 'time': '09:00', 'duration_minutes': 60}, 2)]
+
+class FakeConnection:
+    """asyncpg connection: `overlap` is what the capacity query reports."""
+
+    def __init__(self, overlap=0, row=None):
+        self.overlap = overlap
+        self.row = row
+        self.queries = []
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def execute(self, query, *args):
+        self.queries.append(' '.join(query.split()))
+
+    async def fetchval(self, query, *args):
+        self.queries.append(' '.join(query.split()))
+        return self.overlap if 'WITH busy' in query else 77
+
+    async def fetchrow(self, query, *args):
+        self.queries.append(' '.join(query.split()))
+        return self.row
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        yield self.conn
+
+@pytest.fixture
+def connection(monkeypatch):
+    conn = FakeConnection()
+
+    async def get_async_pool():
+        return FakePool(conn)
+    monkeypatch.setattr(appointments, 'get_async_pool', get_async_pool)
+    yield conn
+    invalidate_occupancy(DAY)
+
+def locked(conn):
+    return any('pg_advisory_xact_lock' in q for q in conn.queries)
+
+def inserted(conn):
+    return any(q.startswith('INSERT INTO appointments') for q in conn.queries)
+
+APPOINTMENT = {'user_id': 1, 'date': '2031-03-10', 'time': '09:00', 'duration_minutes': 60}
+
+def test_create_checks_capacity_under_lock(connection):
+    connection.overlap = 1
+    assert asyncio.run(appointments.create_appointment(APPOINTMENT, capacity=2)) == 77
+    assert locked(connection) and inserted(connection)
+
+def test_create_refuses_full_slot(connection):
+    connection.overlap = 2
+    assert asyncio.run(appointments.create_appointment(APPOINTMENT, capacity=2)) is None
+    assert not inserted(connection)
+
+def test_create_requires_capacity():
+    with pytest.raises(TypeError):
+        asyncio.run(appointments.create_appointment(APPOINTMENT))
+
+def updated(conn):
+    return any(q.startswith('UPDATE appointments') for q in conn.queries)
+
+def cancelled_row(status='cancelled'):
+    return {'date': DAY, 'time': time(9, 0), 'duration_minutes': 60, 'status': status}
+
+def test_restoring_cancelled_appointment_rechecks_capacity(connection):
+    connection.row, connection.overlap = cancelled_row(), 2
+    assert asyncio.run(appointments.update_appointment_status(5, 'pending', capacity=2)) is False
+    assert locked(connection) and not updated(connection)
+
+    connection.queries.clear()
+    connection.overlap = 1
+    assert asyncio.run(appointments.update_appointment_status(5, 'pending', capacity=2)) is True
+    assert locked(connection) and updated(connection)
+
+def test_status_change_of_active_appointment_needs_no_lock(connection):
+    connection.row, connection.overlap = cancelled_row('pending'), 5
+    assert asyncio.run(appointments.update_appointment_status(5, 'confirmed', capacity=2)) is True
+    assert not locked(connection) and updated(connection)
+
+def test_update_missing_appointment(connection):
+    assert asyncio.run(appointments.update_appointment_status(5, 'pending', capacity=2)) is None
+    assert not updated(connection)
+
+def test_set_status_raises_when_slot_taken(engine, monkeypatch):
+    async def update_status(appointment_id, status, capacity, admin_comment=None):
+        return False
+    monkeypatch.setattr(slots_module, 'update_status', update_status)
+    with pytest.raises(SlotUnavailableError):
+        asyncio.run(engine.set_status(5, 'pending'))
+
+
+FULL = [(540, 120), (540, 120)]     # оба поста заняты весь день
+
+def test_day_load_full_by_capacity_not_clock(engine):
+    evening = datetime(2031, 3, 10, 18, 0)
+    past = engine._day_load(date(2031, 3, 9), [(540, 30)], evening)
+    assert (past.free_slots, past.open_slots, past.slots) == (0, 4, 4)
+    assert not past.full                        # прошедший день, но места были
+    today = engine._day_load(DAY, [], evening)
+    assert today.free_slots == 0 and not today.full
+    booked = engine._day_load(DAY, FULL, datetime(2031, 3, 1))
+    assert (booked.free_slots, booked.open_slots) == (0, 0) and booked.full
+
+def test_day_load_counts_remaining_slots_today(engine):
+    load = engine._day_load(DAY, [(600, 30), (600, 30)], datetime(2031, 3, 10, 9, 10))
+    # 09:00 уже началось, 10:00 занято
+    assert (load.free_slots, load.open_slots) == (2, 3)
+    assert load.as_dict() == {'date': '2031-03-10', 'appointments': 2, 'free_slots': 2,
+                              'open_slots': 3, 'slots': 4, 'full': False}
+
+def test_calendar_and_full_days(engine):
+    engine.busy[DAY] = FULL
+    morning = datetime(2031, 3, 9, 8, 0)
+    days = asyncio.run(engine.calendar(date(2031, 3, 9), DAY, now=morning))
+    assert [(d.date, d.appointments, d.free_slots, d.full) for d in days] == [
+        (date(2031, 3, 9), 0, 4, False), (DAY, 2, 0, True)]
+    assert asyncio.run(engine.full_days(date(2031, 3, 9), DAY)) == frozenset({DAY})
+    invalidate_occupancy(date(2031, 3, 9))
+
+def test_calendar_with_explicit_now_is_not_cached(engine):
+    day = date(2031, 3, 12)
+    engine.busy[day] = []
+    late = asyncio.run(engine.calendar(day, day, now=datetime(2031, 3, 12, 23, 0)))
+    assert late[0].free_slots == 0
+    current = asyncio.run(engine.calendar(day, day, now=datetime(2031, 3, 12, 8, 0)))
+    assert current[0].free_slots == 4
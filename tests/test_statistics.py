@@ -0,0 +1,51 @@
+from contextlib import contextmanager
+from datetime import date
+from database.crud import statistics
+
+class FakeCursor:
+    def __init__(self, row=None, rows=()):
+        self.row = row
+        self.rows = list(rows)
+        self.executed = []
+
+    def execute(self, query, params=None):
+        self.executed.append((query, params))
+
+    def fetchone(self):
+        return self.row
+
+    def fetchall(self):
+        return self.rows
+
+def use_cursor(monkeypatch, cur):
+    @contextmanager
+    def read():
+        yield cur
+    monkeypatch.setattr(statistics, 'read', read)
+
+def test_summary_is_one_query(monkeypatch):
+    cur = FakeCursor(row=(120, 4, 7, 350, 2, 99000, 12, 40))
+    use_cursor(monkeypatch, cur)
+    summary = statistics.get_stats_summary()
+    assert summary['users_total'] == 350
+    assert summary['monthly_revenue'] == 99000
+    assert len(cur.executed) == 1
+    query, params = cur.executed[0]
+    assert 'FROM daily_stats' in query
+    assert params['month_start'] == params['today'].replace(day=1)
+
+def test_dashboard_stats_keys(monkeypatch):
+    use_cursor(monkeypatch, FakeCursor(row=(120, 4, 7, 350, 2, 99000, 12, 40)))
+    assert statistics.get_dashboard_stats() == {
+        'today_appointments': 4,
+        'pending_appointments': 7,
+        'total_users': 350,
+        'monthly_revenue': 99000,
+    }
+
+def test_appointments_series(monkeypatch):
+    use_cursor(monkeypatch, FakeCursor(rows=[(date(2026, 10, 1), 3), (date(2026, 10, 2), 5)]))
+    assert statistics.get_appointments_stats() == [
+        {'date': '2026-10-01', 'count': 3},
+        {'date': '2026-10-02', 'count': 5},
+    ]
@@ -0,0 +1,87 @@
+import asyncio
+from datetime import date
+from decimal import Decimal
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+from bot import storage as storage_module
+from bot.storage import LocalBackend, KeyValueStorage, create_fsm_storage
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(storage_module.time, 'monotonic', clock)
+    return clock
+
+def run(coro):
+    return asyncio.run(coro)
+
+KEY = StorageKey(bot_id=1, chat_id=2, user_id=3)
+
+def test_local_set_get_delete(clock):
+    backend = LocalBackend()
+    run(backend.write({'a': b'1', 'b': b'2'}))
+    assert run(backend.get('a')) == b'1'
+    run(backend.write({'c': b'3'}, delete_keys=['a']))
+    assert run(backend.get('a')) is None
+    assert run(backend.get('b')) == b'2' and run(backend.get('c')) == b'3'
+
+def test_local_ttl_expiry(clock):
+    backend = LocalBackend()
+    run(backend.write({'a': b'1'}, ttl=10))
+    run(backend.write({'forever': b'1'}))
+    clock.now += 9.9
+    assert run(backend.get('a')) == b'1'
+    clock.now += 0.1
+    assert run(backend.get('a')) is None
+    assert run(backend.get('forever')) == b'1'
+
+def test_local_write_touches_in_same_call(clock):
+    backend = LocalBackend()
+    run(backend.write({'state': b's'}, ttl=10))
+    clock.now += 8
+    run(backend.write({'data': b'd'}, touch_keys=['state', 'missing'], ttl=10))
+    clock.now += 8
+    assert run(backend.get('state')) == b's'
+    assert run(backend.get('data')) == b'd'
+    assert run(backend.get('missing')) is None
+
+def test_local_sweeps_expired_keys(clock):
+    backend = LocalBackend()
+    backend.SWEEP_EVERY = 2
+    run(backend.write({'old': b'1'}, ttl=1))
+    clock.now += 2
+    run(backend.write({'new': b'1'}))
+    assert 'old' not in backend._data
+
+def test_storage_state_and_data_share_ttl(clock):
+    storage = KeyValueStorage(LocalBackend(), ttl=60)
+    run(storage.set_state(KEY, 'Booking:choosing_date'))
+    run(storage.set_data(KEY, {'service_name': 'Шиномонтаж', 'duration': 30}))
+    assert run(storage.get_state(KEY)) == 'Booking:choosing_date'
+    assert run(storage.get_data(KEY)) == {'service_name': 'Шиномонтаж', 'duration': 30}
+    clock.now += 61
+    assert run(storage.get_state(KEY)) is None
+    assert run(storage.get_data(KEY)) == {}
+
+def test_storage_clears_state_and_empty_data(clock):
+    storage = create_fsm_storage()
+    run(storage.set_state(KEY, 'Booking:choosing_time'))
+    run(storage.set_data(KEY, {'date': '2026-10-18'}))
+    run(storage.set_state(KEY, None))
+    run(storage.set_data(KEY, {}))
+    assert run(storage.get_state(KEY)) is None
+    assert run(storage.get_data(KEY)) == {}
+    assert storage.backend._data == {}
+
+@pytest.mark.parametrize('value', [date(2026, 10, 18), Decimal('1.5'), {1, 2}])
+def test_storage_rejects_non_json_values(clock, value):
+    storage = create_fsm_storage()
+    with pytest.raises(TypeError):
+        run(storage.set_data(KEY, {'value': value}))
@@ -0,0 +1,131 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from aiogram.types import CallbackQuery
+from bot.middlewares import throttling
+from bot.middlewares.throttling import LocalBucketStore, ThrottleRule, ThrottlingMiddleware, create_bucket_store
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(throttling.time, 'monotonic', clock)
+    return clock
+
+def take(store, *buckets):
+    return asyncio.run(store.take(list(buckets)))
+
+RULE = ThrottleRule(rate=1.0, burst=3)
+
+def test_burst_then_refill(clock):
+    store = LocalBucketStore()
+    assert [take(store, ('u:1', RULE)) for _ in range(3)] == [0, 0, 0]
+    assert take(store, ('u:1', RULE)) == pytest.approx(1.0)
+    clock.now += 0.5
+    assert take(store, ('u:1', RULE)) == pytest.approx(0.5)     # отказ не списывает токен
+    clock.now += 0.5
+    assert take(store, ('u:1', RULE)) == 0
+    assert take(store, ('u:2', RULE)) == 0                      # у другого пользователя своя корзина
+
+def test_take_is_all_or_nothing(clock):
+    store = LocalBucketStore()
+    chat = ThrottleRule(rate=1.0, burst=1)
+    assert take(store, ('u:1', RULE), ('chat:9', chat)) == 0
+    # Чат исчерпан: токен пользователя тоже не тратится
+    assert take(store, ('u:1', RULE), ('chat:9', chat)) == pytest.approx(1.0)
+    assert take(store, ('u:1', RULE), ('chat:9', chat)) == pytest.approx(1.0)
+    assert take(store, ('u:1', RULE)) == 0
+    assert take(store, ('u:1', RULE)) == 0
+    assert take(store, ('u:1', RULE)) > 0
+
+def test_sweep_frees_refilled_buckets(clock):
+    store = LocalBucketStore()
+    for user_id in range(10):
+        take(store, (f'u:{user_id}', RULE))
+    assert len(store) == 10
+    size = len(store._keys)
+    clock.now += RULE.burst / RULE.rate     # все корзины снова полные
+    # Стрелка проходит SWEEP_STEP слотов за вызов
+    for _ in range(size // store.SWEEP_STEP + 1):
+        take(store, ('u:active', RULE))
+    assert set(store._index) == {'u:active'}
+    assert len(store._keys) == size
+
+def test_sweep_keeps_buckets_that_are_not_full(clock):
+    store = LocalBucketStore()
+    take(store, ('u:1', RULE))
+    size = len(store._keys)
+    clock.now += 0.5
+    for _ in range(size // store.SWEEP_STEP + 1):
+        take(store, ('u:2', ThrottleRule(rate=100, burst=100)))
+    assert 'u:1' in store._index
+
+def test_freed_slots_are_reused(clock):
+    store = LocalBucketStore()
+    store.INITIAL_SIZE = 4
+    for user_id in range(4):
+        take(store, (f'u:{user_id}', RULE))
+    assert len(store._keys) == 4
+    clock.now += 10
+    # Два вызова активного пользователя обходят все 4 слота и освобождают три полных корзины
+    take(store, ('u:0', RULE))
+    take(store, ('u:0', RULE))
+    assert len(store) == 1
+    for user_id in range(4, 7):
+        take(store, (f'u:{user_id}', RULE))
+    assert len(store._keys) == 4            # новые корзины заняли освободившиеся слоты
+    assert len(store) == 4
+    take(store, ('u:7', RULE))
+    assert len(store) == 5 and len(store._keys) == 8
+
+def test_create_bucket_store_default_is_local():
+    assert isinstance(create_bucket_store(''), LocalBucketStore)
+
+def context(user_id=1, chat_id=None, flag=None):
+    data = {'event_from_user': SimpleNamespace(id=user_id),
+            'handler': SimpleNamespace(flags={} if flag is None else {'throttling': flag})}
+    if chat_id is not None:
+        data['event_chat'] = SimpleNamespace(id=chat_id)
+    return data
+
+def test_rule_selection():
+    middleware = ThrottlingMiddleware(rules={'message': ThrottleRule(2, 4)})
+    rules = middleware.rules
+    assert middleware._buckets(object(), context()) == [('message:u:1', ThrottleRule(2, 4))]
+    callback = CallbackQuery.model_construct(id='1')
+    assert middleware._buckets(callback, context()) == [('callback_query:u:1', rules['callback_query'])]
+    assert middleware._buckets(object(), context(flag='booking')) == [('booking:u:1', rules['booking'])]
+    assert middleware._buckets(object(), context(flag='unknown')) == [('unknown:u:1', rules['message'])]
+    custom = ThrottleRule(0.5, 2)
+    assert middleware._buckets(object(), context(flag=custom)) == [('custom:0.5:2:u:1', custom)]
+    assert middleware._buckets(object(), context(flag=False)) is None
+    assert middleware._buckets(object(), {'event_from_user': None}) is None
+
+def test_group_chat_adds_shared_bucket():
+    middleware = ThrottlingMiddleware()
+    assert middleware._buckets(object(), context(user_id=1, chat_id=1)) == [
+        ('message:u:1', middleware.rules['message'])]
+    assert middleware._buckets(object(), context(user_id=1, chat_id=-100)) == [
+        ('message:u:1', middleware.rules['message']), ('chat:-100', middleware.rules['chat'])]
+
+class FailingStore(LocalBucketStore):
+    async def take(self, buckets):
+        raise ConnectionError('redis is down')
+
+def test_middleware_blocks_and_fails_open(clock):
+    handled = []
+
+    async def handler(event, data):
+        handled.append(event)
+        return 'ok'
+    middleware = ThrottlingMiddleware(rules={'message': ThrottleRule(rate=1, burst=1)})
+    assert asyncio.run(middleware(handler, 'first', context())) == 'ok'
+    assert asyncio.run(middleware(handler, 'second', context())) is None
+    assert handled == ['first']
+    assert asyncio.run(ThrottlingMiddleware(store=FailingStore())(handler, 'third', context())) == 'ok'
@@ -0,0 +1,45 @@
+import pytest
+from database import connection
+from database.connection import BoundedConnectionPool, transaction, read
+from tests.test_connection_pool import connect  # noqa: F401 (fixture)
+
+@pytest.fixture
+def db_pool(connect, monkeypatch):
+    p = BoundedConnectionPool(0, 1)
+    monkeypatch.setattr(connection, 'connection_pool', p)
+    return p
+
+def test_commits_and_returns_connection(db_pool, connect):
+    with transaction() as cur:
+        cur.execute("UPDATE users SET notes = ''")
+    conn = connect[0]
+    assert conn.commits == 1 and conn.rollbacks == 0
+    assert db_pool.stats()['in_use'] == 0
+
+def test_rolls_back_on_error(db_pool, connect):
+    with pytest.raises(RuntimeError):
+        with transaction() as cur:
+            cur.execute("DELETE FROM users")
+            raise RuntimeError("boom")
+    conn = connect[0]
+    assert conn.commits == 0 and conn.rollbacks == 1
+    assert db_pool.stats()['in_use'] == 0
+    assert not conn.closed
+
+def test_closes_connection_when_rollback_fails(db_pool, connect):
+    def broken_rollback():
+        raise OSError("server closed the connection")
+    with pytest.raises(RuntimeError):
+        with transaction():
+            connect[0].rollback = broken_rollback
+            raise RuntimeError("boom")
+    assert connect[0].closed
+    assert db_pool.stats()['size'] == 0
+
+def test_session_mode_is_reset(db_pool, connect):
+    with read():
+        assert connect[0].readonly is True
+    with transaction(autocommit=True):
+        assert connect[0].autocommit is True
+    assert connect[0].commits == 1      # только read(), autocommit без COMMIT
+    assert connect[0].readonly is None and connect[0].autocommit is False
@@ -0,0 +1,48 @@
+import asyncio
+from datetime import date
+from database.crud_async import users
+from database.crud_async.users import user_segment_sql
+
+class KeysetPool:
+    """Fake asyncpg pool answering the keyset query from a sorted list of IDs."""
+
+    def __init__(self, user_ids):
+        self.user_ids = sorted(user_ids)
+        self.calls = []
+
+    async def fetch(self, query, last_id, limit, *args):
+        self.calls.append((last_id, limit, args))
+        return [{'user_id': uid} for uid in self.user_ids if uid > last_id][:limit]
+
+def collect(monkeypatch, pool, **kwargs):
+    async def get_async_pool():
+        return pool
+    monkeypatch.setattr(users, 'get_async_pool', get_async_pool)
+
+    async def run():
+        return [batch async for batch in users.iter_user_id_batches(**kwargs)]
+    return asyncio.run(run())
+
+def test_batches_cover_all_users_in_order(monkeypatch):
+    pool = KeysetPool([5, 1, 9, 3, 7, 2, 8])
+    batches = collect(monkeypatch, pool, batch_size=3)
+    assert batches == [[1, 2, 3], [5, 7, 8], [9]]
+    assert [last_id for last_id, _, _ in pool.calls] == [0, 3, 8]
+
+def test_exact_multiple_needs_one_empty_query(monkeypatch):
+    pool = KeysetPool([1, 2, 3, 4])
+    assert collect(monkeypatch, pool, batch_size=2) == [[1, 2], [3, 4]]
+    assert len(pool.calls) == 3
+
+def test_segment_args_follow_keyset_args(monkeypatch):
+    pool = KeysetPool([1])
+    collect(monkeypatch, pool, registered_after=date(2026, 1, 1), vehicle_type_id=2)
+    assert pool.calls[0][2] == (date(2026, 1, 1), 2)
+
+def test_segment_sql_placeholders():
+    where, args = user_segment_sql(3, has_appointments=False, registered_after='2026-01-01', vehicle_type_id=4)
+    assert args == ['2026-01-01', 4]
+    assert 'NOT EXISTS (SELECT 1 FROM appointments' in where
+    assert 'u.created_at >= $3::date' in where
+    assert 'm.vehicle_type_id = $4' in where
+    assert user_segment_sql(2) == ('', [])
@@ -0,0 +1,60 @@
+import asyncio
+from aiogram.types import Message, ReplyKeyboardMarkup
+from utils import cache
+from utils.cache import UserContext, set_user_context, peek_user_context
+from bot.middlewares.auth import AuthMiddleware
+from bot.keyboards.common import get_main_menu
+from services.user_contexts import UserContextListener
+
+def fake_brief(monkeypatch, rows):
+    calls = []
+    async def get_user_brief(user_id):
+        calls.append(user_id)
+        return rows.get(user_id)
+    monkeypatch.setattr('database.crud_async.users.get_user_brief', get_user_brief)
+    return calls
+
+def test_context_is_read_once_and_cached(monkeypatch):
+    cache.clear_user_contexts()
+    calls = fake_brief(monkeypatch, {10: {'is_admin': True, 'phone': '+7'}})
+    first = asyncio.run(cache.get_user_context(10))
+    second = asyncio.run(cache.get_user_context(10))
+    assert first == second == UserContext(registered=True, is_admin=True, phone='+7')
+    assert calls == [10]
+
+def test_unknown_user_is_not_registered(monkeypatch):
+    cache.clear_user_contexts()
+    fake_brief(monkeypatch, {})
+    assert asyncio.run(cache.get_user_context(11)) == UserContext(registered=False)
+
+def test_middleware_injects_context():
+    cache.clear_user_contexts()
+    set_user_context(12, UserContext(registered=True))
+    event = Message.model_construct(from_user=type('U', (), {'id': 12})())
+
+    seen = {}
+    async def handler(event, data):
+        seen.update(data)
+    asyncio.run(AuthMiddleware()(handler, event, {}))
+    assert seen['user_ctx'] == UserContext(registered=True)
+    assert seen['is_registered'] is True
+
+def test_main_menu_uses_cached_context(monkeypatch):
+    cache.clear_user_contexts()
+    calls = fake_brief(monkeypatch, {})
+    set_user_context(13, UserContext(registered=True))
+    registered = asyncio.run(get_main_menu(13))
+    guest = asyncio.run(get_main_menu())
+    assert isinstance(registered, ReplyKeyboardMarkup)
+    assert len(registered.keyboard) == 2 and len(guest.keyboard) == 1
+    assert asyncio.run(get_main_menu(13)) is registered
+    assert calls == []
+
+def test_notification_drops_context():
+    cache.clear_user_contexts()
+    set_user_context(14, UserContext(registered=True))
+    set_user_context(15, UserContext(registered=True))
+    listener = UserContextListener()
+    listener._on_notify(None, 0, 'user_changed', '14')
+    assert peek_user_context(14) is None
+    assert peek_user_context(15) is not None
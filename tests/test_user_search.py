@@ -0,0 +1,45 @@
+from contextlib import contextmanager
+from database.crud import users
+
+def test_like_wildcards_are_escaped():
+    assert users._escape_like('50%_off\\') == '50\\%\\_off\\\\'
+
+def test_name_search_uses_trigram_columns_only():
+    condition, params = users._search_condition('  Иван ')
+    assert condition == "(u.username ILIKE %s OR u.full_name ILIKE %s)"
+    assert params == ['%Иван%', '%Иван%']
+
+def test_phone_like_term_also_matches_digits():
+    condition, params = users._search_condition('900-12')
+    assert 'u.phone_digits LIKE %s' in condition
+    assert params[-1] == '%90012%'
+    # Пара цифр в имени не превращает поиск в поиск по телефону
+    assert 'phone_digits' not in users._search_condition('user1990abc')[0]
+    assert 'phone_digits' not in users._search_condition('12')[0]
+
+def test_empty_term_skips_query(monkeypatch):
+    @contextmanager
+    def read():
+        raise AssertionError("no query expected")
+        yield
+    monkeypatch.setattr(users, 'read', read)
+    assert users.search_users('   ') == []
+    assert users.search_users(None) == []
+
+def test_search_returns_ranked_rows(monkeypatch):
+    executed = []
+
+    class Cursor:
+        def execute(self, query, params):
+            executed.append(params)
+
+        def fetchall(self):
+            return [(1, 'ivan', 'Иван Петров', '+79001234567', 1.4)]
+
+    @contextmanager
+    def read():
+        yield Cursor()
+    monkeypatch.setattr(users, 'read', read)
+    found = users.search_users('ivan', limit=5)
+    assert found[0]['user_id'] == 1 and found[0]['full_name'] == 'Иван Петров'
+    assert executed[0][0] == 'ivan%' and executed[0][-1] == 5
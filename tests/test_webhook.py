@@ -0,0 +1,107 @@
+import asyncio
+import json
+import pytest
+from bot import webhook
+from bot.webhook import WebhookApp
+
+UPDATE = json.dumps({'update_id': 1}).encode()
+SECRET = 's3cret'
+
+def http_scope(path='/webhook', method='POST', secret=SECRET):
+    headers = [(b'content-type', b'application/json')]
+    if secret is not None:
+        headers.append((b'x-telegram-bot-api-secret-token', secret.encode()))
+    return {'type': 'http', 'path': path, 'method': method, 'headers': headers}
+
+def call(app, scope, body=UPDATE, chunks=1):
+    """Run one request through the ASGI app, return the response status."""
+    size = -(-len(body) // chunks) if body else 0
+    parts = [body[i:i + size] for i in range(0, len(body), size)] if body else [b'']
+    messages = [{'type': 'http.request', 'body': part, 'more_body': i < len(parts) - 1}
+                for i, part in enumerate(parts)]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    async def run():
+        if app.queue is None:
+            app.queue = asyncio.Queue(maxsize=app.queue_size)
+        await app(scope, receive, send)
+    asyncio.run(run())
+    return sent[0]['status']
+
+def make_app(**kwargs):
+    kwargs.setdefault('secret_token', SECRET)
+    return WebhookApp(dispatcher=None, bot=None, path='/webhook', **kwargs)
+
+def test_accepts_and_queues_update():
+    app = make_app()
+    assert call(app, http_scope()) == 200
+    assert app.queue.qsize() == 1
+    assert app.queue.get_nowait().update_id == 1
+
+def test_reassembles_chunked_body():
+    app = make_app()
+    assert call(app, http_scope(), chunks=3) == 200
+
+def test_checks_secret_token():
+    app = make_app()
+    assert call(app, http_scope(secret='wrong')) == 401
+    assert call(app, http_scope(secret=None)) == 401
+    assert call(app, http_scope()) == 200
+    assert app.queue.qsize() == 1
+
+def test_refuses_to_run_without_secret():
+    with pytest.raises(ValueError, match='WEBHOOK_SECRET'):
+        make_app(secret_token=None)
+    with pytest.raises(ValueError):
+        make_app(secret_token='')
+
+def test_generates_and_registers_secret():
+    class FakeBot:
+        async def set_webhook(self, url, **kwargs):
+            self.registered = (url, kwargs['secret_token'])
+
+    class FakeDispatcher:
+        workflow_data = {}
+
+        async def emit_startup(self, **kwargs):
+            pass
+
+        def resolve_used_update_types(self):
+            return ['message']
+
+    bot = FakeBot()
+    app = WebhookApp(FakeDispatcher(), bot, path='/webhook', url='https://bot.example', workers=0)
+    assert len(app.secret_token) >= 32
+    assert app.secret_token != WebhookApp(FakeDispatcher(), bot, path='/webhook', url='https://bot.example').secret_token
+    asyncio.run(app.startup())
+    assert bot.registered == ('https://bot.example/webhook', app.secret_token)
+    assert call(app, http_scope(secret=None)) == 401
+    assert call(app, http_scope(secret=app.secret_token)) == 200
+
+def test_rejects_bad_requests(monkeypatch):
+    app = make_app()
+    assert call(app, http_scope(method='GET'), body=b'') == 405
+    assert call(app, http_scope(), body=b'{not json') == 400
+    monkeypatch.setattr(webhook, 'MAX_UPDATE_SIZE', 4)
+    assert call(app, http_scope()) == 413
+
+def test_full_queue_returns_503():
+    app = make_app(queue_size=1)
+    assert call(app, http_scope()) == 200
+    assert call(app, http_scope()) == 503
+
+def test_other_paths_go_to_fallback():
+    seen = []
+    async def fallback(scope, receive, send):
+        seen.append(scope['path'])
+        await send({'type': 'http.response.start', 'status': 302, 'headers': []})
+    app = make_app(fallback=fallback)
+    assert call(app, http_scope(path='/login', method='GET')) == 302
+    assert seen == ['/login']
+    assert call(make_app(), http_scope(path='/login', method='GET')) == 404
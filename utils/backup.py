@@ -1,189 +1,408 @@
 import os
-import subprocess
+import asyncio
+import hashlib
 import datetime
-import gzip
+import time
+import zlib
 import shutil
 from pathlib import Path
-from database.connection import get_db_connection
+from database.connection import transaction, read
+from database.crud.backups import delete_backup_records
+from config import Config
 import logging
 
+try:
+    import zstandard
+except ImportError:  # нужен только при BACKUP_FORMAT=zstd
+    zstandard = None
+
 logger = logging.getLogger(__name__)
 
+CHUNK_SIZE = 1024 * 1024            # читаем вывод pg_dump по 1 МБ
+PROGRESS_EVERY = 64 * 1024 * 1024   # пишем в лог каждые 64 МБ дампа
+STDERR_LIMIT = 64 * 1024
+
+# Формат -> расширение файла
+BACKUP_FORMATS = {
+    'gzip': '.sql.gz',
+    'zstd': '.sql.zst',
+    'directory': '.dump',   # pg_dump -Fd: каталог, сжимает и пишет в несколько потоков сам pg_dump
+}
+
+class BackupError(Exception):
+    pass
+
+def _compressor(fmt, level):
+    """Streaming compressor with compress()/flush() for the plain SQL formats."""
+    if fmt == 'zstd':
+        if zstandard is None:
+            raise BackupError("BACKUP_FORMAT=zstd, but the 'zstandard' package is not installed")
+        return zstandard.ZstdCompressor(level=level).compressobj()
+    return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # формат gzip
+
+class _CompressedSink:
+    """Compresses chunks into a file and hashes what is written (runs in a worker thread)."""
+
+    def __init__(self, path, fmt, level):
+        self.file = open(path, 'wb')
+        self.compressor = _compressor(fmt, level)
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def _write(self, data):
+        if data:
+            self.file.write(data)
+            self.sha256.update(data)
+            self.size += len(data)
+
+    def write(self, chunk):
+        self._write(self.compressor.compress(chunk))
+
+    def close(self):
+        self._write(self.compressor.flush())
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+class _DecompressedSource:
+    """Reads a .sql/.sql.gz/.sql.zst backup as a stream of decompressed chunks (in a worker thread)."""
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        suffix = Path(path).suffix
+        if suffix == '.gz':
+            self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif suffix == '.zst':
+            if zstandard is None:
+                raise BackupError("Backup is zstd-compressed, but the 'zstandard' package is not installed")
+            self.decompressor = zstandard.ZstdDecompressor().decompressobj()
+        else:
+            self.decompressor = None
+
+    def read(self):
+        """Next non-empty decompressed chunk, b'' at the end."""
+        while True:
+            block = self.file.read(CHUNK_SIZE)
+            if not block:
+                if self.decompressor is not None and hasattr(self.decompressor, 'flush'):
+                    return self.decompressor.flush()
+                return b''
+            data = self.decompressor.decompress(block) if self.decompressor is not None else block
+            if data:
+                return data
+
+    def close(self):
+        self.file.close()
+
+def _directory_checksum(path):
+    """sha256 over all files of a directory-format dump (names and contents, sorted) and total size."""
+    sha256 = hashlib.sha256()
+    size = 0
+    for file in sorted(p for p in Path(path).rglob('*') if p.is_file()):
+        sha256.update(file.relative_to(path).as_posix().encode())
+        with open(file, 'rb') as f:
+            for block in iter(lambda: f.read(CHUNK_SIZE), b''):
+                sha256.update(block)
+                size += len(block)
+    return sha256.hexdigest(), size
+
+def file_checksum(path):
+    """sha256 of a backup file or directory (the value stored in backups.checksum)."""
+    path = Path(path)
+    if path.is_dir():
+        return _directory_checksum(path)[0]
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
 class BackupManager:
-    def __init__(self, db_config, backup_dir='backups'):
+    def __init__(self, db_config, backup_dir=None, fmt=None, level=None, jobs=None, timeout=None):
         """
         db_config: dict with keys host, port, user, password, database
-        backup_dir: root directory for backups
+        backup_dir: root directory for backups (backups/YYYY/MM/...)
+        fmt: 'gzip', 'zstd' or 'directory' (see BACKUP_FORMATS)
         """
         self.db_config = db_config
-        self.backup_dir = Path(backup_dir)
+        self.backup_dir = Path(backup_dir or Config.BACKUP_DIR)
         self.backup_dir.mkdir(exist_ok=True)
-        self.today = datetime.datetime.now()
-        self.year_dir = self.backup_dir / str(self.today.year)
-        self.month_dir = self.year_dir / f"{self.today.month:02d}"
-        self.month_dir.mkdir(parents=True, exist_ok=True)
+        self.format = fmt or Config.BACKUP_FORMAT
+        if self.format not in BACKUP_FORMATS:
+            raise BackupError(f"Unknown backup format: {self.format}")
+        self.level = level if level is not None else Config.BACKUP_COMPRESSION_LEVEL
+        self.jobs = jobs or Config.BACKUP_JOBS
+        self.timeout = timeout or Config.BACKUP_TIMEOUT
 
-    def create_backup(self, backup_type='manual', user_id=None, comment=''):
-        """
-        Create a database backup.
-        Returns backup info dict or None on failure.
-        """
-        timestamp = self.today.strftime('%Y%m%d_%H%M%S')
-        filename = f"backup_{timestamp}.sql"
-        filepath = self.month_dir / filename
+    @classmethod
+    def from_config(cls):
+        """Manager for the application database (Config.DB_*)."""
+        return cls({
+            'host': Config.DB_HOST,
+            'port': Config.DB_PORT,
+            'database': Config.DB_NAME,
+            'user': Config.DB_USER,
+            'password': Config.DB_PASSWORD
+        })
+
+    def _month_dir(self, moment):
+        month_dir = self.backup_dir / str(moment.year) / f"{moment.month:02d}"
+        month_dir.mkdir(parents=True, exist_ok=True)
+        return month_dir
+
+    def _env(self):
+        env = os.environ.copy()
+        env['PGPASSWORD'] = self.db_config['password']
+        return env
 
-        dump_cmd = [
-            'pg_dump',
+    def _connection_args(self):
+        return [
             '-h', self.db_config['host'],
             '-p', str(self.db_config['port']),
             '-U', self.db_config['user'],
             '-d', self.db_config['database'],
-            '--clean',
-            '--if-exists',
-            '-f', str(filepath)
         ]
 
-        env = os.environ.copy()
-        env['PGPASSWORD'] = self.db_config['password']
+    async def create_backup(self, backup_type='manual', user_id=None, comment='', progress=None):
+        """
+        Create a database backup without blocking the event loop.
+
+        pg_dump runs as an async subprocess; its output is compressed on the
+        fly into `<name>.part`, which is renamed only after pg_dump succeeds,
+        so a half-written file never looks like a backup and no uncompressed
+        copy touches the disk. progress(bytes_dumped) is called as data flows.
+        Returns backup info dict or None on failure.
+        """
+        started_at = datetime.datetime.now()
+        filename = f"backup_{started_at.strftime('%Y%m%d_%H%M%S')}{BACKUP_FORMATS[self.format]}"
+        filepath = self._month_dir(started_at) / filename
+        part_path = filepath.with_name(filepath.name + '.part')
+        relpath = str(filepath.relative_to(self.backup_dir.parent))
 
+        backup_id = await asyncio.to_thread(
+            self._save_backup_record, filename=filename, filepath=relpath, backup_type=backup_type,
+            user_id=user_id, status='in_progress', comment=comment, backup_format=self.format
+        )
+        started = time.monotonic()
         try:
-            logger.info(f"Creating backup: {filename}")
-            result = subprocess.run(dump_cmd, env=env, capture_output=True, text=True, timeout=300)
-            if result.returncode != 0:
-                raise Exception(f"pg_dump error: {result.stderr}")
-
-            # Compress
-            compressed_path = self._compress_file(filepath)
-            filesize = compressed_path.stat().st_size
-
-            # Save record in DB
-            backup_id = self._save_backup_record(
-                filename=compressed_path.name,
-                filepath=str(compressed_path.relative_to(self.backup_dir.parent)),
-                filesize=filesize,
-                backup_type=backup_type,
-                user_id=user_id,
-                comment=comment
-            )
-
-            logger.info(f"Backup created: {compressed_path}, size: {filesize} bytes")
+            logger.info(f"Creating backup: {filename} ({self.format})")
+            async with asyncio.timeout(self.timeout):
+                if self.format == 'directory':
+                    checksum, filesize = await self._dump_directory(part_path)
+                else:
+                    checksum, filesize = await self._dump_stream(part_path, progress)
+            await asyncio.to_thread(os.replace, part_path, filepath)
+            duration = time.monotonic() - started
+            await asyncio.to_thread(self._finish_backup_record, backup_id, 'completed',
+                                    filesize=filesize, checksum=checksum)
+            logger.info(f"Backup created: {filepath}, size: {filesize} bytes, {duration:.1f}s")
             return {
                 'id': backup_id,
-                'filename': compressed_path.name,
-                'filepath': str(compressed_path),
+                'filename': filename,
+                'filepath': str(filepath),
                 'filesize': filesize,
-                'created_at': self.today
+                'checksum': checksum,
+                'created_at': started_at
             }
         except Exception as e:
-            logger.error(f"Backup failed: {e}")
-            self._save_backup_record(
-                filename=filename,
-                filepath=str(filepath),
-                status='failed',
-                comment=str(e)
-            )
+            error = 'timeout' if isinstance(e, TimeoutError) else str(e)
+            logger.error(f"Backup failed: {error}")
+            await asyncio.to_thread(self._remove_path, part_path)
+            try:
+                await asyncio.to_thread(self._finish_backup_record, backup_id, 'failed', comment=error)
+            except Exception as record_error:
+                logger.error(f"Cannot mark backup {backup_id} as failed: {record_error}")
             return None
 
-    def _compress_file(self, filepath):
-        """Compress a file with gzip and remove original."""
-        compressed_path = filepath.with_suffix('.sql.gz')
-        with open(filepath, 'rb') as f_in:
-            with gzip.open(compressed_path, 'wb') as f_out:
-                shutil.copyfileobj(f_in, f_out)
-        filepath.unlink()
-        return compressed_path
+    async def _dump_stream(self, part_path, progress=None):
+        """pg_dump (plain SQL) -> streaming compressor -> part_path. Returns (sha256, size)."""
+        cmd = ['pg_dump', *self._connection_args(), '--clean', '--if-exists']
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, env=self._env(), stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        stderr_task = asyncio.create_task(_read_limited(proc.stderr))
+        sink = None
+        try:
+            sink = await asyncio.to_thread(_CompressedSink, part_path, self.format, self.level)
+            dumped = next_report = 0
+            while True:
+                chunk = await proc.stdout.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                # Сжатие и запись — в потоке, чтобы не занимать event loop
+                await asyncio.to_thread(sink.write, chunk)
+                dumped += len(chunk)
+                if dumped >= next_report:
+                    next_report = dumped + PROGRESS_EVERY
+                    logger.info(f"Backup progress: {dumped // (1024 * 1024)} MB dumped, "
+                                f"{sink.size // (1024 * 1024)} MB written")
+                if progress:
+                    progress(dumped)
+            await asyncio.to_thread(sink.close)
+            returncode = await proc.wait()
+            stderr = await stderr_task
+            if returncode != 0:
+                raise BackupError(f"pg_dump error: {stderr}")
+            return sink.sha256.hexdigest(), sink.size
+        except BaseException:
+            await _kill(proc)
+            stderr_task.cancel()
+            if sink is not None and not sink.file.closed:
+                sink.file.close()
+            raise
+
+    async def _dump_directory(self, part_path):
+        """pg_dump -Fd -j N into part_path (a directory). Returns (sha256, size)."""
+        cmd = ['pg_dump', *self._connection_args(), '-Fd', '-j', str(self.jobs),
+               '-Z', str(self.level), '-f', str(part_path)]
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, env=self._env(), stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            stderr = await _read_limited(proc.stderr)
+            if await proc.wait() != 0:
+                raise BackupError(f"pg_dump error: {stderr}")
+        except BaseException:
+            await _kill(proc)
+            raise
+        return await asyncio.to_thread(_directory_checksum, part_path)
+
+    @staticmethod
+    def _remove_path(path):
+        path = Path(path)
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        elif path.exists():
+            path.unlink()
 
     def _save_backup_record(self, filename, filepath, filesize=None, backup_type='manual',
-                            user_id=None, status='completed', comment=''):
+                            user_id=None, status='completed', comment='', backup_format=None):
         """Insert backup record into database."""
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO backups (filename, filepath, filesize, type, status, created_by, comment)
-            VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id
-        """, (filename, filepath, filesize, backup_type, status, user_id, comment))
-        backup_id = cur.fetchone()[0]
-        conn.commit()
-        cur.close()
-        conn.close()
+        with transaction() as cur:
+            cur.execute("""
+                INSERT INTO backups (filename, filepath, filesize, type, status, created_by, comment, format)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s) RETURNING id
+            """, (filename, filepath, filesize, backup_type, status, user_id, comment, backup_format))
+            backup_id = cur.fetchone()[0]
         return backup_id
 
-    def restore_backup(self, backup_id, user_id=None):
-        """Restore database from a backup."""
-        # Get backup file path
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT filepath FROM backups WHERE id = %s", (backup_id,))
-        row = cur.fetchone()
-        cur.close()
-        conn.close()
-        if not row:
-            raise Exception(f"Backup {backup_id} not found")
+    def _finish_backup_record(self, backup_id, status, filesize=None, checksum=None, comment=None):
+        with transaction() as cur:
+            cur.execute("""
+                UPDATE backups
+                SET status = %s, filesize = %s, checksum = %s, finished_at = NOW(),
+                    comment = COALESCE(%s, comment)
+                WHERE id = %s
+            """, (status, filesize, checksum, comment, backup_id))
 
+    def _get_backup_file(self, backup_id):
+        """(path, checksum) of a backup; raises BackupError if the record or file is missing."""
+        with read() as cur:
+            cur.execute("SELECT filepath, checksum FROM backups WHERE id = %s", (backup_id,))
+            row = cur.fetchone()
+        if not row:
+            raise BackupError(f"Backup {backup_id} not found")
         backup_path = Path(row[0])
         if not backup_path.exists():
             backup_path = self.backup_dir.parent / row[0]
             if not backup_path.exists():
-                raise Exception(f"Backup file not found: {backup_path}")
-
-        # Decompress if needed
-        if backup_path.suffix == '.gz':
-            import gzip
-            temp_path = backup_path.with_suffix('.sql.tmp')
-            with gzip.open(backup_path, 'rb') as f_in:
-                with open(temp_path, 'wb') as f_out:
-                    shutil.copyfileobj(f_in, f_out)
-            restore_file = temp_path
-        else:
-            restore_file = backup_path
+                raise BackupError(f"Backup file not found: {backup_path}")
+        return backup_path, row[1]
 
-        # Restore command
-        restore_cmd = [
-            'psql',
-            '-h', self.db_config['host'],
-            '-p', str(self.db_config['port']),
-            '-U', self.db_config['user'],
-            '-d', self.db_config['database'],
-            '-f', str(restore_file)
-        ]
+    async def restore_backup(self, backup_id, user_id=None, verify=True):
+        """
+        Restore database from a backup.
 
-        env = os.environ.copy()
-        env['PGPASSWORD'] = self.db_config['password']
+        The checksum is verified before anything touches the database. Plain
+        SQL backups (.sql, .sql.gz, .sql.zst) are decompressed chunk by chunk
+        straight into psql's stdin in a single transaction; custom/directory
+        dumps go to pg_restore -j BACKUP_JOBS.
+        """
+        backup_path, checksum = await asyncio.to_thread(self._get_backup_file, backup_id)
+        if verify and checksum:
+            actual = await asyncio.to_thread(file_checksum, backup_path)
+            if actual != checksum:
+                raise BackupError(f"Backup {backup_id} checksum mismatch: file is damaged or was modified")
+        elif verify:
+            logger.warning(f"Backup {backup_id} has no checksum, restoring unverified")
 
         try:
-            logger.info(f"Restoring backup {backup_id}")
-            result = subprocess.run(restore_cmd, env=env, capture_output=True, text=True, timeout=600)
-            if result.returncode != 0:
-                raise Exception(f"Restore error: {result.stderr}")
+            logger.info(f"Restoring backup {backup_id} from {backup_path}")
+            started = time.monotonic()
+            async with asyncio.timeout(self.timeout):
+                if backup_path.is_dir() or backup_path.suffix == '.dump':
+                    await self._restore_archive(backup_path)
+                else:
+                    await self._restore_sql(backup_path)
 
             # Update record
-            conn = get_db_connection()
-            cur = conn.cursor()
-            cur.execute("UPDATE backups SET restored_at = NOW(), restored_by = %s WHERE id = %s",
-                        (user_id, backup_id))
-            conn.commit()
-            cur.close()
-            conn.close()
-            logger.info(f"Backup {backup_id} restored successfully")
+            await asyncio.to_thread(self._mark_restored, backup_id, user_id)
+            logger.info(f"Backup {backup_id} restored successfully in {time.monotonic() - started:.1f}s")
             return True
         except Exception as e:
-            logger.error(f"Restore failed: {e}")
+            logger.error(f"Restore failed: {'timeout' if isinstance(e, TimeoutError) else e}")
+            raise
+
+    async def _restore_archive(self, backup_path):
+        """pg_restore for custom/directory format, in parallel."""
+        cmd = ['pg_restore', *self._connection_args(), '--clean', '--if-exists', '--no-owner',
+               '-j', str(self.jobs), str(backup_path)]
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, env=self._env(), stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            stderr = await _read_limited(proc.stderr)
+            if await proc.wait() != 0:
+                raise BackupError(f"Restore error: {stderr}")
+        except BaseException:
+            await _kill(proc)
+            raise
+
+    async def _restore_sql(self, backup_path):
+        """Decompress a plain SQL backup into psql's stdin without a temp file."""
+        cmd = ['psql', *self._connection_args(), '-v', 'ON_ERROR_STOP=1', '--single-transaction', '-q']
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, env=self._env(), stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+        )
+        stderr_task = asyncio.create_task(_read_limited(proc.stderr))
+        source = await asyncio.to_thread(_DecompressedSource, backup_path)
+        try:
+            while True:
+                chunk = await asyncio.to_thread(source.read)
+                if not chunk:
+                    break
+                proc.stdin.write(chunk)
+                await proc.stdin.drain()
+            proc.stdin.close()
+            returncode = await proc.wait()
+            stderr = await stderr_task
+            if returncode != 0:
+                raise BackupError(f"Restore error: {stderr}")
+        except (BrokenPipeError, ConnectionResetError):
+            # psql завершился раньше (ON_ERROR_STOP) — причина в stderr
+            await proc.wait()
+            raise BackupError(f"Restore error: {await stderr_task}")
+        except BaseException:
+            await _kill(proc)
+            stderr_task.cancel()
             raise
         finally:
-            if backup_path.suffix == '.gz' and temp_path.exists():
-                temp_path.unlink()
+            source.close()
+
+    def _mark_restored(self, backup_id, user_id):
+        with transaction() as cur:
+            cur.execute("UPDATE backups SET restored_at = NOW(), restored_by = %s WHERE id = %s",
+                        (user_id, backup_id))
 
     def list_backups(self, limit=50):
         """List backups from database."""
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT id, filename, filesize, type, status, created_at, comment, restored_at, restored_by
-            FROM backups ORDER BY created_at DESC LIMIT %s
-        """, (limit,))
-        rows = cur.fetchall()
-        cur.close()
-        conn.close()
+        with read() as cur:
+            cur.execute("""
+                SELECT id, filename, filesize, type, status, created_at, comment, restored_at, restored_by
+                FROM backups ORDER BY created_at DESC LIMIT %s
+            """, (limit,))
+            rows = cur.fetchall()
         return [{
             'id': r[0],
             'filename': r[1],
@@ -205,22 +424,129 @@ class BackupManager:
             size /= 1024
         return f"{size:.1f} TB"
 
-    def cleanup_old_backups(self, keep_days=30):
-        """Delete backups older than keep_days and not restored."""
-        cutoff = datetime.datetime.now() - datetime.timedelta(days=keep_days)
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT id, filepath FROM backups WHERE created_at < %s AND restored_at IS NULL", (cutoff,))
-        old_backups = cur.fetchall()
-        for backup_id, filepath in old_backups:
+    def apply_retention(self, daily=None, weekly=None, monthly=None, now=None):
+        """
+        Delete backups that fall outside the GFS policy (see select_expired_backups).
+        Files are removed first; records of removed files go in one DELETE.
+        Blocking; the scheduler runs it in a thread.
+        """
+        daily = Config.BACKUP_KEEP_DAILY if daily is None else daily
+        weekly = Config.BACKUP_KEEP_WEEKLY if weekly is None else weekly
+        monthly = Config.BACKUP_KEEP_MONTHLY if monthly is None else monthly
+        with read() as cur:
+            cur.execute("SELECT id, filepath, filesize, status, created_at, restored_at FROM backups")
+            backups = [{
+                'id': r[0],
+                'filepath': r[1],
+                'filesize': r[2],
+                'status': r[3],
+                'created_at': r[4],
+                'restored_at': r[5]
+            } for r in cur.fetchall()]
+
+        expired = select_expired_backups(backups, daily, weekly, monthly, now=now)
+        removed_ids, freed = [], 0
+        for backup in expired:
             try:
-                path = Path(filepath)
-                if path.exists():
-                    path.unlink()
-                cur.execute("DELETE FROM backups WHERE id = %s", (backup_id,))
-                logger.info(f"Deleted old backup ID {backup_id}")
+                path = Path(backup['filepath'])
+                if not path.is_absolute():
+                    path = self.backup_dir.parent / path
+                for candidate in (path, path.with_name(path.name + '.part')):
+                    self._remove_path(candidate)
+                removed_ids.append(backup['id'])
+                freed += backup['filesize'] or 0
             except Exception as e:
-                logger.error(f"Error deleting backup {backup_id}: {e}")
-        conn.commit()
-        cur.close()
-        conn.close()
\ No newline at end of file
+                logger.error(f"Error deleting backup {backup['id']}: {e}")
+        if removed_ids:
+            delete_backup_records(removed_ids)
+        self._prune_empty_dirs()
+        logger.info(f"Backup retention: removed {len(removed_ids)} backups, freed {self._format_size(freed)}, "
+                    f"kept {len(backups) - len(removed_ids)}")
+        return {'deleted': len(removed_ids), 'freed_bytes': freed, 'kept': len(backups) - len(removed_ids)}
+
+    def _prune_empty_dirs(self):
+        """Remove empty YYYY/MM directories left after retention."""
+        for month_dir in sorted(self.backup_dir.glob('*/*'), reverse=True):
+            if month_dir.is_dir() and not any(month_dir.iterdir()):
+                month_dir.rmdir()
+        for year_dir in self.backup_dir.iterdir():
+            if year_dir.is_dir() and not any(year_dir.iterdir()):
+                year_dir.rmdir()
+
+    def storage_usage(self):
+        """Space taken by backups (by the records) and free space on their disk."""
+        with read() as cur:
+            cur.execute("""
+                SELECT COUNT(*), COALESCE(SUM(filesize), 0)
+                FROM backups WHERE status = 'completed'
+            """)
+            count, total = cur.fetchone()
+        disk = shutil.disk_usage(self.backup_dir)
+        return {
+            'count': count,
+            'backups_bytes': total,
+            'backups': self._format_size(total),
+            'disk_total': self._format_size(disk.total),
+            'disk_free': self._format_size(disk.free),
+            'disk_used_percent': round(disk.used * 100 / disk.total, 1) if disk.total else 0,
+        }
+
+
+def select_expired_backups(backups, daily, weekly, monthly, now=None):
+    """
+    Grandfather-father-son retention.
+
+    Among completed backups the newest one of each of the `daily` most recent
+    days, `weekly` most recent ISO weeks and `monthly` most recent months
+    (that have backups) is kept; all other completed backups expire.
+    Restored backups are always kept; failed or abandoned in-progress records
+    expire after a day. Returns the expired items of `backups`.
+    """
+    now = now or datetime.datetime.now()
+    completed = sorted((b for b in backups if b['status'] == 'completed'),
+                       key=lambda b: b['created_at'], reverse=True)
+    keep = set()
+    periods = (
+        (lambda d: d.date(), daily),
+        (lambda d: tuple(d.isocalendar())[:2], weekly),
+        (lambda d: (d.year, d.month), monthly),
+    )
+    for period_of, count in periods:
+        seen = set()
+        for backup in completed:
+            period = period_of(backup['created_at'])
+            if period in seen:
+                continue
+            if len(seen) >= count:
+                break
+            seen.add(period)
+            keep.add(backup['id'])
+
+    expired = []
+    for backup in backups:
+        if backup['restored_at'] or backup['id'] in keep:
+            continue
+        if backup['status'] == 'completed' or backup['created_at'] < now - datetime.timedelta(days=1):
+            expired.append(backup)
+    return expired
+
+
+async def _read_limited(stream, limit=STDERR_LIMIT):
+    """Drain a pipe (so the child never blocks on it), keeping the first `limit` bytes."""
+    data = bytearray()
+    while True:
+        chunk = await stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        if len(data) < limit:
+            data += chunk[:limit - len(data)]
+    return data.decode(errors='replace').strip()
+
+
+async def _kill(proc):
+    if proc.returncode is None:
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+        await proc.wait()
\ No newline at end of file
@@ -1,8 +1,32 @@
+import threading
+from typing import NamedTuple, Optional
 from cachetools import TTLCache
 
 # Кеш с максимальным размером 1000 элементов и временем жизни 300 секунд (5 минут)
 _cache = TTLCache(maxsize=1000, ttl=300)
 
+class UserContext(NamedTuple):
+    """Компактная запись о пользователе, которую AuthMiddleware кладёт в data хендлеров."""
+    registered: bool
+    is_admin: bool = False
+    phone: Optional[str] = None
+
+# Контексты пользователей: отдельный кеш, чтобы не вытеснять справочники.
+# Инвалидируется из CRUD (в т.ч. из потоков веб-панели) и по NOTIFY user_changed
+# из других процессов (services/user_contexts.py), поэтому под блокировкой.
+_user_contexts = TTLCache(maxsize=10000, ttl=300)
+_user_contexts_lock = threading.Lock()
+
+# Занятость дней для записи: date -> список (начало в минутах от полуночи, длительность).
+# Пишется из CRUD при создании записи, сбрасывается при смене статуса и удалении
+# (в т.ч. из потоков веб-панели). TTL ограничивает устаревание, если запись
+# изменил другой процесс; окончательную проверку делает вставка (см. services/slots.py).
+_occupancy = TTLCache(maxsize=64, ttl=60)
+# Календарь свободных мест по диапазонам дат: (date_from, date_to) -> список дней.
+# Сбрасывается вместе с занятостью любого входящего в диапазон дня.
+_calendars = TTLCache(maxsize=32, ttl=60)
+_occupancy_lock = threading.Lock()
+
 def get_cache(key):
     """Получить значение из кеша по ключу."""
     return _cache.get(key)
@@ -16,16 +40,75 @@ def delete_cache(key):
     if key in _cache:
         del _cache[key]
 
-def get_user_registration_status(user_id: int) -> bool:
+def peek_user_context(user_id: int) -> Optional[UserContext]:
+    """Контекст пользователя из кеша без обращения к БД."""
+    with _user_contexts_lock:
+        return _user_contexts.get(user_id)
+
+def set_user_context(user_id: int, ctx: UserContext):
+    """Записать контекст пользователя (write-through после изменения в БД)."""
+    with _user_contexts_lock:
+        _user_contexts[user_id] = ctx
+
+def invalidate_user_context(user_id: int):
+    """Сбросить контекст пользователя, чтобы следующий апдейт перечитал его из БД."""
+    with _user_contexts_lock:
+        _user_contexts.pop(user_id, None)
+
+def clear_user_contexts():
+    """Сбросить все контексты (например, если уведомления об изменениях могли быть пропущены)."""
+    with _user_contexts_lock:
+        _user_contexts.clear()
+
+def get_occupancy(day):
+    """Занятые интервалы дня из кеша или None."""
+    with _occupancy_lock:
+        busy = _occupancy.get(day)
+        return list(busy) if busy is not None else None
+
+def set_occupancy(day, busy):
+    with _occupancy_lock:
+        _occupancy[day] = list(busy)
+
+def add_occupancy(day, start_minute: int, duration: int):
+    """Write-through новой записи; если дня нет в кеше, он прочитается целиком при обращении."""
+    with _occupancy_lock:
+        busy = _occupancy.get(day)
+        if busy is not None:
+            busy.append((start_minute, duration))
+        _drop_calendars(day)
+
+def invalidate_occupancy(day):
+    with _occupancy_lock:
+        _occupancy.pop(day, None)
+        _drop_calendars(day)
+
+def get_calendar(date_from, date_to):
+    with _occupancy_lock:
+        return _calendars.get((date_from, date_to))
+
+def set_calendar(date_from, date_to, days):
+    with _occupancy_lock:
+        _calendars[(date_from, date_to)] = days
+
+def _drop_calendars(day):
+    for key in [k for k in list(_calendars.keys()) if k[0] <= day <= k[1]]:
+        _calendars.pop(key, None)
+
+def _user_context_from_row(row) -> UserContext:
+    if not row:
+        return UserContext(registered=False)
+    return UserContext(registered=True, is_admin=bool(row['is_admin']), phone=row['phone'])
+
+async def get_user_context(user_id: int) -> UserContext:
     """
-    Проверяет, зарегистрирован ли пользователь, с кешированием на 5 минут.
-    Если в кеше нет, запрашивает из БД и сохраняет.
+    Контекст пользователя с кешированием на 5 минут.
+    При промахе читает из БД одним запросом (asyncpg) и сохраняет в кеш.
     """
-    from database.crud.users import is_user_registered
-    cache_key = f'user_registered_{user_id}'
-    cached = get_cache(cache_key)
-    if cached is not None:
-        return cached
-    status = is_user_registered(user_id)
-    set_cache(cache_key, status)
-    return status
\ No newline at end of file
+    ctx = peek_user_context(user_id)
+    if ctx is not None:
+        return ctx
+    from database.crud_async.users import get_user_brief
+    ctx = _user_context_from_row(await get_user_brief(user_id))
+    set_user_context(user_id, ctx)
+    return ctx
\ No newline at end of file
@@ -0,0 +1,81 @@
+import base64
+import json
+from datetime import date, datetime, time
+from typing import Any, List, NamedTuple, Optional
+from utils.cache import get_cache, set_cache
+
+class Page(NamedTuple):
+    """Страница keyset-пагинации: записи, общее число (может быть приблизительным) и курсор следующей страницы."""
+    items: List[dict]
+    total: Optional[int]
+    next_cursor: Optional[str]
+
+# Разборщики значений курсора по типу колонки сортировки
+CURSOR_TYPES = {
+    'int': int,
+    'date': date.fromisoformat,
+    'time': time.fromisoformat,
+    'datetime': datetime.fromisoformat,
+}
+
+def encode_cursor(*values) -> str:
+    """Непрозрачный курсор для URL из значений ключа сортировки последней записи."""
+    raw = json.dumps([v.isoformat() if isinstance(v, (date, time)) else v for v in values],
+                     separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(token: Optional[str], *types: str) -> Optional[tuple]:
+    """
+    Разобрать курсор обратно в значения ключа (types — ключи CURSOR_TYPES).
+    Повреждённый или чужой курсор даёт None, т.е. первую страницу.
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(types):
+            return None
+        return tuple(CURSOR_TYPES[t](v) for t, v in zip(types, values))
+    except (ValueError, TypeError, KeyError):
+        return None
+
+def page_from_rows(rows: List[Any], per_page: int, to_item, cursor_of, total=None) -> Page:
+    """
+    Собрать Page из per_page + 1 строк: лишняя строка лишь говорит, что дальше есть ещё.
+    cursor_of(row) возвращает значения ключа сортировки строки.
+    """
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    next_cursor = encode_cursor(*cursor_of(rows[-1])) if has_more and rows else None
+    return Page([to_item(r) for r in rows], total, next_cursor)
+
+def count_rows(cur, table: str, where_sql: str = '', params=(), mode: str = 'approx',
+               alias: str = '') -> Optional[int]:
+    """
+    Общее число строк для заголовка списка.
+
+    mode:
+      - 'exact'  — COUNT(*) на каждый вызов (полный проход по таблице);
+      - 'approx' — без фильтров оценка планировщика из pg_class.reltuples,
+                   с фильтрами COUNT(*), закешированный на 5 минут;
+      - None     — не считать вовсе.
+    alias — псевдоним таблицы, если where_sql ссылается на него (a.status).
+    """
+    if mode is None:
+        return None
+    if mode == 'approx' and not where_sql:
+        cur.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", (table,))
+        row = cur.fetchone()
+        # -1: таблица ещё ни разу не анализировалась — считаем честно
+        if row and row[0] >= 0:
+            return row[0]
+    key = ('count', table, where_sql, tuple(params))
+    if mode == 'approx':
+        cached = get_cache(key)
+        if cached is not None:
+            return cached
+    cur.execute(f"SELECT COUNT(*) FROM {table} {alias} {where_sql}", tuple(params))
+    total = cur.fetchone()[0]
+    set_cache(key, total)
+    return total
\ No newline at end of file
@@ -47,9 +47,9 @@ def create_app(config_class=Config):
     @app.context_processor
     def inject_globals():
         """Inject global variables into all templates."""
-        from database.crud.settings import get_setting
+        from database.crud.settings import get_settings
         return {
-            'shop_name': get_setting('shop_name') or 'SharahBot',
+            'shop_name': get_settings().get('shop_name') or 'SharahBot',
             'current_year': datetime.now().year
         }
 
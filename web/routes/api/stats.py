@@ -1,17 +1,34 @@
 # web/routes/api/stats.py
+import calendar
+from datetime import date, timedelta
 from flask import Blueprint, jsonify, request
+from database.crud.job_runs import get_job_stats
+from services.slots import slots
 
 api_stats_bp = Blueprint('api_stats', __name__)
 
 @api_stats_bp.route('/appointments/dates')
 def appointments_dates():
     """
-    Возвращает список дат, на которые есть записи (для подсветки в календаре).
-    Пока заглушка, возвращаем пустой список.
+    Загрузка дней для календаря: ?year=&month= (месяц целиком) или ?from=&to= (YYYY-MM-DD,
+    не больше 92 дней). Для каждого дня — число активных записей, слоты со свободным
+    постом, всего слотов и признак полной занятости. Один групповой запрос на диапазон.
     """
-    # Здесь можно будет позже сделать реальный запрос к БД
-    # Например, получить все даты из таблицы appointments
-    return jsonify([])
+    try:
+        if request.args.get('from'):
+            date_from = date.fromisoformat(request.args['from'])
+            date_to = date.fromisoformat(request.args.get('to') or request.args['from'])
+        else:
+            today = date.today()
+            year = request.args.get('year', today.year, type=int)
+            month = request.args.get('month', today.month, type=int)
+            date_from = date(year, month, 1)
+            date_to = date(year, month, calendar.monthrange(year, month)[1])
+    except ValueError:
+        return jsonify({'error': 'invalid date range'}), 400
+    if date_to < date_from or date_to - date_from > timedelta(days=92):
+        return jsonify({'error': 'invalid date range'}), 400
+    return jsonify([day.as_dict() for day in slots.calendar_sync(date_from, date_to)])
 
 @api_stats_bp.route('/stats/appointments')
 def appointments_stats():
@@ -29,4 +46,13 @@ def services_stats():
     Возвращает статистику по услугам (популярность).
     Пока заглушка.
     """
-    return jsonify([])
\ No newline at end of file
+    return jsonify([])
+
+@api_stats_bp.route('/stats/jobs')
+def jobs_stats():
+    """
+    Фоновые задачи планировщика за последние N дней: число запусков, ошибки,
+    среднее/максимальное время выполнения, последний запуск и узел-лидер.
+    """
+    days = min(max(1, request.args.get('days', 7, type=int)), 90)
+    return jsonify(get_job_stats(days))
\ No newline at end of file
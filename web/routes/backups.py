@@ -1,7 +1,19 @@
 from flask import Blueprint, render_template
+from utils.backup import BackupManager
+import logging
+
+logger = logging.getLogger(__name__)
 
 backups_bp = Blueprint('backups', __name__)
 
 @backups_bp.route('/backups')
 def backups_list():
-    return render_template('admin/backups.html', backups=[])
\ No newline at end of file
+    """Список бекапов и занятое ими место на диске."""
+    manager = BackupManager.from_config()
+    try:
+        backups = manager.list_backups()
+        usage = manager.storage_usage()
+    except Exception:
+        logger.exception("Ошибка при получении списка бекапов")
+        backups, usage = [], None
+    return render_template('admin/backups.html', backups=backups, usage=usage)
\ No newline at end of file
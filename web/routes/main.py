@@ -1,10 +1,11 @@
 from flask import Blueprint, render_template
+from database.crud.statistics import get_dashboard_stats
 
 main_bp = Blueprint('main', __name__)
 
 @main_bp.route('/')
 def index():
-    stats = {}                     # пустой словарь для статистики
+    stats = get_dashboard_stats()    # один запрос к daily_stats
     upcoming = []                   # пустой список для предстоящих записей
     recent_reviews = []              # пустой список для последних отзывов
     return render_template('index.html',
@@ -1,8 +1,7 @@
 from flask import Blueprint, render_template, request, jsonify, abort
-from database.crud.users import get_users, get_user, update_user, delete_user
+from database.crud.users import get_users, get_user, update_user, delete_user, search_users
 from database.crud.user_cars import get_user_cars
 import logging
-import math
 
 logger = logging.getLogger(__name__)
 
@@ -11,41 +10,59 @@ users_bp = Blueprint('users', __name__)
 @users_bp.route('/users')
 def users_list():
     """
-    Отображает список пользователей с пагинацией и поиском.
+    Отображает список пользователей с keyset-пагинацией и поиском.
     Query params:
-      - page: int, default 1
+      - after: str, курсор следующей страницы (next_cursor предыдущей)
       - per_page: int, default 20 (1..100)
       - search: str, default ""
+    Страница любой глубины стоит одинаково; общее число — приблизительное.
     """
     try:
-        page = request.args.get('page', 1, type=int)
+        after = request.args.get('after') or None
         per_page = request.args.get('per_page', 20, type=int)
         search = (request.args.get('search') or '').strip()
 
         # Валидация и ограничение значений
-        page = max(1, page)
         per_page = min(max(1, per_page), 100)
 
-        users, total = get_users(page=page, per_page=per_page, search=search)
-        
-        total_pages = math.ceil(total / per_page) if per_page > 0 else 0
+        users, total, next_cursor = get_users(per_page=per_page, search=search, after=after)
 
     except Exception:
         logger.exception("Ошибка при получении списка пользователей")
-        users, total, page, per_page, total_pages, search = [], 0, 1, 20, 0, ''
+        users, total, next_cursor, after, per_page, search = [], 0, None, None, 20, ''
         # Можно показать страницу с ошибкой, но пока просто пустой список
     
     return render_template(
         'users.html',
         users=users,
-        page=page,
+        after=after,
+        next_cursor=next_cursor,
         per_page=per_page,
         total=total,
-        total_pages=total_pages,
         search=search
     )
 
 
+@users_bp.route('/users/search')
+def users_search():
+    """
+    Подсказки для поля поиска (typeahead): лучшие совпадения по имени,
+    username и фрагменту телефона.
+    Query params:
+      - q: str, минимум 2 символа
+      - limit: int, default 10 (1..50)
+    """
+    query = (request.args.get('q') or '').strip()
+    limit = min(max(1, request.args.get('limit', 10, type=int)), 50)
+    if len(query) < 2:
+        return jsonify([])
+    try:
+        return jsonify(search_users(query, limit=limit))
+    except Exception:
+        logger.exception("Ошибка поиска пользователей")
+        return jsonify({'success': False, 'error': 'Internal server error'}), 500
+
+
 @users_bp.route('/users/<int:user_id>')
 def user_detail(user_id: int):
     """